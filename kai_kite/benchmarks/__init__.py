@@ -0,0 +1 @@
+# kai_kite/benchmarks/__init__.py
@@ -0,0 +1,200 @@
+# kai_kite/benchmarks/corpus.py
+"""
+Corpus synthétiques et reproductibles pour les mesures de débit de kai_kite.
+
+Tous les documents sont générés localement avec pymupdf, à partir d'une graine :
+deux générations avec les mêmes paramètres donnent les mêmes fichiers.
+"""
+import io
+import random
+from pathlib import Path
+
+import numpy as np
+import pymupdf
+from PIL import Image
+
+# Vocabulaire des textes générés (proche de celui des documents administratifs)
+WORDS = (
+    "article arrêté délibération conseil province gouvernement commune décision budget "
+    "personnel service public montant annexe modification application dispositions présent "
+    "territoire assemblée séance président membres vote rapport commission dotation exercice "
+    "article alinéa paragraphe crédit dépense recette marché contrat convention subvention"
+).split()
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 en points
+MARGIN = 56
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(length)]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng, rng.randint(8, 18)) for _ in range(rng.randint(3, 6)))
+
+
+def _draw_text_page(page, rng: random.Random, section: int):
+    """Un titre, puis des intertitres et des paragraphes jusqu'au bas de la page."""
+    y = MARGIN
+    page.insert_text((MARGIN, y + 16), f"Section {section} - {_sentence(rng, 4)}", fontsize=16)
+    y += 40
+    while y < PAGE_HEIGHT - 160:
+        if rng.random() < 0.3:
+            page.insert_text((MARGIN, y + 12), f"{section}.{rng.randint(1, 9)} {_sentence(rng, 3)}", fontsize=12)
+            y += 24
+        rect = pymupdf.Rect(MARGIN, y, PAGE_WIDTH - MARGIN, y + 110)
+        page.insert_textbox(rect, _paragraph(rng), fontsize=9)
+        y += 122
+
+
+def _draw_table(page, rng: random.Random, top: float, rows: int, cols: int) -> float:
+    """Un tableau quadrillé avec une ligne d'en-tête ; renvoie l'ordonnée de son bas."""
+    row_height = 20
+    width = PAGE_WIDTH - 2 * MARGIN
+    col_width = width / cols
+    bottom = top + rows * row_height
+
+    for r in range(rows + 1):
+        y = top + r * row_height
+        page.draw_line((MARGIN, y), (MARGIN + width, y), width=0.8)
+    for c in range(cols + 1):
+        x = MARGIN + c * col_width
+        page.draw_line((x, top), (x, bottom), width=0.8)
+
+    for r in range(rows):
+        for c in range(cols):
+            if r == 0:
+                text = rng.choice(WORDS).capitalize()
+            elif c == 0:
+                text = f"{rng.choice(WORDS)} {r}"
+            else:
+                text = f"{rng.randint(0, 999_999):,}".replace(",", " ")
+            page.insert_text((MARGIN + c * col_width + 4, top + r * row_height + 14), text, fontsize=8)
+    return bottom
+
+
+def _draw_table_page(page, rng: random.Random, section: int):
+    """Un titre, une courte introduction, puis deux ou trois tableaux."""
+    page.insert_text((MARGIN, MARGIN + 16), f"Annexe {section} - {_sentence(rng, 3)}", fontsize=16)
+    page.insert_textbox(pymupdf.Rect(MARGIN, MARGIN + 30, PAGE_WIDTH - MARGIN, MARGIN + 110), _paragraph(rng), fontsize=9)
+    y = MARGIN + 130
+    for _ in range(rng.randint(2, 3)):
+        rows, cols = rng.randint(6, 12), rng.randint(3, 6)
+        if y + rows * 20 > PAGE_HEIGHT - MARGIN:
+            break
+        y = _draw_table(page, rng, y, rows, cols) + 30
+
+
+def make_text_pdf(path: Path, pages: int, seed: int = 0) -> Path:
+    """PDF né numérique, surtout du texte (avec une couche texte exploitable)."""
+    rng = random.Random(seed)
+    with pymupdf.open() as doc:
+        for n in range(pages):
+            _draw_text_page(doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT), rng, n + 1)
+        doc.save(path, deflate=True)
+    return path
+
+
+def make_table_pdf(path: Path, pages: int, seed: int = 0) -> Path:
+    """PDF né numérique, surtout des tableaux quadrillés."""
+    rng = random.Random(seed)
+    with pymupdf.open() as doc:
+        for n in range(pages):
+            _draw_table_page(doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT), rng, n + 1)
+        doc.save(path, deflate=True)
+    return path
+
+
+def _scanned_images(source: Path, dpi: int, seed: int) -> list:
+    """
+    Rastérise les pages d'un PDF comme un scanner : niveaux de gris, léger bruit
+    et légère rotation. Le résultat n'a plus de couche texte.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    with pymupdf.open(source) as doc:
+        for page in doc:
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+            pixels = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width)
+            noisy = np.clip(pixels.astype(np.int16) + rng.normal(0, 12, pixels.shape), 0, 255).astype(np.uint8)
+            image = Image.fromarray(noisy, mode="L").rotate(
+                float(rng.uniform(-0.8, 0.8)), resample=Image.BILINEAR, fillcolor=255
+            )
+            images.append(image)
+    return images
+
+
+def make_scanned_pdf(path: Path, pages: int, seed: int = 0, dpi: int = 200) -> Path:
+    """PDF de pages scannées : une image par page, sans couche texte (passe par l'OCR)."""
+    source = make_text_pdf(path.with_name(f".{path.stem}.source.pdf"), pages, seed)
+    try:
+        with pymupdf.open() as doc:
+            for image in _scanned_images(source, dpi, seed):
+                page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+                page.insert_image(page.rect, stream=_jpeg_bytes(image))
+                image.close()
+            doc.save(path, deflate=True)
+    finally:
+        source.unlink()
+    return path
+
+
+def make_multiframe_tiff(path: Path, pages: int, seed: int = 0, dpi: int = 200) -> Path:
+    """TIFF multi-pages de pages scannées (texte et tableaux alternés)."""
+    text_source = make_text_pdf(path.with_name(f".{path.stem}.text.pdf"), (pages + 1) // 2, seed)
+    table_source = make_table_pdf(path.with_name(f".{path.stem}.tables.pdf"), pages // 2, seed + 1)
+    try:
+        text_images = _scanned_images(text_source, dpi, seed)
+        table_images = _scanned_images(table_source, dpi, seed + 1)
+        frames = [image for pair in zip(text_images, table_images) for image in pair]
+        frames += text_images[len(table_images):]
+        frames[0].save(path, save_all=True, append_images=frames[1:], compression="tiff_deflate", dpi=(dpi, dpi))
+        for frame in frames:
+            frame.close()
+    finally:
+        text_source.unlink()
+        table_source.unlink()
+    return path
+
+
+def _jpeg_bytes(image: Image.Image) -> bytes:
+    """Les scanners produisent en général du JPEG : même coût de décodage au rendu."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+# Nom du document -> fonction de génération
+CORPUS = {
+    "text_heavy.pdf": make_text_pdf,
+    "table_heavy.pdf": make_table_pdf,
+    "scanned.pdf": make_scanned_pdf,
+    "scanned_multiframe.tiff": make_multiframe_tiff,
+}
+
+
+def generate_corpus(directory: Path, pages: int = 10, seed: int = 0, kinds: list = None) -> list:
+    """
+    Génère le corpus synthétique dans `directory` (les fichiers existants sont réutilisés).
+
+    Args:
+        directory: Le dossier de sortie.
+        pages: Le nombre de pages de chaque document.
+        seed: La graine de génération.
+        kinds: Les noms des documents à générer (tous par défaut, voir `CORPUS`).
+
+    Returns:
+        Les chemins des documents générés.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for offset, (name, make) in enumerate(CORPUS.items()):
+        if kinds and name not in kinds:
+            continue
+        # La taille et la graine font partie du nom : un corpus n'est jamais réutilisé à tort
+        path = directory / f"{Path(name).stem}_p{pages}_s{seed}{Path(name).suffix}"
+        if not path.exists():
+            make(path, pages, seed + offset)
+        paths.append(path)
+    return paths
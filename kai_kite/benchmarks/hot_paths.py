@@ -0,0 +1,96 @@
+# kai_kite/benchmarks/hot_paths.py
+"""
+Micro-mesures des chemins critiques qui ne dépendent d'aucun modèle :
+affectation des mots aux boîtes, linéarisation des tableaux et assemblage du JSON.
+"""
+import random
+import timeit
+
+from ..core.content_extractor import _get_text_in_box, _linearize_table, _prepare_ocr_words
+from ..formatting.json_builder import build_final_json
+from .corpus import WORDS
+
+
+def _synthetic_ocr_data(rng: random.Random, words: int, width: int = 2480, height: int = 3508) -> dict:
+    """Sortie de type `pytesseract.image_to_data` : des mots répartis en lignes sur une page A4 à 300 DPI."""
+    data = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+    per_line = 14
+    for n in range(words):
+        data["text"].append(rng.choice(WORDS))
+        data["conf"].append(rng.choice([96, 91, 88, 45]))
+        data["left"].append(150 + (n % per_line) * (width - 300) // per_line)
+        data["top"].append(150 + (n // per_line) * 40 % (height - 300))
+        data["width"].append(110)
+        data["height"].append(28)
+    return data
+
+
+def _synthetic_boxes(rng: random.Random, count: int, width: int = 2480, height: int = 3508) -> list:
+    boxes = []
+    for _ in range(count):
+        x1, y1 = rng.uniform(100, width / 2), rng.uniform(100, height - 400)
+        boxes.append([x1, y1, x1 + rng.uniform(400, width / 2), y1 + rng.uniform(80, 300)])
+    return boxes
+
+
+def _synthetic_cells(rng: random.Random, rows: int, cols: int) -> list:
+    cells = []
+    for r in range(rows):
+        for c in range(cols):
+            y = 30 * r + rng.uniform(-4, 4)
+            cells.append({"box": [120 * c, y, 120 * (c + 1), y + 26], "text": rng.choice(WORDS)})
+    rng.shuffle(cells)
+    return cells
+
+
+def _synthetic_elements(rng: random.Random, count: int, pages: int = 20) -> list:
+    elements = []
+    for n in range(count):
+        element_type = "Section-header" if n % 25 == 0 else rng.choice(["Text", "Text", "List-item", "Table"])
+        y = rng.uniform(0, 3400)
+        elements.append({
+            "element_type": element_type,
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 60))),
+            "coordinates": [100.0, y, 2300.0, y + 120],
+            "page": n * pages // count + 1,
+        })
+    return elements
+
+
+def _time_per_call(func, repeat: int = 5) -> dict:
+    """Durée d'un appel (médiane et minimum sur `repeat` séries), en millisecondes."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    return {"median_ms": round(runs[len(runs) // 2] * 1000, 4), "min_ms": round(runs[0] * 1000, 4), "loops": number}
+
+
+def run_hot_paths(seed: int = 0, words: int = 4000, boxes: int = 60, table_cells: int = 400,
+                  elements: int = 3000) -> dict:
+    """
+    Mesure les chemins critiques sans modèle sur des données synthétiques.
+
+    Returns:
+        {nom de la mesure: {"median_ms", "min_ms", "loops", ...paramètres}}
+    """
+    rng = random.Random(seed)
+    ocr_data = _synthetic_ocr_data(rng, words)
+    ocr_words = _prepare_ocr_words(ocr_data)
+    box_list = _synthetic_boxes(rng, boxes)
+    cols = 8
+    cells = _synthetic_cells(rng, max(1, table_cells // cols), cols)
+    element_list = _synthetic_elements(rng, elements)
+
+    return {
+        "prepare_ocr_words": {**_time_per_call(lambda: _prepare_ocr_words(ocr_data)), "words": words},
+        "get_text_in_box": {
+            **_time_per_call(lambda: [_get_text_in_box(ocr_words, box) for box in box_list]),
+            "words": words,
+            "boxes": boxes,
+        },
+        "linearize_table": {**_time_per_call(lambda: _linearize_table(cells)), "cells": len(cells)},
+        "build_final_json": {
+            **_time_per_call(lambda: build_final_json("benchmark.pdf", list(element_list), "0" * 64)),
+            "elements": elements,
+        },
+    }
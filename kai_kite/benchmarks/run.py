@@ -0,0 +1,189 @@
+# kai_kite/benchmarks/run.py
+"""
+Mesure du débit de kai_kite sur un corpus synthétique.
+
+    python -m kai_kite.benchmarks.run --pages 10
+    python -m kai_kite.benchmarks.run --stub-models --pages 5   # sans poids de modèles (CI)
+
+Le corpus est généré (puis réutilisé) dans `--work-dir`, chaque document est
+traité par `process_document` avec la configuration de config.yaml, et le
+rapport (débit et latences par étape, mémoire, micro-mesures des chemins
+critiques) est écrit dans `<work-dir>/report.json`.
+"""
+import argparse
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ..core import pipeline
+from ..utils.cache import ProcessingManifest
+from ..utils.logging import logger
+from ..utils.profiling import STAGES
+from .corpus import CORPUS, generate_corpus
+from .hot_paths import run_hot_paths
+from .stubs import StubLayoutModel, StubTableImageProcessor, StubTableModel
+
+# Documents sans couche texte : ils passent par l'OCR Tesseract
+OCR_ONLY = ["scanned.pdf", "scanned_multiframe.tiff"]
+
+
+def use_stub_models():
+    """
+    Remplace les modèles du pipeline par les substituts de `stubs` (load_models
+    ne recharge pas des modèles déjà présents). L'étape "layout" doit garder un
+    seul worker, sinon chaque thread charge son propre modèle YOLO.
+    """
+    pipeline.layout_model = StubLayoutModel()
+    pipeline.table_image_processor = StubTableImageProcessor()
+    pipeline.table_model = StubTableModel()
+
+
+def use_output_dir(directory: Path):
+    """Dirige les sorties, le manifeste et les points de reprise du pipeline vers `directory`."""
+    pipeline.OUTPUT_DIR = directory
+    pipeline.CACHE_DIR = directory / ".kai_kite"
+    pipeline.MANIFEST_PATH = pipeline.CACHE_DIR / "manifest.json"
+    pipeline.CHECKPOINT_DIR = pipeline.CACHE_DIR / "checkpoints"
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2)}
+
+
+def summarize_runs(profiles: list) -> dict:
+    """
+    Débit et latences de chaque étape, à partir des rapports de profilage des
+    documents (`build_document_profile`) : pages/s de l'étape seule et
+    percentiles de sa durée par page.
+    """
+    page_times = {stage: [] for stage in STAGES}
+    for profile in profiles:
+        for page in profile["pages"].values():
+            for stage in STAGES:
+                if stage in page:
+                    page_times[stage].append(page[stage]["wall_s"])
+
+    stages = {}
+    for stage in STAGES:
+        times = page_times[stage]
+        if times:
+            total = sum(times)
+            stages[stage] = {"pages": len(times), "pages_per_s": round(len(times) / total, 2) if total else None,
+                             **_percentiles(times)}
+        else:
+            # Étapes mesurées par document (assemblage et écriture du JSON)
+            calls = [p["stages"][stage] for p in profiles if stage in p["stages"]]
+            if calls:
+                stages[stage] = {"documents": len(calls), **_percentiles([c["wall_s"] for c in calls])}
+    return stages
+
+
+def run_documents(paths: list, output_dir: Path, repeat: int = 1) -> dict:
+    """
+    Traite chaque document `repeat` fois (sans cache) et résume les mesures.
+
+    Returns:
+        {"documents": {nom: résumé}, "stages": débit et latences par étape}
+    """
+    use_output_dir(output_dir)
+    manifest = ProcessingManifest(pipeline.MANIFEST_PATH)
+    profiles, documents = [], {}
+    for path in paths:
+        runs = []
+        for _ in range(repeat):
+            profile = pipeline.process_document(path, manifest=manifest, force=True)
+            if profile is not None:
+                runs.append(profile)
+        if not runs:
+            continue
+        profiles.extend(runs)
+        walls = [p["wall_s"] for p in runs]
+        pages = runs[0]["page_count"]
+        documents[path.name] = {
+            "pages": pages,
+            "runs": len(runs),
+            "wall_s_median": round(float(np.median(walls)), 3),
+            "pages_per_s": round(pages / float(np.median(walls)), 2) if pages else 0.0,
+            "max_page_rss_mb": max((p["max_page_rss_mb"] or 0) for p in runs) or None,
+            "stages": summarize_runs(runs),
+        }
+    manifest.save()
+    return {"documents": documents, "stages": summarize_runs(profiles)}
+
+
+def _log_report(report: dict):
+    logger.info("=== Débit par document ===")
+    for name, doc in report["documents"].items():
+        logger.info(f"  {name:<40} {doc['pages']:>4} p.  {doc['pages_per_s']:>7} p/s  "
+                    f"RSS max {doc['max_page_rss_mb']} Mo")
+    logger.info("=== Étapes (tous documents) ===")
+    for stage, summary in report["stages"].items():
+        rate = f"{summary['pages_per_s']:>8} p/s" if "pages_per_s" in summary else " " * 12
+        logger.info(f"  {stage:<11} {rate}  p50 {summary.get('p50_ms')} ms  "
+                    f"p95 {summary.get('p95_ms')} ms  p99 {summary.get('p99_ms')} ms")
+    logger.info("=== Chemins critiques (sans modèle) ===")
+    for name, result in report["hot_paths"].items():
+        logger.info(f"  {name:<18} médiane {result['median_ms']} ms / appel")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kai-kite : mesure du débit sur un corpus synthétique.")
+    parser.add_argument("--work-dir", type=str, default="data/benchmarks", help="Dossier du corpus et des sorties.")
+    parser.add_argument("--pages", type=int, default=10, help="Nombre de pages de chaque document généré.")
+    parser.add_argument("--seed", type=int, default=0, help="Graine de génération du corpus.")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre de traitements de chaque document.")
+    parser.add_argument(
+        "--kinds",
+        nargs="*",
+        choices=list(CORPUS),
+        default=None,
+        help="Documents à traiter (tous par défaut)."
+    )
+    parser.add_argument(
+        "--stub-models",
+        action="store_true",
+        help="Utiliser des modèles de substitution NumPy au lieu de YOLO et du Table Transformer."
+    )
+    parser.add_argument("--hot-paths-only", action="store_true", help="Ne lancer que les micro-mesures.")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir)
+    report = {
+        "parameters": vars(args),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documents": {},
+        "stages": {},
+    }
+
+    if not args.hot_paths_only:
+        kinds = args.kinds or list(CORPUS)
+        if shutil.which("tesseract") is None:
+            skipped = [kind for kind in kinds if kind in OCR_ONLY]
+            if skipped:
+                logger.warning(f"Tesseract introuvable : documents ignorés (OCR obligatoire) : {', '.join(skipped)}")
+            kinds = [kind for kind in kinds if kind not in OCR_ONLY]
+
+        logger.info(f"Génération du corpus synthétique ({args.pages} page(s) par document)...")
+        paths = generate_corpus(work_dir / "corpus", pages=args.pages, seed=args.seed, kinds=kinds)
+
+        if args.stub_models:
+            use_stub_models()
+        report.update(run_documents(paths, work_dir / "output", repeat=args.repeat))
+
+    report["hot_paths"] = run_hot_paths(seed=args.seed)
+
+    report_path = work_dir / "report.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    _log_report(report)
+    logger.info(f"Rapport : {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# kai_kite/benchmarks/stubs.py
+"""
+Modèles de substitution pour les mesures sans poids de modèles.
+
+Ils ont la même interface que YOLO (ultralytics) et que le Table Transformer
+avec son processeur d'image, mais détectent les blocs et les lignes de tableau
+par de simples projections NumPy de l'encre. Le reste du pipeline (rendu, OCR,
+affectation des mots, linéarisation, JSON) tourne donc à l'identique, ce qui
+permet de mesurer ses chemins critiques en intégration continue.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+INK_THRESHOLD = 128
+
+
+def _ink(image) -> np.ndarray:
+    """Masque booléen des pixels sombres d'une image."""
+    return np.asarray(image.convert("L")) < INK_THRESHOLD
+
+
+def _runs(mask: np.ndarray, max_gap: int = 0) -> list:
+    """Intervalles [début, fin) des suites de True, en fusionnant les trous d'au plus `max_gap`."""
+    index = np.flatnonzero(mask)
+    if not len(index):
+        return []
+    breaks = np.flatnonzero(np.diff(index) > max_gap + 1)
+    starts = np.concatenate([[index[0]], index[breaks + 1]])
+    ends = np.concatenate([index[breaks], [index[-1]]]) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _dilate_rows(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Étend le masque verticalement (tolère les lignes légèrement inclinées des scans)."""
+    dilated = mask.copy()
+    for shift in range(1, radius + 1):
+        dilated[shift:] |= mask[:-shift]
+        dilated[:-shift] |= mask[shift:]
+    return dilated
+
+
+def _long_lines(ink: np.ndarray, axis: int, min_fill: float, radius: int) -> list:
+    """Positions des traits qui couvrent au moins `min_fill` de l'image (axis 1 : horizontaux)."""
+    mask = _dilate_rows(ink, radius) if axis == 1 else _dilate_rows(ink.T, radius).T
+    fill = mask.mean(axis=axis)
+    return [(start + end) / 2 for start, end in _runs(fill >= min_fill, max_gap=2)]
+
+
+class StubLayoutModel:
+    """
+    Substitut de YOLO : les blocs d'encre séparés par des interlignes sont des
+    boîtes ; un bloc traversé de longs traits horizontaux est un tableau, le
+    premier bloc de la page est un titre, les autres sont du texte.
+    """
+
+    names = {0: "Text", 1: "Title", 2: "Table"}
+
+    def __call__(self, images, verbose: bool = False):
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+        return [SimpleNamespace(boxes=self._detect(image)) for image in images]
+
+    def _detect(self, image) -> list:
+        ink = _ink(image)
+        height = ink.shape[0]
+        boxes = []
+        for top, bottom in _runs(ink.any(axis=1), max_gap=max(2, height // 80)):
+            block = ink[top:bottom]
+            columns = _runs(block.any(axis=0))
+            if not columns or bottom - top < 3:
+                continue
+            left, right = columns[0][0], columns[-1][1]
+            width = max(1, right - left)
+            is_table = (block[:, left:right].mean(axis=1) > 0.9).sum() >= 2
+            cls = 2 if is_table else (1 if not boxes else 0)
+            boxes.append(SimpleNamespace(
+                conf=[0.95],
+                cls=[cls],
+                xyxy=[np.array([left, top, left + width, bottom], dtype=np.float64)],
+            ))
+        return boxes
+
+
+class StubTableImageProcessor:
+    """Substitut du processeur d'image du Table Transformer : les images passent telles quelles."""
+
+    def __call__(self, images, return_tensors: str = "pt"):
+        return {"pixel_values": list(images)}
+
+    def post_process_object_detection(self, outputs, threshold: float = 0.5, target_sizes=None):
+        return outputs.detections
+
+
+class StubTableModel:
+    """
+    Substitut du Table Transformer : les lignes et colonnes du tableau sont les
+    bandes entre ses traits horizontaux et verticaux ; la première ligne est l'en-tête.
+    """
+
+    config = SimpleNamespace(id2label={0: "table", 1: "table column", 2: "table row", 3: "table column header"})
+
+    def __call__(self, pixel_values, **kwargs):
+        return SimpleNamespace(detections=[self._detect(image) for image in pixel_values])
+
+    def eval(self):
+        return self
+
+    def _detect(self, image) -> dict:
+        ink = _ink(image)
+        height, width = ink.shape
+        radius = max(1, height // 200)
+        row_lines = _long_lines(ink, axis=1, min_fill=0.6, radius=radius)
+        col_lines = _long_lines(ink, axis=0, min_fill=0.6, radius=radius)
+
+        boxes, labels = [[0, 0, width, height]], [0]
+        for x1, x2 in zip(col_lines, col_lines[1:]):
+            boxes.append([x1, 0, x2, height])
+            labels.append(1)
+        for y1, y2 in zip(row_lines, row_lines[1:]):
+            boxes.append([0, y1, width, y2])
+            labels.append(2)
+        if len(row_lines) > 1:
+            boxes.append([0, row_lines[0], width, row_lines[1]])
+            labels.append(3)
+
+        return {
+            "scores": np.ones(len(boxes)),
+            "labels": np.asarray(labels),
+            "boxes": np.asarray(boxes, dtype=np.float64),
+        }
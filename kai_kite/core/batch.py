@@ -0,0 +1,274 @@
+# kai_kite/core/batch.py
+"""
+Passage réparti sur plusieurs machines qui partagent les dossiers d'entrée et
+de sortie (volume NFS) :
+
+- `--shard i/N` : chaque nœud traite une part fixe des documents (répartition
+  par empreinte du nom de fichier) ;
+- `--claim` : chaque nœud réserve les documents un par un (voir `WorkClaims`) ;
+  les documents d'un nœud arrêté sont repris par les autres après expiration
+  de sa réservation.
+
+Chaque nœud tient un journal dans `.kai_kite/runs/<passage>/nodes/`. À la fin de
+chaque nœud, les journaux de tous les nœuds sont fusionnés dans le rapport du
+passage (run.profile.json) : le dernier nœud à terminer écrit le rapport complet.
+"""
+import argparse
+import hashlib
+import json
+import socket
+import time
+from collections import Counter
+from pathlib import Path
+
+from .pipeline import CACHE_DIR, MANIFEST_PATH, RUN_PROFILE_PATH, process_document
+from .worker_pool import process_documents_parallel
+from ..utils.cache import ProcessingManifest, atomic_write_json, config_fingerprint
+from ..utils.claims import WorkClaims, node_name
+from ..utils.config import get_config
+from ..utils.logging import logger
+from ..utils.profiling import build_run_summary, write_profile
+
+RUNS_DIR = CACHE_DIR / "runs"
+
+# Statut retenu quand plusieurs nœuds ont vu le même document (relance d'un passage)
+STATUS_PRIORITY = {"done": 0, "skipped": 1, "failed": 2}
+
+
+def parse_shard(value: str) -> tuple:
+    """Analyse `i/N` (1 <= i <= N) et renvoie (index à partir de 0, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Part invalide : '{value}' (attendu : i/N, par exemple 2/4)")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Part invalide : '{value}' (il faut 1 <= i <= N)")
+    return index - 1, count
+
+
+def shard_of(name: str, count: int) -> int:
+    """Part d'un document : stable d'une machine à l'autre (empreinte du nom, pas du chemin)."""
+    return int(hashlib.sha256(name.encode("utf-8")).hexdigest()[:16], 16) % count
+
+
+def default_run_id(names: list, config_hash: str) -> str:
+    """
+    Identifiant de passage commun aux nœuds lancés sur les mêmes documents avec la
+    même configuration, sans concertation. Relancer un passage le reprend.
+    """
+    payload = config_hash + "\n" + "\n".join(sorted(names))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+class NodeRun:
+    """Journal d'un nœud pour un passage : documents traités, statut et rapports de profilage."""
+
+    def __init__(self, run_dir: Path, mode: str, shard: tuple = None):
+        self.path = run_dir / "nodes" / f"{node_name()}.json"
+        self.data = {
+            "node": node_name(),
+            "host": socket.gethostname(),
+            "mode": mode,
+            "shard": f"{shard[0] + 1}/{shard[1]}" if shard else None,
+            "started_at": time.time(),
+            "finished_at": None,
+            "documents": {},
+        }
+        self.save()
+
+    def record(self, name: str, status: str, profile: dict = None, error: str = None):
+        entry = {"status": status, "finished_at": time.time()}
+        if profile is not None:
+            entry["profile"] = profile
+        if error is not None:
+            entry["error"] = error
+        self.data["documents"][name] = entry
+        self.save()
+
+    def finish(self):
+        self.data["finished_at"] = time.time()
+        self.save()
+
+    def save(self):
+        atomic_write_json(self.path, self.data)
+
+
+def merge_run(run_dir: Path, names: list, run_id: str) -> dict:
+    """
+    Fusionne les journaux des nœuds d'un passage en un seul rapport : la synthèse
+    de profilage de tous les documents (`build_run_summary`), complétée d'une clé
+    "run" (statut des documents, nœuds, passage complet ou non).
+    """
+    nodes = []
+    for path in sorted((run_dir / "nodes").glob("*.json")):
+        try:
+            nodes.append(json.loads(path.read_text(encoding="utf-8")))
+        except json.JSONDecodeError:
+            logger.warning(f"Journal de nœud illisible, ignoré : {path}")
+
+    documents = {}
+    for node in nodes:
+        for name, entry in node["documents"].items():
+            known = documents.get(name)
+            if known is None or STATUS_PRIORITY[entry["status"]] < STATUS_PRIORITY[known["status"]]:
+                documents[name] = {**entry, "node": node["node"]}
+
+    now = time.time()
+    started = min((node["started_at"] for node in nodes), default=now)
+    finished = max((node["finished_at"] or now for node in nodes), default=now)
+    profiles = [entry["profile"] for entry in documents.values() if "profile" in entry]
+    summary = build_run_summary(profiles, finished - started)
+
+    missing = sorted(set(names) - set(documents))
+    summary["run"] = {
+        "run_id": run_id,
+        "complete": not missing and all(node["finished_at"] for node in nodes),
+        "documents_expected": len(names),
+        "status": dict(Counter(entry["status"] for entry in documents.values())),
+        "missing": missing,
+        "failed": {name: entry.get("error") for name, entry in documents.items() if entry["status"] == "failed"},
+        "nodes": {
+            node["node"]: {
+                "host": node["host"],
+                "mode": node["mode"],
+                "shard": node["shard"],
+                "documents": sum(1 for entry in documents.values() if entry["node"] == node["node"]),
+                "pages": sum(entry["profile"]["page_count"] for entry in documents.values()
+                             if entry["node"] == node["node"] and "profile" in entry),
+                "wall_s": round((node["finished_at"] or now) - node["started_at"], 3),
+                "finished": node["finished_at"] is not None,
+            }
+            for node in nodes
+        },
+    }
+    return summary
+
+
+def _process_files(files: list, workers: int, force: bool, manifest: ProcessingManifest) -> dict:
+    """
+    Traite des documents sur ce nœud.
+
+    Returns:
+        {nom du document: (statut, rapport de profilage, erreur)}
+    """
+    if workers > 1:
+        failures = {}
+        try:
+            profiles = {p["source_file"]: p for p in process_documents_parallel(files, workers, force, failures)}
+        except Exception as e:
+            logger.error(f"Erreur du pool de workers : {e}")
+            return {f.name: ("failed", None, str(e)) for f in files}
+        return {f.name: ("done", profiles[f.name], None) if f.name in profiles
+                else ("failed", None, failures[f.name]) if f.name in failures
+                else ("skipped", None, None)
+                for f in files}
+
+    results = {}
+    for file_path in files:
+        logger.info(f"--- Début du traitement pour le fichier : {file_path.name} ---")
+        try:
+            profile = process_document(file_path, manifest=manifest, force=force)
+        except Exception as e:
+            logger.error(f"Une erreur est survenue lors du traitement de {file_path.name}: {e}")
+            results[file_path.name] = ("failed", None, str(e))
+            continue
+        results[file_path.name] = ("done", profile, None) if profile is not None else ("skipped", None, None)
+        logger.info(f"--- Fin du traitement pour le fichier : {file_path.name} ---")
+    return results
+
+
+def _run_shard(files: list, shard: tuple, workers: int, force: bool, node: NodeRun):
+    index, count = shard
+    mine = [file_path for file_path in files if shard_of(file_path.name, count) == index]
+    logger.info(f"Part {index + 1}/{count} : {len(mine)} document(s) sur {len(files)}.")
+    manifest = ProcessingManifest(MANIFEST_PATH)
+    for name, (status, profile, error) in _process_files(mine, workers, force, manifest).items():
+        node.record(name, status, profile, error)
+    manifest.save()
+
+
+def _run_claimed(files: list, claims: WorkClaims, workers: int, force: bool, node: NodeRun, poll_s: float):
+    """
+    Réserve et traite les documents jusqu'à ce qu'ils soient tous terminés, par ce
+    nœud ou par un autre. Tant que des documents sont réservés ailleurs, le nœud
+    attend : il reprendra ceux d'un nœud arrêté dès que leur réservation expire.
+    """
+    manifest = ProcessingManifest(MANIFEST_PATH)
+    batch_size = max(1, workers)
+    pending = list(files)
+    claims.start_heartbeat()
+    try:
+        while pending:
+            batch, waiting = [], []
+            for file_path in pending:
+                if claims.is_done(file_path.name):
+                    continue
+                if len(batch) < batch_size and claims.claim(file_path.name):
+                    batch.append(file_path)
+                else:
+                    waiting.append(file_path)
+
+            if batch:
+                for name, (status, profile, error) in _process_files(batch, workers, force, manifest).items():
+                    node.record(name, status, profile, error)
+                    claims.complete(name, status)
+            elif waiting:
+                logger.info(f"{len(waiting)} document(s) en cours sur d'autres nœuds : "
+                            f"nouvelle tentative dans {poll_s:g} s.")
+                time.sleep(poll_s)
+            pending = waiting
+    finally:
+        claims.stop_heartbeat()
+        # Après une interruption, les documents réservés sont rendus tout de suite
+        claims.release_all()
+        manifest.save()
+
+
+def run_batch(files: list, workers: int = 1, force: bool = False, shard: tuple = None, claim: bool = False,
+              run_id: str = None) -> dict:
+    """
+    Traite la part de ce nœud d'un passage réparti, puis écrit le rapport fusionné
+    de tous les nœuds dans run.profile.json.
+
+    Args:
+        files: Tous les documents du passage (la même liste sur chaque nœud).
+        workers: Nombre de processus workers de ce nœud.
+        force: Retraiter les documents même s'ils sont à jour.
+        shard: (index, N) pour une répartition fixe (`parse_shard`).
+        claim: Répartition dynamique par réservation des documents.
+        run_id: Identifiant du passage (par défaut, dérivé des documents et de la configuration).
+
+    Returns:
+        Le rapport fusionné du passage.
+    """
+    config = get_config()
+    batch = config.get('batch', {})
+    names = [file_path.name for file_path in files]
+    run_id = run_id or default_run_id(names, config_fingerprint(config))
+    run_dir = RUNS_DIR / run_id
+    node = NodeRun(run_dir, "claim" if claim else "shard", shard)
+    logger.info(f"Passage {run_id} : nœud {node.data['node']} ({node.data['mode']}).")
+
+    try:
+        if claim:
+            claims = WorkClaims(run_dir / "claims", lease_s=batch.get('lease_s', 600))
+            _run_claimed(files, claims, workers, force, node, batch.get('poll_s', 30))
+        else:
+            _run_shard(files, shard or (0, 1), workers, force, node)
+    finally:
+        node.finish()
+
+    summary = merge_run(run_dir, names, run_id)
+    write_profile(RUN_PROFILE_PATH, summary)
+    run = summary["run"]
+    if run["complete"]:
+        logger.info(f"Passage {run_id} complet : {summary['documents']} document(s) traité(s), "
+                    f"{summary['pages']} page(s) en {summary['wall_s']:.1f} s sur {len(run['nodes'])} nœud(s) ; "
+                    f"statuts : {run['status']}")
+    else:
+        logger.info(f"Passage {run_id} : {sum(run['status'].values())}/{run['documents_expected']} document(s) "
+                    f"terminé(s), d'autres nœuds sont encore en cours.")
+    if run["failed"]:
+        logger.warning(f"Documents en échec : {', '.join(run['failed'])}")
+    logger.info(f"Rapport du passage : {RUN_PROFILE_PATH}")
+    return summary
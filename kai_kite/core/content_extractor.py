@@ -3,150 +3,472 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="torch.nn.modules.module")
 
 from PIL import Image
+import numpy as np
 import pytesseract
 import torch
 
-def extract_content_from_boxes(page_image: Image.Image, detected_boxes, layout_model, conf_threshold, table_models) -> list:
+from .ocr_engines import get_ocr_engine
+
+# Classes dont le contenu est lu directement dans l'OCR de la page
+TEXT_CLASSES = ["Text", "Title", "Section-header", "List-item", "Page-header", "Page-footer"]
+# Confiance OCR minimale (exclusive) pour garder un mot
+MIN_WORD_CONFIDENCE = 60
+
+def extract_content_from_boxes(page_image: Image.Image, detected_boxes, layout_model, conf_threshold, table_models,
+                               table_threshold: float = 0.6, table_batch_size: int = 8, ocr_data: dict = None,
+                               table_structured_output: bool = False) -> list:
     """
     Extrait le contenu (texte ou tableau) de toutes les boîtes détectées sur une page.
-    OPTIMISÉ : L'OCR est fait une seule fois pour toute la page.
+    OPTIMISÉ : L'OCR est fait une seule fois pour toute la page, et tous les tableaux
+    de la page passent ensemble (par lots de `table_batch_size`) dans le Table Transformer.
+
+    Si `ocr_data` est fourni (par exemple la couche texte native d'un PDF, au même
+    format que `pytesseract.image_to_data`), l'OCR de la page n'est pas exécuté.
+    Le texte des tableaux est lui aussi lu dans les mots de la page : les tableaux
+    ne coûtent aucun OCR supplémentaire.
+
+    Les étapes (`select_boxes`, `extract_texts`, `extract_tables`, `assemble_elements`)
+    sont aussi exposées séparément pour le pipeline par étapes.
     """
-    extracted_elements = []
-    
     # --- OPTIMISATION : Exécuter l'OCR une seule fois sur toute la page ---
-    try:
-        ocr_data = pytesseract.image_to_data(page_image, lang='fra', output_type=pytesseract.Output.DICT)
-    except pytesseract.TesseractNotFoundError:
-        print("\n\nERREUR CRITIQUE : Tesseract n'est pas installé ou n'est pas dans le PATH.")
-        raise
-    except Exception as e:
-        print(f"Une erreur est survenue pendant l'OCR de la page : {e}")
-        ocr_data = None # On continue sans OCR si une erreur survient
+    if ocr_data is None:
+        ocr_data = ocr_page(page_image)
     # --------------------------------------------------------------------
 
     table_image_processor, table_model = table_models
 
+    kept_boxes = select_boxes(detected_boxes, layout_model, conf_threshold)
+    texts_by_index, table_words = extract_texts(kept_boxes, ocr_data)
+    tables_by_index = extract_tables(
+        page_image.crop,
+        kept_boxes,
+        table_image_processor,
+        table_model,
+        threshold=table_threshold,
+        batch_size=table_batch_size,
+        table_words=table_words,
+        structured=table_structured_output,
+    )
+    return assemble_elements(kept_boxes, texts_by_index, tables_by_index)
+
+
+def select_boxes(detected_boxes, layout_model, conf_threshold) -> list:
+    """
+    Garde les boîtes suffisamment fiables, avec leur classe et leurs coordonnées.
+
+    Returns:
+        Une liste de tuples (classe, confiance, [x1, y1, x2, y2]).
+    """
+    kept_boxes = []
     for box in detected_boxes:
-        if float(box.conf[0]) < conf_threshold:
+        confidence = float(box.conf[0])
+        if confidence < conf_threshold:
             continue
-
         class_name = layout_model.names[int(box.cls[0])]
-        coords = box.xyxy[0].tolist()
+        kept_boxes.append((class_name, confidence, box.xyxy[0].tolist()))
+    return kept_boxes
+
+
+def extract_texts(kept_boxes: list, ocr_data: dict) -> tuple:
+    """
+    Assemble le texte de toutes les boîtes de texte d'une page, en une seule passe vectorisée.
+
+    Returns:
+        Un tuple (textes, mots des tableaux) :
+        - {index de la boîte dans `kept_boxes`: texte} pour les boîtes de texte ;
+        - {index de la boîte: mots préparés, en coordonnées de la page} pour les
+          tableaux, réutilisés par `extract_tables` à la place d'un second OCR.
+    """
+    # Les mots de l'OCR sont convertis une seule fois en tableaux NumPy pour la page
+    ocr_words = _prepare_ocr_words(ocr_data)
+
+    text_indices = [i for i, (class_name, _, _) in enumerate(kept_boxes) if class_name in TEXT_CLASSES]
+    box_texts = _assign_words_to_boxes(ocr_words, [kept_boxes[i][2] for i in text_indices])
+
+    table_words = {
+        i: ocr_words for i, (class_name, _, _) in enumerate(kept_boxes)
+        if class_name == "Table" and ocr_words is not None
+    }
+    return dict(zip(text_indices, box_texts)), table_words
+
+
+def extract_texts_by_region(kept_boxes: list, crop_region, page_size: tuple, margin: int = 10) -> tuple:
+    """
+    Assemble le texte des boîtes de texte en n'OCRisant que leurs régions,
+    rendues à la résolution d'OCR. Utile quand la page entière n'a pas été rendue
+    à cette résolution (pages peu denses : moins de pixels à rastériser et à OCRiser).
+
+    Chaque boîte ne reçoit que les mots de sa propre région, ce qui évite les
+    doublons quand deux boîtes se chevauchent. Les régions des tableaux sont
+    OCRisées de la même façon, une seule fois.
+
+    Args:
+        kept_boxes: Les boîtes retenues (voir `select_boxes`).
+        crop_region: Fonction qui rend une région [x1, y1, x2, y2] de la page.
+        page_size: (largeur, hauteur) de la page à la résolution d'OCR.
+        margin: Marge (en pixels) ajoutée autour de chaque boîte avant l'OCR.
+
+    Returns:
+        Un tuple (textes, mots des tableaux), comme `extract_texts`.
+    """
+    texts_by_index = {}
+    table_words = {}
+    for i, (class_name, _, coords) in enumerate(kept_boxes):
+        if class_name not in TEXT_CLASSES and class_name != "Table":
+            continue
+        # La marge ne sort pas de la page : `Image.crop` comblerait le dehors de noir,
+        # que l'OCR lirait comme du bruit
+        x1, y1 = max(0, coords[0] - margin), max(0, coords[1] - margin)
+        region = [x1, y1, min(page_size[0], coords[2] + margin), min(page_size[1], coords[3] + margin)]
+
+        # Replacer les mots de la région dans l'espace de la page
+        words = _offset_words(_prepare_ocr_words(ocr_page(crop_region(region))), x1, y1)
+        if class_name == "Table":
+            if words is not None:
+                table_words[i] = words
+        else:
+            texts_by_index[i] = _get_text_in_box(words, coords)
+    return texts_by_index, table_words
+
+
+def extract_tables(crop_region, kept_boxes: list, image_processor, model,
+                   threshold: float = 0.6, batch_size: int = 8, table_words: dict = None,
+                   structured: bool = False) -> dict:
+    """
+    Extrait le contenu de tous les tableaux d'une page, reconnus ensemble en batch.
+
+    Args:
+        crop_region: Fonction qui renvoie l'image d'une région [x1, y1, x2, y2] de la
+            page à la résolution d'OCR (par exemple `page_image.crop`).
+        table_words: Les mots déjà lus pour chaque tableau (voir `extract_texts`).
+            Un tableau sans mots est OCRisé sur son image.
+        structured: Joindre au résultat la grille de cellules du tableau.
+
+    Returns:
+        Un dictionnaire {index de la boîte dans `kept_boxes`: tableau}, où chaque
+        tableau est un dictionnaire {"content": texte linéarisé, "table": grille ou None}.
+    """
+    table_words = table_words or {}
+    table_indices = [i for i, (class_name, _, _) in enumerate(kept_boxes) if class_name == "Table"]
+    table_contents = _extract_tables_from_boxes(
+        crop_region,
+        [kept_boxes[i][2] for i in table_indices],
+        [table_words.get(i) for i in table_indices],
+        image_processor,
+        model,
+        threshold=threshold,
+        batch_size=batch_size,
+        structured=structured,
+    )
+    return dict(zip(table_indices, table_contents))
+
+
+def assemble_elements(kept_boxes: list, texts_by_index: dict, tables_by_index: dict) -> list:
+    """Construit les éléments extraits d'une page, dans l'ordre des boîtes détectées."""
+    extracted_elements = []
+
+    for i, (class_name, confidence, coords) in enumerate(kept_boxes):
         content = ""
+        table = None
 
-        if class_name in ["Text", "Title", "Section-header", "List-item"]:
+        if class_name in TEXT_CLASSES:
             # On utilise les données de l'OCR global
-            content = _get_text_in_box(ocr_data, coords)
+            content = texts_by_index.get(i, "")
         elif class_name == "Table":
-            # L'extraction de tableau reste une opération sur une image rognée
-            content = _extract_table_from_box(page_image, coords, table_image_processor, table_model)
+            content = tables_by_index.get(i, {}).get("content", "")
+            table = tables_by_index.get(i, {}).get("table")
         elif class_name == "Picture" :
             print(f"### class_name non traité : <<<---{class_name}--->>>")
-        elif class_name == "Page-header" :
-            content = _get_text_in_box(ocr_data, coords)
-        elif class_name == "Page-footer" :
-            content = _get_text_in_box(ocr_data, coords)
         else :
             print(f"### class_name OUBLIÉ : <<<---{class_name}--->>>")
 
         if content:
-            extracted_elements.append({
+            element = {
                 # "page" sera ajouté dans le pipeline principal
                 "element_type": class_name,
-                "confidence": float(box.conf[0]),
+                "confidence": confidence,
                 "coordinates": coords,
                 "content": content
-            })
+            }
+            if table is not None:
+                element["table"] = table
+            extracted_elements.append(element)
             
     return extracted_elements
 
 
-def _get_text_in_box(ocr_data: dict, box_coords: list) -> str:
+def ocr_page(page_image: Image.Image):
     """
-    Helper qui assemble le texte présent à l'intérieur d'une boîte
-    à partir des données OCR de la page entière.
+    Exécute l'OCR Tesseract sur une page entière (ou une région), avec le moteur
+    choisi dans la section `ocr` de la configuration (voir `ocr_engines`).
+
+    Returns:
+        Les données OCR au format `pytesseract.Output.DICT`, ou None en cas d'erreur.
     """
-    if not ocr_data:
-        return ""
-        
+    try:
+        return get_ocr_engine().image_to_data(page_image)
+    except pytesseract.TesseractNotFoundError:
+        print("\n\nERREUR CRITIQUE : Tesseract n'est pas installé ou n'est pas dans le PATH.")
+        raise
+    except Exception as e:
+        print(f"Une erreur est survenue pendant l'OCR de la page : {e}")
+        return None # On continue sans OCR si une erreur survient
+
+
+def _prepare_ocr_words(ocr_data: dict):
+    """
+    Convertit la sortie de `pytesseract.image_to_data` en tableaux NumPy :
+    centres des mots, textes, dans l'ordre de lecture de Tesseract.
+    Seuls les mots de confiance > MIN_WORD_CONFIDENCE sont conservés.
+
+    Returns:
+        Un dictionnaire {"cx", "cy", "text"} ou None si aucune donnée OCR.
+    """
+    if not ocr_data or not ocr_data.get('text'):
+        return None
+
+    # int(conf) tronquait les confiances décimales : np.trunc conserve ce comportement
+    conf = np.trunc(np.asarray(ocr_data['conf'], dtype=np.float64))
+    keep = conf > MIN_WORD_CONFIDENCE
+
+    left = np.asarray(ocr_data['left'], dtype=np.float64)[keep]
+    top = np.asarray(ocr_data['top'], dtype=np.float64)[keep]
+    width = np.asarray(ocr_data['width'], dtype=np.float64)[keep]
+    height = np.asarray(ocr_data['height'], dtype=np.float64)[keep]
+
+    return {
+        "cx": left + width / 2,
+        "cy": top + height / 2,
+        "text": np.asarray(ocr_data['text'], dtype=object)[keep],
+    }
+
+
+def _offset_words(ocr_words, dx: float, dy: float):
+    """Translate les centres des mots préparés (par exemple d'un repère de région vers celui de la page)."""
+    if ocr_words is None:
+        return None
+    return {"cx": ocr_words["cx"] + dx, "cy": ocr_words["cy"] + dy, "text": ocr_words["text"]}
+
+
+def _words_in_box(ocr_words, box_coords: list):
+    """Ne garde que les mots préparés dont le centre est dans la boîte."""
+    if ocr_words is None:
+        return None
     x1, y1, x2, y2 = box_coords
-    text_parts = []
-    
-    for i in range(len(ocr_data['text'])):
-        # On ne garde que les mots avec une confiance suffisante
-        if int(ocr_data['conf'][i]) > 60:
-            # Coordonnées du mot trouvé par l'OCR
-            w_x, w_y, w_w, w_h = ocr_data['left'][i], ocr_data['top'][i], ocr_data['width'][i], ocr_data['height'][i]
-            
-            # On calcule le centre du mot
-            word_center_x = w_x + w_w / 2
-            word_center_y = w_y + w_h / 2
-            
-            # Si le centre du mot est dans notre boîte, on le garde
-            if (x1 < word_center_x < x2) and (y1 < word_center_y < y2):
-                text_parts.append(ocr_data['text'][i])
-                
-    return " ".join(text_parts).strip()
+    cx, cy = ocr_words["cx"], ocr_words["cy"]
+    keep = (x1 < cx) & (cx < x2) & (y1 < cy) & (cy < y2)
+    return {"cx": cx[keep], "cy": cy[keep], "text": ocr_words["text"][keep]}
+
+
+def _assign_words_to_boxes(ocr_words, boxes_coords: list) -> list:
+    """
+    Assemble en une seule passe vectorisée le texte de plusieurs boîtes :
+    un mot appartient à une boîte si son centre est strictement à l'intérieur.
 
-def _extract_table_from_box(page_image: Image.Image, box_coords: list, image_processor, model) -> str:
+    Args:
+        ocr_words: Les mots préparés par `_prepare_ocr_words` (ou None).
+        boxes_coords: Les coordonnées [x1, y1, x2, y2] des boîtes.
+
+    Returns:
+        Le texte de chaque boîte, dans l'ordre des boîtes et l'ordre de lecture des mots.
+    """
+    if ocr_words is None or not boxes_coords:
+        return ["" for _ in boxes_coords]
+
+    boxes = np.asarray(boxes_coords, dtype=np.float64).reshape(-1, 4)
+    cx, cy = ocr_words["cx"], ocr_words["cy"]
+
+    # Matrice (boîtes x mots) : le centre du mot est-il dans la boîte ?
+    inside = (
+        (boxes[:, 0:1] < cx) & (cx < boxes[:, 2:3]) &
+        (boxes[:, 1:2] < cy) & (cy < boxes[:, 3:4])
+    )
+
+    texts = ocr_words["text"]
+    return [" ".join(texts[np.flatnonzero(row)]).strip() for row in inside]
+
+
+def _get_text_in_box(ocr_words, box_coords: list) -> str:
     """
-    (Version OPTIMISÉE) Extrait la structure d'un tableau.
-    L'OCR est fait une seule fois sur l'image du tableau.
+    Helper qui assemble le texte présent à l'intérieur d'une boîte
+    à partir des mots OCR préparés de la page entière.
     """
+    return _assign_words_to_boxes(ocr_words, [box_coords])[0]
+
+def _extract_tables_from_boxes(crop_region, tables_coords: list, tables_words: list, image_processor, model,
+                               threshold: float = 0.6, batch_size: int = 8, structured: bool = False) -> list:
+    """
+    Extrait la structure de tous les tableaux d'une page.
+    Les images rognées des tableaux passent par lots dans le Table Transformer,
+    puis chaque résultat est renvoyé au post-traitement de son tableau, avec les
+    mots de la page qui tombent dans le tableau, ramenés dans le repère de l'image rognée.
+
+    Returns:
+        Le résultat de chaque tableau ({"content", "table"}), dans l'ordre de `tables_coords`.
+    """
+    if not tables_coords:
+        return []
+
+    empty = {"content": "", "table": None}
+    table_images = [crop_region(coords) for coords in tables_coords]
     try:
-        table_image = page_image.crop(box_coords)
-        
-        # --- L'OCR est fait une seule fois sur l'image du tableau ---
+        structures = _recognize_table_structures(table_images, image_processor, model, threshold, batch_size)
+    except Exception as e:
+        print(f"Erreur lors de la reconnaissance des tableaux : {e}")
+        return [dict(empty) for _ in tables_coords]
+
+    id2label = getattr(getattr(model, "config", None), "id2label", {}) or {}
+    contents = []
+    for coords, words, table_image, results in zip(tables_coords, tables_words, table_images, structures):
         try:
-            table_ocr_data = pytesseract.image_to_data(table_image, lang='fra', output_type=pytesseract.Output.DICT)
-        except Exception as ocr_error:
-            print(f"Avertissement : Erreur OCR sur un tableau : {ocr_error}")
-            table_ocr_data = None
-        # -----------------------------------------------------------
-
-        inputs = image_processor(images=table_image, return_tensors="pt")
-        outputs = model(**inputs)
-        target_sizes = torch.tensor([table_image.size[::-1]])
-        results = image_processor.post_process_object_detection(outputs, threshold=0.7, target_sizes=target_sizes)[0]
-
-        cells = []
-        for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
-            cell_coords = [round(i, 2) for i in box.tolist()]
-            
-            # On utilise les données de l'OCR du tableau pour extraire le texte de la cellule
-            cell_text = _get_text_in_box(table_ocr_data, cell_coords)
-            
-            cells.append({'box': cell_coords, 'text': cell_text})
+            if words is not None:
+                crop_words = _offset_words(_words_in_box(words, coords), -coords[0], -coords[1])
+            else:
+                # Pas de mots de page disponibles pour ce tableau : OCR de son image
+                crop_words = _prepare_ocr_words(ocr_page(table_image))
+            contents.append(_extract_table_content(results, crop_words, id2label, structured))
+        except Exception as e:
+            print(f"Erreur lors de l'extraction du tableau : {e}")
+            contents.append(dict(empty))
+    return contents
+
+
+def _recognize_table_structures(table_images: list, image_processor, model, threshold: float, batch_size: int) -> list:
+    """
+    Fait passer les images de tableaux dans le Table Transformer par lots.
+    Le processeur d'image redimensionne et complète (padding) les images d'un lot
+    à la même taille ; l'inférence se fait sans autograd.
+
+    Returns:
+        Les détections post-traitées (scores, labels, boxes) de chaque image,
+        en coordonnées de l'image du tableau.
+    """
+    structures = []
+    with torch.inference_mode():
+        for start in range(0, len(table_images), max(1, batch_size)):
+            batch = table_images[start:start + batch_size]
+            inputs = image_processor(images=batch, return_tensors="pt")
+            outputs = model(**inputs)
+            target_sizes = torch.tensor([image.size[::-1] for image in batch])
+            structures.extend(
+                image_processor.post_process_object_detection(outputs, threshold=threshold, target_sizes=target_sizes)
+            )
+    return structures
+
+
+def _extract_table_content(results: dict, crop_words, id2label: dict, structured: bool = False) -> dict:
+    """
+    Assemble le contenu d'un tableau à partir des détections du Table Transformer
+    et des mots du tableau (en coordonnées de l'image rognée).
+
+    Si TATR a détecté des lignes et des colonnes ("table row" / "table column"),
+    la grille est construite à partir d'elles ; sinon, on retombe sur le
+    regroupement des détections par position verticale.
+
+    Returns:
+        Un dictionnaire {"content": texte linéarisé, "table": grille ou None}.
+    """
+    boxes = [[round(i, 2) for i in box.tolist()] for box in results["boxes"]]
+    labels = [id2label.get(int(label), str(int(label))) for label in results["labels"]]
+
+    rows = [box for box, label in zip(boxes, labels) if label == "table row"]
+    columns = [box for box, label in zip(boxes, labels) if label == "table column"]
+    headers = [box for box, label in zip(boxes, labels) if label == "table column header"]
+
+    if rows and columns:
+        grid = _build_table_grid(rows, columns, headers, crop_words)
+        return {"content": _linearize_grid(grid["rows"]), "table": grid if structured else None}
+
+    # On utilise les mots du tableau pour extraire, en une passe, le texte de toutes les cellules
+    cell_texts = _assign_words_to_boxes(crop_words, boxes)
+    cells = [{'box': box, 'text': text} for box, text in zip(boxes, cell_texts)]
+    return {"content": _linearize_table(cells), "table": None}
+
+
+def _band_index(centers: np.ndarray, bands: np.ndarray) -> np.ndarray:
+    """
+    Affecte chaque centre à une bande (ligne ou colonne), en O(n log b) :
+    les bandes, triées, sont séparées à mi-chemin entre leurs centres ; un centre
+    hors de l'étendue des bandes reçoit -1.
+
+    Args:
+        centers: Les coordonnées (x ou y) des centres des mots.
+        bands: Les intervalles [début, fin] des bandes, triés par centre.
+    """
+    mids = (bands[:, 0] + bands[:, 1]) / 2
+    boundaries = (mids[1:] + mids[:-1]) / 2
+    index = np.searchsorted(boundaries, centers)
+    outside = (centers < bands[:, 0].min()) | (centers > bands[:, 1].max())
+    index[outside] = -1
+    return index
+
+
+def _build_table_grid(rows: list, columns: list, headers: list, crop_words) -> dict:
+    """
+    Construit la matrice des cellules d'un tableau à partir des lignes et colonnes
+    détectées par TATR. Les lignes et colonnes sont triées (O(n log n)), puis chaque
+    mot est placé par recherche dichotomique dans sa ligne et sa colonne.
+
+    Returns:
+        Un dictionnaire {"rows": matrice de textes, "header_rows": index des lignes d'en-tête}.
+    """
+    row_boxes = np.asarray(sorted(rows, key=lambda b: b[1] + b[3]), dtype=np.float64)
+    col_boxes = np.asarray(sorted(columns, key=lambda b: b[0] + b[2]), dtype=np.float64)
+    cells = [[[] for _ in range(len(col_boxes))] for _ in range(len(row_boxes))]
+
+    if crop_words is not None and len(crop_words["text"]):
+        row_index = _band_index(crop_words["cy"], row_boxes[:, [1, 3]])
+        col_index = _band_index(crop_words["cx"], col_boxes[:, [0, 2]])
+        # Les mots restent dans l'ordre de lecture au sein de chaque cellule
+        for text, r, c in zip(crop_words["text"], row_index, col_index):
+            if r >= 0 and c >= 0:
+                cells[r][c].append(text)
+
+    row_centers = (row_boxes[:, 1] + row_boxes[:, 3]) / 2
+    header_rows = sorted({
+        int(r) for header in headers
+        for r in np.flatnonzero((header[1] <= row_centers) & (row_centers <= header[3]))
+    })
+
+    return {
+        "rows": [[" ".join(words).strip() for words in row] for row in cells],
+        "header_rows": header_rows,
+    }
+
+
+def _linearize_grid(grid_rows: list) -> str:
+    """Convertit une matrice de cellules en texte, une ligne non vide par "Ligne : [ ... ]"."""
+    lines = []
+    for row in grid_rows:
+        if not any(row):
+            continue
+        row_text = " | ".join(text.replace('\n', ' ') for text in row)
+        lines.append(f"Ligne : [ {row_text} ]")
+    return "\n".join(lines)
 
-        return _linearize_table(cells)
-        
-    except Exception as e:
-        print(f"Erreur lors de l'extraction du tableau : {e}")
-        return ""
 
 def _linearize_table(cells: list) -> str:
-    """Helper pour convertir une liste de cellules en une chaîne de caractères structurée."""
+    """
+    Helper pour convertir une liste de cellules en une chaîne de caractères structurée.
+    Les cellules sont triées par position verticale puis regroupées en lignes en un
+    seul passage (O(n log n)).
+    """
     if not cells:
         return ""
-    
+
     # Grouper les cellules par ligne en se basant sur leur position verticale
-    rows = {}
-    for cell in cells:
+    by_y = sorted(cells, key=lambda cell: (cell['box'][1] + cell['box'][3]) / 2)
+    rows = []
+    row_y = None
+    for cell in by_y:
         y_center = (cell['box'][1] + cell['box'][3]) / 2
-        found_row = False
-        for row_y in rows:
-            if abs(y_center - row_y) < 20: # Seuil de tolérance
-                rows[row_y].append(cell)
-                found_row = True
-                break
-        if not found_row:
-            rows[y_center] = [cell]
-
-    # Trier les lignes et les cellules, puis formater la sortie
-    sorted_rows = sorted(rows.items(), key=lambda item: item[0])
-    
+        if row_y is None or abs(y_center - row_y) >= 20: # Seuil de tolérance
+            rows.append([])
+            row_y = y_center
+        rows[-1].append(cell)
+
     linearized_text = ""
-    for _, row_cells in sorted_rows:
+    for row_cells in rows:
         sorted_cells = sorted(row_cells, key=lambda cell: cell['box'][0])
         row_text = " | ".join([cell['text'].replace('\n', ' ') for cell in sorted_cells])
         linearized_text += f"Ligne : [ {row_text} ]\n"
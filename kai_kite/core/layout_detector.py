@@ -1,4 +1,5 @@
 # kai_kite/core/layout_detector.py
+from typing import List
 from PIL import Image
 
 def detect_layout(page_image: Image.Image, layout_model):
@@ -12,5 +13,23 @@ def detect_layout(page_image: Image.Image, layout_model):
     Returns:
         Les boîtes de détection (un objet `ultralytics.engine.results.Boxes`).
     """
-    results = layout_model(page_image)
-    return results[0].boxes
\ No newline at end of file
+    return detect_layout_batch([page_image], layout_model)[0]
+
+def detect_layout_batch(page_images: List[Image.Image], layout_model) -> list:
+    """
+    Détecte les éléments de mise en page sur un lot d'images en une seule passe du modèle.
+
+    Ultralytics traite une liste d'images comme un seul batch : le coût fixe de
+    chaque appel est partagé et l'inférence CPU est mieux vectorisée.
+
+    Args:
+        page_images: Les images des pages à analyser.
+        layout_model: Le modèle YOLO chargé.
+
+    Returns:
+        Une liste de boîtes de détection (`Boxes`), une par image, dans le même ordre.
+    """
+    if not page_images:
+        return []
+    results = layout_model(page_images, verbose=False)
+    return [result.boxes for result in results]
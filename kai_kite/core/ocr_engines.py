@@ -0,0 +1,154 @@
+# kai_kite/core/ocr_engines.py
+import queue
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+from PIL import Image
+
+from ..utils.config import get_config
+from ..utils.logging import logger
+
+OCR_BACKENDS = ["tesserocr", "pytesseract"]
+
+
+class PytesseractEngine:
+    """
+    OCR par le binaire `tesseract` : chaque appel écrit l'image dans un fichier
+    temporaire, lance un processus et relit sa sortie TSV. Moteur de repli.
+    """
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str = "fra"):
+        self.lang = lang
+
+    def image_to_data(self, image: Image.Image) -> dict:
+        return pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+
+
+class TesserocrEngine:
+    """
+    OCR en mémoire par l'API C++ de Tesseract (tesserocr) : les moteurs, avec leurs
+    données de langue chargées, sont gardés d'un appel à l'autre et reçoivent
+    l'image directement, sans fichier temporaire ni sous-processus.
+
+    Un moteur Tesseract ne supporte qu'une image à la fois : un pool d'au plus
+    `pool_size` moteurs est partagé par les threads, chacun en emprunte un le
+    temps d'un appel (les moteurs sont créés à la demande).
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str = "fra", pool_size: int = 2):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.pool_size = max(1, pool_size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # Créer un premier moteur tout de suite : une langue absente échoue ici, pas en cours de traitement
+        self._idle.put(self._new_api())
+
+    def _new_api(self):
+        api = self._tesserocr.PyTessBaseAPI(lang=self.lang)
+        self._created += 1
+        return api
+
+    @contextmanager
+    def _borrow(self):
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                api = self._new_api() if self._created < self.pool_size else None
+            if api is None:
+                # Pool complet : attendre qu'un moteur se libère
+                api = self._idle.get()
+        try:
+            yield api
+        finally:
+            self._idle.put(api)
+
+    def image_to_data(self, image: Image.Image) -> dict:
+        """Même sortie que `pytesseract.image_to_data(..., output_type=DICT)`, au niveau des mots."""
+        tesserocr = self._tesserocr
+        level = tesserocr.RIL.WORD
+        data = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+        with self._borrow() as api:
+            try:
+                api.SetImage(image)
+                api.Recognize()
+                iterator = api.GetIterator()
+                # Pas d'itérateur quand Tesseract ne trouve rien (région blanche) : aucun mot
+                if iterator is None:
+                    return data
+                for word in tesserocr.iterate_level(iterator, level):
+                    text = word.GetUTF8Text(level)
+                    box = word.BoundingBox(level)
+                    if not text or box is None:
+                        continue
+                    x1, y1, x2, y2 = box
+                    data["text"].append(text)
+                    data["conf"].append(word.Confidence(level))
+                    data["left"].append(x1)
+                    data["top"].append(y1)
+                    data["width"].append(x2 - x1)
+                    data["height"].append(y2 - y1)
+            finally:
+                # Rendre le moteur propre au pool, même après une erreur
+                api.Clear()
+        return data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().End()
+            except queue.Empty:
+                break
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_ocr_engine(config: dict):
+    """
+    Crée le moteur d'OCR choisi dans la section `ocr` de la configuration.
+    Si tesserocr n'est pas installé ou ne démarre pas, pytesseract prend le relais.
+    """
+    ocr = config.get('ocr', {})
+    backend = ocr.get('backend', 'pytesseract')
+    lang = config.get('processing', {}).get('ocr_lang', 'fra')
+    if backend not in OCR_BACKENDS:
+        raise ValueError(f"Moteur d'OCR inconnu : {backend} (attendu : {', '.join(OCR_BACKENDS)})")
+
+    if backend == "tesserocr":
+        pool_size = ocr.get('pool_size', 0)
+        if not pool_size:
+            # Par défaut, un moteur par thread susceptible d'OCRiser (étapes "ocr" et "tables")
+            workers = config.get('pipeline', {}).get('workers', {})
+            pool_size = workers.get('ocr', 1) + workers.get('tables', 1)
+        try:
+            engine = TesserocrEngine(lang=lang, pool_size=pool_size)
+            logger.info(f"OCR en mémoire (tesserocr), jusqu'à {engine.pool_size} moteur(s).")
+            return engine
+        except ImportError:
+            logger.warning("tesserocr n'est pas installé : repli sur pytesseract.")
+        except RuntimeError as e:
+            logger.warning(f"Impossible de démarrer tesserocr ({e}) : repli sur pytesseract.")
+
+    return PytesseractEngine(lang=lang)
+
+
+def get_ocr_engine():
+    """Le moteur d'OCR du processus, créé au premier appel."""
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_ocr_engine(get_config())
+    return _engine
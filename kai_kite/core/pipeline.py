@@ -1,24 +1,44 @@
 # kai_kite/core/pipeline.py
 from pathlib import Path
-import json
+from collections import Counter
+from functools import partial
+import threading
+import time
 
-from pathlib import Path
-import json
-from .layout_detector import detect_layout
-from .content_extractor import extract_content_from_boxes # <-- Changement de nom
-from ..formatting.json_builder import build_final_json
-from .preprocessor import get_images_from_file
+from .layout_detector import detect_layout_batch
+from .content_extractor import ( # <-- Changement de nom
+    assemble_elements, extract_tables, extract_texts, extract_texts_by_region, ocr_page, select_boxes,
+)
+from .stages import Stage, run_stages
+from .triage import BLANK, DENSE, SPARSE, triage_page
+from ..formatting.normalized import document_date
+from ..formatting.writers import DocumentWriter, open_document_writer
+from .preprocessor import PageSource
 from ..utils.logging import logger
 from ..utils.config import get_config
+from ..utils.cache import PageCheckpoint, ProcessingManifest, config_fingerprint
+from ..utils.profiling import (
+    StageTimer, add_time, build_document_profile, current_rss_mb, iter_timed, split_record, stage_timer, write_profile,
+)
 from kai_kite.models.model_manager import get_layout_model, get_table_models # <-- Importer les fonctions
 
+OUTPUT_DIR = Path("data/processed")
+# Le cache vit dans un sous-dossier : l'adaptateur ne lit que les *.json de OUTPUT_DIR
+CACHE_DIR = OUTPUT_DIR / ".kai_kite"
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+CHECKPOINT_DIR = CACHE_DIR / "checkpoints"
+# Synthèse du profilage de tous les documents d'un passage (à côté des <document>.profile.json)
+RUN_PROFILE_PATH = OUTPUT_DIR / "run.profile.json"
+
 layout_model = None
 table_model = None
 table_image_processor = None
 
-def process_document(file_path: Path):
-    """Pipeline complet pour traiter un document."""
+# Modèles de mise en page propres à chaque thread, quand l'étape "layout" a plusieurs workers
+_thread_models = threading.local()
 
+def load_models():
+    """Charge les modèles (une seule fois par processus) via le model_manager."""
     global layout_model, table_model, table_image_processor
 
     if layout_model is None:
@@ -26,54 +46,427 @@ def process_document(file_path: Path):
     if table_model is None or table_image_processor is None:
         table_image_processor, table_model = get_table_models()
 
+
+def layout_dpi_for(page_source: PageSource, processing: dict) -> int:
+    """
+    Résolution du rendu utilisé pour la détection de la mise en page.
+
+    YOLO redimensionne de toute façon son entrée (~640 px) : pour un PDF, la page
+    est rendue à `layout_dpi` (peu coûteux), et seules les régions utiles sont
+    rendues ensuite à `image_dpi` pour l'OCR et les tableaux. Les images et les
+    TIFF, déjà décodés en entier, restent à leur résolution native.
+    """
+    layout_dpi = processing.get('layout_dpi')
+    if page_source is not None and page_source.is_pdf and layout_dpi:
+        return min(layout_dpi, processing['image_dpi'])
+    return processing['image_dpi']
+
+
+def make_page_item(page_source: PageSource, page_num: int, page_image, processing: dict,
+                   render_time: dict = None) -> dict:
+    """
+    Étape "render" : prépare l'élément qui traverse le pipeline pour une page.
+
+    `page_image` est le rendu à la résolution de `layout_dpi_for` ; "scale" permet
+    de ramener les coordonnées de la mise en page dans l'espace de référence
+    (`image_dpi`), le seul utilisé dans le JSON de sortie. `render_time` est la
+    mesure du rendu de l'image, ajoutée à celle de la lecture de la couche texte.
+    """
+    profile = {}
+    triage = None
+    triage_config = dict(processing.get('triage', {}))
+    triage_config.pop('sparse_skip_layout', None)
+    if triage_config.pop('enabled', False):
+        with stage_timer(profile, "triage") as record:
+            triage = triage_page(page_image, **triage_config)
+            record["count"] = 1
+
+    with stage_timer(profile, "render") as record:
+        record["count"] = 1
+        text_layer = None
+        if page_source is not None and processing.get('use_text_layer', True) and _category(triage) != BLANK:
+            text_layer = page_source.text_layer(
+                page_num,
+                min_chars=processing.get('text_layer_min_chars', 50),
+                max_image_ratio=processing.get('text_layer_max_image_ratio', 0.25),
+            )
+    if render_time:
+        add_time(profile, "render", {**render_time, "count": 0})
+
+    return {
+        "page_num": page_num,
+        "image": page_image,
+        "scale": processing['image_dpi'] / layout_dpi_for(page_source, processing),
+        "source": page_source,
+        "text_layer": text_layer,
+        "triage": triage,
+        "profile": profile,
+    }
+
+
+def _category(triage: dict) -> str:
+    """Catégorie d'une page triée ("blank", "sparse", "dense") ; sans tri, la page est dense."""
+    return triage["category"] if triage else DENSE
+
+
+def _crop_region(item: dict):
+    """
+    Fonction qui renvoie une région de la page à la résolution d'OCR : découpée
+    dans l'image de la page si elle est déjà à cette résolution, sinon rendue
+    par pymupdf avec un rectangle de découpe.
+    """
+    if item["scale"] == 1:
+        return item["image"].crop
+    return lambda coords: item["source"].render(item["page_num"], clip=coords)
+
+
+def _layout_model_for_thread(shared: bool):
+    """Le modèle YOLO n'est pas thread-safe : un modèle par worker si l'étape en a plusieurs."""
+    if shared:
+        return layout_model
+    if getattr(_thread_models, "layout_model", None) is None:
+        _thread_models.layout_model = get_layout_model()
+    return _thread_models.layout_model
+
+
+def layout_stage(items: list, processing: dict, shared_model: bool = True) -> list:
+    """
+    Étape "layout" : détection de la mise en page d'un lot de pages en une seule passe.
+
+    Une page blanche n'a aucune boîte. Les pages peu denses passent dans YOLO comme
+    les pages denses : un titre ou un tableau sur une page courte (début de section)
+    garde sa classe. Avec `triage.sparse_skip_layout`, elles évitent YOLO et chaque
+    bloc d'encre devient une boîte de texte (plus rapide, mais sans titres ni tableaux).
+    """
+    timer = StageTimer()
+    with_layout = {DENSE} if processing.get('triage', {}).get('sparse_skip_layout', False) else {DENSE, SPARSE}
+    dense = [item for item in items if _category(item["triage"]) in with_layout]
+    detected = {}
+    if dense:
+        model = _layout_model_for_thread(shared_model)
+        boxes_per_page = detect_layout_batch([item["image"] for item in dense], model)
+        for item, detected_boxes in zip(dense, boxes_per_page):
+            detected[id(item)] = select_boxes(detected_boxes, model, processing['detection_confidence_threshold'])
+
+    for item in items:
+        if id(item) in detected:
+            boxes = detected[id(item)]
+        else:
+            boxes = [("Text", 1.0, block) for block in item["triage"]["blocks"]]
+        # Ramener les boîtes dans l'espace de référence (image_dpi)
+        scale = item["scale"]
+        item["boxes"] = [
+            (class_name, confidence, [c * scale for c in coords])
+            for class_name, confidence, coords in boxes
+        ]
+
+    # Le temps du lot est réparti entre ses pages
+    batch_time = timer.elapsed()
+    for item in items:
+        item["profile"]["layout"] = split_record(batch_time, len(items))
+        item["profile"]["layout"]["count"] = len(item["boxes"])
+    return items
+
+
+def ocr_stage(item: dict, processing: dict) -> dict:
+    """
+    Étape "ocr" : texte de la page, par la couche native si possible, sinon par
+    l'OCR Tesseract, puis affectation des mots aux boîtes de texte.
+
+    Si la page n'a été rendue qu'en basse résolution, ou si elle est peu dense,
+    seules les régions de texte sont rendues à la résolution d'OCR et OCRisées.
+    Une page sans boîte (page blanche) n'est pas OCRisée.
+    """
+    with stage_timer(item["profile"], "ocr") as record:
+        ocr_data = item.pop("text_layer")
+        item["text_source"] = "text_layer" if ocr_data is not None else "ocr"
+        if not item["boxes"]:
+            item["text_source"] = "none"
+            item["texts"], item["table_words"] = {}, {}
+        elif ocr_data is not None:
+            item["texts"], item["table_words"] = extract_texts(item["boxes"], ocr_data)
+        elif item["scale"] == 1 and _category(item["triage"]) == DENSE:
+            item["texts"], item["table_words"] = extract_texts(item["boxes"], ocr_page(item["image"]))
+        else:
+            page_size = (item["image"].width * item["scale"], item["image"].height * item["scale"])
+            item["texts"], item["table_words"] = extract_texts_by_region(
+                item["boxes"], _crop_region(item), page_size, margin=processing.get('region_ocr_margin', 10)
+            )
+        record["count"] = len(item["texts"])
+    return item
+
+
+def tables_stage(item: dict, processing: dict) -> dict:
+    """
+    Étape "tables" : extraction des tableaux de la page (leur texte est repris
+    des mots lus à l'étape "ocr"), puis assemblage de ses éléments. L'image de la
+    page est libérée à la fin de cette étape.
+    """
+    profile = item["profile"]
+    with stage_timer(profile, "tables") as record:
+        tables = extract_tables(
+            _crop_region(item),
+            item["boxes"],
+            table_image_processor,
+            table_model,
+            threshold=processing['table_structure_threshold'],
+            batch_size=processing.get('table_batch_size', 8),
+            table_words=item["table_words"],
+            structured=processing.get('table_structured_output', False),
+        )
+        page_elements = assemble_elements(item["boxes"], item["texts"], tables)
+        record["count"] = len(tables)
+
+    # Ajouter le numéro de page aux éléments extraits
+    for element in page_elements:
+        element["page"] = item["page_num"] + 1
+
+    item["image"].close()
+    profile["elements"] = len(page_elements)
+    # Mémoire résidente du processus à la fin de la page (et non son pic depuis le démarrage)
+    profile["rss_mb"] = current_rss_mb()
+
+    triage = item["triage"]
+    if triage is not None:
+        triage = {key: value for key, value in triage.items() if key != "blocks"}
+    return {
+        "page_num": item["page_num"],
+        "result": {
+            "elements": page_elements,
+            "text_source": item["text_source"],
+            "triage": triage,
+            "profile": profile,
+        },
+    }
+
+
+def process_page_batch(pages: list, processing: dict, page_source: PageSource = None, render_times: dict = None) -> dict:
+    """
+    Traite un lot de pages en enchaînant les étapes dans le thread courant : la
+    détection de la mise en page est faite en une seule passe du modèle pour tout
+    le lot, puis le contenu est extrait page par page.
+
+    Le texte d'une page vient de sa couche texte native (PDF nés numériques) quand
+    elle est exploitable, sinon de l'OCR Tesseract de la page.
+
+    Args:
+        pages: Une liste de tuples (index de page à partir de 0, image de la page
+            rendue à la résolution de `layout_dpi_for`).
+        processing: La section `processing` de la configuration.
+        page_source: La source des pages, pour lire leur couche texte native et
+            rendre leurs régions en haute résolution.
+        render_times: Les mesures du rendu des images, par index de page (profilage).
+
+    Returns:
+        Un dictionnaire {index de page: résultat de la page}, où chaque résultat
+        contient "elements" (les éléments extraits, portant leur numéro de page à
+        partir de 1), "text_source" ("text_layer", "ocr" ou "none"), "triage"
+        (la catégorie de la page, voir `triage_page`) et "profile" (les mesures
+        de chaque étape).
+    """
+    load_models()
+
+    render_times = render_times or {}
+    items = [
+        make_page_item(page_source, page_num, page_image, processing, render_time=render_times.get(page_num))
+        for page_num, page_image in pages
+    ]
+    items = layout_stage(items, processing)
+
+    results = {}
+    for item in items:
+        done = tables_stage(ocr_stage(item, processing), processing)
+        results[done["page_num"]] = done["result"]
+    return results
+
+
+def iter_processed_pages(page_source: PageSource, page_nums: list, processing: dict, pipeline: dict):
+    """
+    Traite des pages avec le pipeline par étapes render -> layout -> ocr -> tables,
+    reliées par des files bornées (voir `run_stages`). Tesseract, YOLO et le
+    Table Transformer travaillent ainsi en même temps sur des pages différentes.
+
+    Args:
+        page_source: La source des pages.
+        page_nums: Les index des pages à traiter.
+        processing: La section `processing` de la configuration.
+        pipeline: La section `pipeline` de la configuration (workers par étape, taille des files).
+
+    Yields:
+        Des tuples (index de page, résultat de la page), dans l'ordre de fin de traitement.
+    """
+    load_models()
+
+    workers = pipeline.get('workers', {})
+    layout_workers = workers.get('layout', 1)
+
+    rendered = page_source.iter_pages(page_nums, dpi=layout_dpi_for(page_source, processing))
+    source = (
+        make_page_item(page_source, page_num, page_image, processing, render_time=render_time)
+        for (page_num, page_image), render_time in iter_timed(rendered)
+    )
+    stages = [
+        Stage("layout", partial(layout_stage, processing=processing, shared_model=layout_workers == 1),
+              workers=layout_workers, batch_size=processing.get('layout_batch_size', 1)),
+        Stage("ocr", partial(ocr_stage, processing=processing), workers=workers.get('ocr', 1)),
+        Stage("tables", partial(tables_stage, processing=processing), workers=workers.get('tables', 1)),
+    ]
+    for done in run_stages(source, stages, queue_size=pipeline.get('queue_size', 4)):
+        yield done["page_num"], done["result"]
+
+
+def log_text_source_stats(file_name: str, page_results: dict):
+    """Journalise le nombre de pages lues par la couche texte native et par OCR, et le tri des pages."""
+    counts = Counter(result["text_source"] for result in page_results.values())
+    logger.info(
+        f"Statistiques {file_name} : {counts.get('text_layer', 0)} page(s) via la couche texte native, "
+        f"{counts.get('ocr', 0)} page(s) via OCR."
+    )
+    triage = Counter(result["triage"]["category"] for result in page_results.values() if result.get("triage"))
+    if triage:
+        logger.info(
+            f"Tri des pages {file_name} : {triage.get('dense', 0)} dense(s), "
+            f"{triage.get('sparse', 0)} peu dense(s), {triage.get('blank', 0)} blanche(s) sautée(s)."
+        )
+
+
+def iter_batches(iterable, batch_size: int):
+    """Regroupe les éléments d'un itérable en listes d'au plus `batch_size` éléments."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def open_output(file_path: Path, output: dict, content_hash: str) -> DocumentWriter:
+    """
+    Ouvre l'écrivain de la sortie d'un document, au format de la section `output`
+    de la configuration. Les IDs des chunks sont dérivés de `content_hash`.
+    """
+    return open_document_writer(OUTPUT_DIR, file_path.name, output.get('format', 'json'), doc_hash=content_hash,
+                                date=document_date(file_path.name, file_path))
+
+
+def add_page_result(page_results: dict, writer: DocumentWriter, page_num: int, result: dict):
+    """
+    Transmet les éléments d'une page à l'écrivain de sortie, avec ses métadonnées
+    (source du texte, tri), et garde le reste de son résultat pour les statistiques.
+    """
+    page_info = {"text_source": result.get("text_source")}
+    if result.get("triage"):
+        page_info["triage"] = result["triage"]
+    writer.add_page(page_num, result["elements"], page_info)
+    page_results[page_num] = {key: value for key, value in result.items() if key != "elements"}
+
+
+def process_document(file_path: Path, manifest: ProcessingManifest = None, force: bool = False):
+    """
+    Pipeline complet pour traiter un document.
+
+    Le document est sauté si son contenu a déjà été traité avec les mêmes modèles
+    et seuils (voir `ProcessingManifest`). Chaque page terminée est enregistrée
+    dans un point de reprise : après un arrêt, le traitement repart de là.
+
+    Args:
+        file_path: Le chemin du document.
+        manifest: Le manifeste des documents traités (chargé si absent).
+        force: Retraiter le document même s'il est à jour.
+
+    Returns:
+        Le rapport de profilage du document, ou None s'il n'a pas été traité.
+    """
+    started = time.perf_counter()
+
     # --- Lire la configuration ---
     config = get_config()
-    conf_threshold = config['processing']['detection_confidence_threshold']
-    dpi = config['processing']['image_dpi']
-    
-    output_json_path = Path("data/processed") / f"{file_path.stem}.json"
-    
-    extracted_elements = []
-    
+    processing = config['processing']
+    dpi = processing['image_dpi']
+
+    owns_manifest = manifest is None
+    if owns_manifest:
+        manifest = ProcessingManifest(MANIFEST_PATH)
+    try:
+        content_hash = manifest.content_hash(file_path)
+    except FileNotFoundError as e:
+        logger.error(f"Erreur critique : {e}")
+        return None
+    config_hash = config_fingerprint(config)
+
+    if not force and manifest.is_up_to_date(content_hash, config_hash, file_path):
+        logger.info(f"Document inchangé, traitement sauté : {file_path.name}")
+        return None
+
+    load_models()
+
     logger.info(f"Prétraitement du document : {file_path.name}")
     try:
-        page_images = get_images_from_file(file_path, dpi=dpi)
+        pages = PageSource(file_path, dpi=dpi)
     except (FileNotFoundError, ValueError) as e:
         logger.error(f"Erreur critique : {e}")
-        return
-
-    logger.info(f"Traitement de {len(page_images)} page(s)...")
-    for page_num, page_image in enumerate(page_images):
-        logger.info(f"  - Traitement de la page {page_num + 1}/{len(page_images)}")
-
-        # Étape 1 : Détection de la mise en page (inchangée)
-        detected_boxes = detect_layout(page_image, layout_model)
-        
-        # Étape 2 : Extraction du contenu pour toutes les boîtes (OPTIMISÉ)
-        page_elements = extract_content_from_boxes(
-            page_image,
-            detected_boxes,
-            layout_model,
-            conf_threshold,
-            (table_image_processor, table_model)
-        )
-        
-        # Ajouter le numéro de page aux éléments extraits
-        for element in page_elements:
-            element["page"] = page_num + 1
-        
-        extracted_elements.extend(page_elements)
-    
-    if not extracted_elements:
-        logger.warning("Aucun contenu n'a été extrait. Le fichier JSON ne sera pas généré.")
-        return
-
-    logger.info("Assemblage du JSON final...")
-    final_json_data = build_final_json(file_path.name, extracted_elements)
-    
-    output_json_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_json_path, 'w', encoding='utf-8') as f:
-        json.dump(final_json_data, f, ensure_ascii=False, indent=2)
-        
-    logger.info("Traitement terminé !")
-    logger.info(f"Fichier de sortie généré ici : {output_json_path}")
+        return None
+
+    checkpoint = PageCheckpoint(CHECKPOINT_DIR, content_hash, config_hash, file_path.name)
+    # La sortie est réécrite entièrement : les pages du point de reprise y sont reprises d'abord
+    writer = open_output(file_path, config.get('output', {}), content_hash)
+    page_results = {}
+    for page_num, result in sorted(({} if force else checkpoint.load()).items()):
+        add_page_result(page_results, writer, page_num, result)
+    if page_results:
+        logger.info(f"Reprise : {len(page_results)} page(s) déjà traitée(s) trouvée(s) dans le point de reprise.")
+
+    # Les pages sont rendues au fil de l'eau et traversent le pipeline par étapes :
+    # les files bornées gardent la mémoire constante quelle que soit la longueur du document,
+    # et les formats de sortie JSONL sont écrits au fur et à mesure.
+    try:
+        with pages:
+            page_count = len(pages)
+            logger.info(f"Traitement de {page_count} page(s)...")
+            remaining = [page_num for page_num in range(page_count) if page_num not in page_results]
+            for page_num, result in iter_processed_pages(pages, remaining, processing, config.get('pipeline', {})):
+                logger.info(f"  - Page {page_num + 1}/{page_count} terminée")
+                checkpoint.append(page_num, result)
+                add_page_result(page_results, writer, page_num, result)
+    except BaseException:
+        writer.abort()
+        raise
+
+    profile = finalize_document(file_path, page_results, writer, manifest, checkpoint, content_hash, config_hash, started)
+    if owns_manifest:
+        manifest.save()
+    return profile
+
+
+def finalize_document(file_path: Path, page_results: dict, writer: DocumentWriter, manifest: ProcessingManifest,
+                      checkpoint: PageCheckpoint, content_hash: str, config_hash: str, started: float = None):
+    """
+    Termine la sortie du document, écrit son rapport de profilage
+    (<document>.profile.json), l'enregistre dans le manifeste et supprime son
+    point de reprise.
+
+    Args:
+        page_results: Les résultats des pages, sans leurs éléments (déjà transmis à `writer`).
+        writer: L'écrivain de la sortie du document.
+        started: L'instant (`time.perf_counter`) du début du traitement du document.
+
+    Returns:
+        Le rapport de profilage du document.
+    """
+    log_text_source_stats(file_path.name, page_results)
+    output_path = writer.close()
+    if output_path is None:
+        logger.warning("Aucun contenu n'a été extrait. Le fichier de sortie ne sera pas généré.")
+    else:
+        logger.info("Traitement terminé !")
+        logger.info(f"Fichier de sortie généré ici : {output_path}")
+
+    manifest.record(content_hash, config_hash, file_path, output_path, len(page_results))
+    checkpoint.clear()
+
+    wall_s = time.perf_counter() - started if started is not None else 0.0
+    profile = build_document_profile(file_path.name, page_results, writer.profile, wall_s)
+    write_profile(OUTPUT_DIR / f"{file_path.stem}.profile.json", profile)
+    return profile
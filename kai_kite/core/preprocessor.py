@@ -1,6 +1,7 @@
 # kai_kite/core/preprocessor.py
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Sequence, Tuple
+import threading
 from PIL import Image
 import pymupdf  # fitz
 from ..utils.logging import logger # <-- Importer le logger
@@ -8,59 +9,241 @@ from ..utils.logging import logger # <-- Importer le logger
 # S'assurer que Pillow peut gérer des images de grande taille
 Image.MAX_IMAGE_PIXELS = None
 
+PDF_EXTENSIONS = [".pdf"]
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp"]
+TIFF_EXTENSIONS = [".tif", ".tiff"]
+
+
+class PageSource:
+    """
+    Source de pages paresseuse pour un document (PDF, TIFF multi-pages ou image simple).
+
+    Le nombre de pages est connu dès l'ouverture, mais chaque page n'est rendue
+    qu'au moment où on la demande : une seule image de page est en mémoire à la fois,
+    quelle que soit la longueur du document.
+
+    Les coordonnées de référence sont celles du rendu à `dpi`. Une page peut aussi
+    être rendue à une autre résolution, ou seulement une région de la page
+    (voir `render`). Les accès au document sont protégés par un verrou : pymupdf
+    n'est pas thread-safe, mais une même source peut servir à plusieurs threads.
+
+    Exemple :
+        with PageSource(file_path, dpi=300) as pages:
+            logger.info(f"{len(pages)} page(s)")
+            for page_index, page_image in pages:
+                ...
+    """
+
+    def __init__(self, file_path: Path, dpi: int = 300):
+        """
+        Args:
+            file_path: Le chemin vers le fichier.
+            dpi: La résolution à utiliser pour la conversion PDF -> image.
+
+        Raises:
+            FileNotFoundError: Si le fichier n'existe pas.
+            ValueError: Si le type de fichier n'est pas supporté.
+        """
+        if not file_path.exists():
+            raise FileNotFoundError(f"Le fichier {file_path} n'a pas été trouvé.")
+
+        self.file_path = file_path
+        self.dpi = dpi
+        self.suffix = file_path.suffix.lower()
+        self._doc = None
+        self._tiff = None
+        self._lock = threading.Lock()
+        # Dernière page rendue d'une image ou d'un TIFF, pour en découper des régions
+        self._cached_page = None
+
+        if self.suffix in PDF_EXTENSIONS:
+            self._doc = pymupdf.open(file_path)
+            self.page_count = self._doc.page_count
+        elif self.suffix in TIFF_EXTENSIONS:
+            self._tiff = Image.open(file_path)
+            self.page_count = getattr(self._tiff, "n_frames", 1)
+        elif self.suffix in IMAGE_EXTENSIONS:
+            self.page_count = 1
+        else:
+            raise ValueError(f"Type de fichier non supporté : {self.suffix}")
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def __iter__(self) -> Iterator[Tuple[int, Image.Image]]:
+        return self.iter_pages()
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.suffix in PDF_EXTENSIONS
+
+    def iter_pages(self, page_indices=None, dpi: Optional[int] = None) -> Iterator[Tuple[int, Image.Image]]:
+        """
+        Produit les pages une par une sous forme de tuples (index de page, image).
+        Une page illisible est journalisée et sautée sans décaler la numérotation.
+
+        Args:
+            page_indices: Les index des pages à rendre (par défaut, toutes les pages).
+            dpi: La résolution du rendu (par défaut, `self.dpi`).
+        """
+        if page_indices is None:
+            page_indices = range(self.page_count)
+        for page_index in page_indices:
+            try:
+                yield page_index, self.render(page_index, dpi=dpi)
+            except Exception as e:
+                logger.warning(f"Impossible de traiter la page {page_index} de {self.file_path.name}. Erreur : {e}")
+
+    def render(self, page_index: int, dpi: Optional[int] = None, clip: Optional[Sequence[float]] = None) -> Image.Image:
+        """
+        Rend une page du document (ou une région de la page) en image Pillow RGB.
+
+        Args:
+            page_index: L'index de la page (à partir de 0).
+            dpi: La résolution du rendu (par défaut, `self.dpi`).
+            clip: Une région [x1, y1, x2, y2] à rendre, en pixels de l'espace de
+                référence (rendu à `self.dpi`). Pour un PDF, seule cette région
+                est rastérisée.
+        """
+        dpi = dpi or self.dpi
+
+        with self._lock:
+            if self._doc is not None:
+                page = self._doc[page_index]
+                rect = None
+                if clip is not None:
+                    to_points = 72 / self.dpi
+                    rect = pymupdf.Rect(*(c * to_points for c in clip)) & page.rect
+                pix = page.get_pixmap(dpi=dpi, clip=rect)
+                return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+            # Image ou TIFF : la résolution native tient lieu de `self.dpi`
+            if self._cached_page is None or self._cached_page[0] != page_index:
+                if self._tiff is not None:
+                    self._tiff.seek(page_index)
+                    image = self._tiff.convert("RGB")
+                else:
+                    with Image.open(self.file_path) as img:
+                        image = img.convert("RGB")
+                self._cached_page = (page_index, image)
+            image = self._cached_page[1]
+
+        if clip is not None:
+            image = image.crop([int(round(c)) for c in clip])
+        if dpi != self.dpi:
+            factor = dpi / self.dpi
+            size = (max(1, round(image.width * factor)), max(1, round(image.height * factor)))
+            return image.resize(size, Image.BILINEAR)
+        return image.copy() if clip is None else image
+
+    def text_layer(self, page_index: int, min_chars: int = 50, max_garbage_ratio: float = 0.1,
+                   max_image_ratio: float = 0.25):
+        """
+        Extrait la couche texte native d'une page PDF, si elle est exploitable.
+
+        Une page mixte (en-tête ou tampon numérique sur un corps scanné, fréquent
+        dans les annexes) a bien une couche texte, mais elle ne couvre pas le texte
+        de l'image : si les images sans aucun mot de la couche texte occupent plus
+        de `max_image_ratio` de la page, la page est laissée à l'OCR.
+
+        Les mots sont extraits par pymupdf avec leurs coordonnées, converties des
+        points PDF vers l'espace pixel du rendu (`dpi`), et renvoyés au même format
+        que `pytesseract.image_to_data(..., output_type=DICT)` : ils peuvent ainsi
+        remplacer l'OCR sans autre changement.
+
+        Args:
+            page_index: L'index de la page (à partir de 0).
+            min_chars: Nombre minimal de caractères pour considérer la couche exploitable.
+            max_garbage_ratio: Proportion maximale de caractères illisibles
+                (caractère de remplacement, caractères de contrôle).
+            max_image_ratio: Part maximale de la page couverte par des images
+                sans texte natif.
+
+        Returns:
+            Un dictionnaire {"text", "conf", "left", "top", "width", "height"},
+            ou None si la page n'a pas de couche texte exploitable (page scannée,
+            image, TIFF...).
+        """
+        if self._doc is None:
+            return None
+
+        with self._lock:
+            page = self._doc[page_index]
+            words = page.get_text("words")
+            text = "".join(w[4] for w in words)
+            if len(text) < min_chars:
+                return None
+            images = [pymupdf.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+            page_area = abs(page.rect)
+
+        garbage = sum(1 for c in text if c == "\ufffd" or (not c.isprintable()))
+        if garbage / len(text) > max_garbage_ratio:
+            return None
+
+        # Images sans aucun mot de la couche texte (un PDF scanné puis océrisé en a sur ses images)
+        centers = [pymupdf.Point((w[0] + w[2]) / 2, (w[1] + w[3]) / 2) for w in words]
+        bare_area = sum(abs(rect) for rect in images
+                        if not rect.is_empty and not any(center in rect for center in centers))
+        if page_area and bare_area / page_area > max_image_ratio:
+            logger.info(f"Page {page_index + 1} de {self.file_path.name} : couche texte partielle "
+                        f"(images sans texte sur {bare_area / page_area:.0%} de la page), OCR de la page.")
+            return None
+
+        scale = self.dpi / 72
+        return {
+            "text": [w[4] for w in words],
+            "conf": [100] * len(words),
+            "left": [w[0] * scale for w in words],
+            "top": [w[1] * scale for w in words],
+            "width": [(w[2] - w[0]) * scale for w in words],
+            "height": [(w[3] - w[1]) * scale for w in words],
+        }
+
+    def close(self):
+        """Libère les ressources du document (PDF ou TIFF) ouvert."""
+        self._cached_page = None
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        if self._tiff is not None:
+            self._tiff.close()
+            self._tiff = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 def get_images_from_file(file_path: Path, dpi: int = 300) -> List[Image.Image]:
     """
     Normalise un fichier d'entrée (PDF, JPG, PNG, TIFF) en une liste d'images Pillow.
 
+    Attention : toutes les pages sont matérialisées en mémoire. Pour les longs
+    documents, préférer `PageSource`, qui rend les pages une à une.
+
     Args:
         file_path: Le chemin vers le fichier.
         dpi: La résolution à utiliser pour la conversion PDF -> image.
 
     Returns:
         Une liste d'objets PIL.Image.
-        
+
     Raises:
         FileNotFoundError: Si le fichier n'existe pas.
         ValueError: Si le type de fichier n'est pas supporté.
     """
-    if not file_path.exists():
-        raise FileNotFoundError(f"Le fichier {file_path} n'a pas été trouvé.")
-
-    suffix = file_path.suffix.lower()
-    images = []
-
-    if suffix == ".pdf":
-        doc = pymupdf.open(file_path)
-        for page_num, page in enumerate(doc):
-            try:
-                pix = page.get_pixmap(dpi=dpi)
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                images.append(img)
-            except Exception as e:
-                logger.warning(f"Impossible de traiter la page {page_num} du PDF {file_path.name}. Erreur : {e}")
-        doc.close()
-
-    elif suffix in [".jpg", ".jpeg", ".png", ".bmp"]:
-        try:
-            img = Image.open(file_path).convert("RGB")
-            images.append(img)
-        except Exception as e:
-            logger.warning(f"Impossible d'ouvrir l'image {file_path.name}. Erreur : {e}")
-
-    elif suffix in [".tif", ".tiff"]:
-        try:
-            with Image.open(file_path) as img:
-                for i in range(img.n_frames):
-                    img.seek(i)
-                    frame = img.copy().convert("RGB")
-                    images.append(frame)
-        except Exception as e:
-            logger.warning(f"Impossible de traiter le TIFF {file_path.name}. Erreur : {e}")
-            
-    else:
-        raise ValueError(f"Type de fichier non supporté : {suffix}")
+    try:
+        with PageSource(file_path, dpi=dpi) as pages:
+            images = [page_image for _, page_image in pages]
+    except (FileNotFoundError, ValueError):
+        raise
+    except Exception as e:
+        logger.warning(f"Impossible d'ouvrir le document {file_path.name}. Erreur : {e}")
+        images = []
 
     if not images:
         logger.warning(f"Aucun contenu image n'a pu être extrait de {file_path.name}.")
-        
-    return images
\ No newline at end of file
+
+    return images
@@ -0,0 +1,149 @@
+# kai_kite/core/stages.py
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List
+
+from ..utils.logging import logger
+
+# Marqueur de fin de flux transmis d'une étape à la suivante
+_END = object()
+
+
+class Stage:
+    """
+    Une étape du pipeline : une fonction appliquée à chaque élément du flux
+    par `workers` threads.
+
+    Si `batch_size` > 1, la fonction reçoit une liste d'éléments : un worker
+    attend le premier élément puis prend, sans attendre, ceux qui sont déjà
+    disponibles (jusqu'à `batch_size`). Elle doit renvoyer la liste traitée.
+    """
+
+    def __init__(self, name: str, func: Callable, workers: int = 1, batch_size: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+
+
+def run_stages(source: Iterable, stages: List[Stage], queue_size: int = 4) -> Iterator:
+    """
+    Exécute des étapes en producteur/consommateur, reliées par des files bornées.
+
+    La source est consommée par un thread dédié (première étape), chaque étape
+    a ses propres threads, et les éléments terminés sont produits au fil de l'eau
+    (pas forcément dans l'ordre de la source si une étape a plusieurs workers).
+    Les files bornées appliquent une contre-pression : une étape rapide attend
+    la suivante au lieu d'accumuler des éléments en mémoire. Le débit est ainsi
+    fixé par l'étape la plus lente, et non par la somme des étapes.
+
+    Une exception dans une étape arrête le pipeline et est relevée dans l'appelant.
+
+    Args:
+        source: L'itérable d'entrée (par exemple les pages rendues).
+        stages: Les étapes, dans l'ordre.
+        queue_size: La taille maximale de chaque file entre deux étapes.
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    stop = threading.Event()
+    errors = []
+
+    def put(q: queue.Queue, item) -> bool:
+        # put() bloquant mais interruptible si le pipeline s'arrête
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fail(stage_name: str, error: Exception):
+        logger.error(f"Erreur dans l'étape '{stage_name}' du pipeline : {error}")
+        errors.append(error)
+        stop.set()
+
+    def feed():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except Exception as e:
+            fail("source", e)
+        finally:
+            put(queues[0], _END)
+
+    def work(stage: Stage, in_q: queue.Queue, out_q: queue.Queue, remaining: list, lock: threading.Lock):
+        try:
+            while not stop.is_set():
+                try:
+                    item = in_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    # Rendre le marqueur aux autres workers de l'étape
+                    in_q.put(_END)
+                    break
+
+                if stage.batch_size > 1:
+                    batch = [item]
+                    while len(batch) < stage.batch_size:
+                        try:
+                            extra = in_q.get_nowait()
+                        except queue.Empty:
+                            break
+                        if extra is _END:
+                            in_q.put(_END)
+                            break
+                        batch.append(extra)
+                    outputs = stage.func(batch)
+                else:
+                    outputs = [stage.func(item)]
+
+                for output in outputs:
+                    if not put(out_q, output):
+                        return
+        except Exception as e:
+            fail(stage.name, e)
+        finally:
+            # Le dernier worker de l'étape transmet la fin du flux à l'étape suivante
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                put(out_q, _END)
+
+    threads = [threading.Thread(target=feed, name="stage-source", daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining, lock = [stage.workers], threading.Lock()
+        for n in range(stage.workers):
+            threads.append(threading.Thread(
+                target=work,
+                args=(stage, queues[index], queues[index + 1], remaining, lock),
+                name=f"stage-{stage.name}-{n}",
+                daemon=True,
+            ))
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        out_q = queues[-1]
+        while True:
+            try:
+                item = out_q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    break
+                continue
+            if item is _END:
+                break
+            yield item
+    finally:
+        # Arrêt anticipé (erreur ou consommateur interrompu) : libérer les threads
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
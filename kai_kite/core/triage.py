@@ -0,0 +1,84 @@
+# kai_kite/core/triage.py
+import numpy as np
+from PIL import Image
+
+BLANK = "blank"
+SPARSE = "sparse"
+DENSE = "dense"
+
+
+def _min_pool(pixels: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Réduit une image en niveaux de gris par blocs de `factor` x `factor` en gardant
+    le pixel le plus sombre : un trait fin reste visible dans la vignette, alors
+    qu'une moyenne l'effacerait.
+    """
+    rows, columns = pixels.shape[0] // factor, pixels.shape[1] // factor
+    # Lignes puis colonnes : deux réductions sur des blocs contigus en mémoire (bien plus rapide)
+    pooled = pixels[:rows * factor, :columns * factor].reshape(rows, factor, -1).min(axis=1)
+    return pooled.reshape(rows, columns, factor).min(axis=2)
+
+
+def _ink_blocks(ink: np.ndarray, factor: int, max_gap: int = 2) -> list:
+    """
+    Blocs d'encre de la vignette, séparés par des bandes horizontales vides,
+    en coordonnées de l'image d'origine.
+    """
+    rows = np.flatnonzero(ink.any(axis=1))
+    if not len(rows):
+        return []
+    breaks = np.flatnonzero(np.diff(rows) > max_gap + 1)
+    starts = np.concatenate([[rows[0]], rows[breaks + 1]])
+    ends = np.concatenate([rows[breaks], [rows[-1]]]) + 1
+
+    blocks = []
+    for top, bottom in zip(starts, ends):
+        columns = np.flatnonzero(ink[top:bottom].any(axis=0))
+        left, right = columns[0], columns[-1] + 1
+        blocks.append([float(left * factor), float(top * factor), float(right * factor), float(bottom * factor)])
+    return blocks
+
+
+def triage_page(page_image: Image.Image, thumbnail_width: int = 256, ink_level: int = 160,
+                blank_max_ink: float = 0.0005, sparse_max_ink: float = 0.03, min_std: float = 4.0) -> dict:
+    """
+    Classe une page d'après une vignette, avant la détection de la mise en page et l'OCR :
+    - "blank" : (presque) pas d'encre, ou page uniforme (écart-type des niveaux de
+      gris faible, par exemple une page de séparation grise ou noire) ;
+    - "sparse" : peu d'encre (page de garde, page de signature...) ;
+    - "dense" : le reste.
+
+    Args:
+        page_image: L'image de la page.
+        thumbnail_width: Largeur approximative de la vignette analysée.
+        ink_level: Niveau de gris sous lequel un pixel est de l'encre.
+        blank_max_ink: Part maximale de la vignette couverte d'encre pour une page blanche.
+        sparse_max_ink: Part maximale de la vignette couverte d'encre pour une page peu dense.
+        min_std: Écart-type minimal des niveaux de gris d'une page non uniforme.
+
+    Returns:
+        Un dictionnaire {"category", "ink_ratio", "std", "blocks"}, où "blocks" donne,
+        pour une page peu dense, les blocs d'encre [x1, y1, x2, y2] en coordonnées
+        de `page_image`.
+    """
+    gray = page_image if page_image.mode == "L" else page_image.convert("L")
+    factor = max(1, gray.width // thumbnail_width)
+    thumbnail = _min_pool(np.asarray(gray), factor)
+
+    ink = thumbnail < ink_level
+    ink_ratio = float(ink.mean())
+    std = float(thumbnail.std())
+
+    if ink_ratio <= blank_max_ink or std < min_std:
+        category = BLANK
+    elif ink_ratio <= sparse_max_ink:
+        category = SPARSE
+    else:
+        category = DENSE
+
+    return {
+        "category": category,
+        "ink_ratio": round(ink_ratio, 5),
+        "std": round(std, 2),
+        "blocks": _ink_blocks(ink, factor) if category == SPARSE else [],
+    }
@@ -0,0 +1,217 @@
+# kai_kite/core/worker_pool.py
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .pipeline import (
+    CHECKPOINT_DIR, MANIFEST_PATH, add_page_result, finalize_document, iter_batches, layout_dpi_for, load_models,
+    open_output, process_page_batch,
+)
+from .preprocessor import PageSource
+from ..utils.config import get_config
+from ..utils.cache import PageCheckpoint, ProcessingManifest, config_fingerprint
+from ..utils.logging import logger
+from ..utils.profiling import StageTimer
+
+# Source de pages ouverte dans le processus worker courant (un seul document à la fois).
+_worker_pages = None
+
+
+def _init_worker(torch_threads: int):
+    """
+    Initialise un processus worker : limite les threads de torch pour éviter
+    la sur-souscription du CPU (sauf si `torch_num_threads` est fixé dans la
+    configuration), puis charge les modèles une seule fois.
+    """
+    import torch
+    torch.set_num_threads(torch_threads)
+    load_models()
+
+
+def _get_worker_pages(file_path: Path, dpi: int) -> PageSource:
+    """Garde le document courant ouvert dans le worker pour enchaîner ses pages."""
+    global _worker_pages
+
+    if _worker_pages is None or _worker_pages.file_path != file_path:
+        if _worker_pages is not None:
+            _worker_pages.close()
+        _worker_pages = PageSource(file_path, dpi=dpi)
+    return _worker_pages
+
+
+def _process_pages_task(file_path: Path, page_nums: list, processing: dict):
+    """
+    Tâche exécutée dans un worker : rend et traite un petit lot de pages consécutives
+    d'un document (un batch de détection de mise en page).
+
+    Returns:
+        (chemin du document, résultats par page, erreur) : en cas d'échec, les
+        résultats sont vides et l'erreur est renseignée (le lot n'a pas de résultat).
+    """
+    batch = []
+    render_times = {}
+    error = None
+    try:
+        pages = _get_worker_pages(file_path, processing['image_dpi'])
+        layout_dpi = layout_dpi_for(pages, processing)
+        for page_num in page_nums:
+            timer = StageTimer()
+            batch.append((page_num, pages.render(page_num, dpi=layout_dpi)))
+            render_times[page_num] = timer.elapsed(1)
+        results = process_page_batch(batch, processing, page_source=pages, render_times=render_times)
+    except Exception as e:
+        logger.error(f"Erreur sur les pages {page_nums[0] + 1}-{page_nums[-1] + 1} de {file_path.name} : {e}")
+        results, error = {}, str(e)
+    finally:
+        for _, page_image in batch:
+            page_image.close()
+    return file_path, page_nums, results, error
+
+
+def process_documents_parallel(files_to_process: list, workers: int, force: bool = False, failures: dict = None):
+    """
+    Traite plusieurs documents avec un pool de processus, à la granularité de la page.
+
+    Toutes les pages de tous les documents sont soumises au pool, par petits lots de
+    `layout_batch_size` pages : un seul gros PDF occupe ainsi tous les workers.
+    Les résultats de chaque document sont remis dans l'ordre des pages avant
+    l'assemblage du JSON final, fait dans le processus principal.
+
+    Comme en mode séquentiel, les documents à jour sont sautés et les pages déjà
+    présentes dans un point de reprise ne sont pas resoumises.
+
+    Un document dont une page a échoué n'est ni assemblé ni enregistré dans le
+    manifeste : ses pages réussies restent dans le point de reprise, et le
+    prochain passage ne retraite que les pages manquantes.
+
+    Args:
+        files_to_process: Les chemins des documents à traiter.
+        workers: Le nombre de processus workers.
+        force: Retraiter les documents même s'ils sont à jour.
+        failures: Si fourni, reçoit {nom du document: erreur} pour les documents en échec.
+
+    Returns:
+        Les rapports de profilage des documents traités.
+    """
+    config = get_config()
+    processing = config['processing']
+    dpi = processing['image_dpi']
+    batch_size = max(1, processing.get('layout_batch_size', 1))
+
+    manifest = ProcessingManifest(MANIFEST_PATH)
+    config_hash = config_fingerprint(config)
+    profiles = []
+
+    # Planifier les pages restantes de chaque document
+    documents = {}
+    for file_path in files_to_process:
+        started = time.perf_counter()
+        try:
+            content_hash = manifest.content_hash(file_path)
+            if not force and manifest.is_up_to_date(content_hash, config_hash, file_path):
+                logger.info(f"Document inchangé, traitement sauté : {file_path.name}")
+                continue
+            with PageSource(file_path, dpi=dpi) as pages:
+                page_count = len(pages)
+        except Exception as e:
+            logger.error(f"Impossible d'ouvrir {file_path.name} : {e}")
+            continue
+
+        checkpoint = PageCheckpoint(CHECKPOINT_DIR, content_hash, config_hash, file_path.name)
+        writer = open_output(file_path, config.get('output', {}), content_hash)
+        page_results = {}
+        for page_num, result in sorted(({} if force else checkpoint.load()).items()):
+            add_page_result(page_results, writer, page_num, result)
+        document = {
+            "page_count": page_count,
+            "content_hash": content_hash,
+            "checkpoint": checkpoint,
+            "writer": writer,
+            "page_results": page_results,
+            "failed_pages": [],
+            "errors": [],
+            "started": started,
+        }
+        if len(page_results) >= page_count:
+            # Toutes les pages étaient déjà dans le point de reprise
+            profiles.append(finalize_document(
+                file_path, page_results, writer, manifest, checkpoint, content_hash, config_hash, started
+            ))
+            continue
+        documents[file_path] = document
+
+    total_pages = sum(doc["page_count"] - len(doc["page_results"]) for doc in documents.values())
+    logger.info(f"{total_pages} page(s) réparties sur {workers} worker(s)...")
+    if not total_pages:
+        manifest.save()
+        return profiles
+
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    interrupted = "traitement interrompu"
+
+    # "spawn" évite d'hériter de l'état des threads de torch du processus parent
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(torch_threads,),
+        ) as executor:
+            # Une tâche = un batch de pages consécutives restantes d'un même document
+            futures = [
+                executor.submit(_process_pages_task, file_path, page_nums, processing)
+                for file_path, doc in documents.items()
+                for page_nums in iter_batches(
+                    [num for num in range(doc["page_count"]) if num not in doc["page_results"]], batch_size
+                )
+            ]
+
+            done_pages = 0
+            for future in as_completed(futures):
+                file_path, page_nums, results, error = future.result()
+                doc = documents[file_path]
+                if error is not None:
+                    # Pas de point de reprise pour ces pages : elles seront retraitées au prochain passage
+                    doc["failed_pages"].extend(page_nums)
+                    doc["errors"].append(error)
+                for page_num in sorted(results):
+                    doc["checkpoint"].append(page_num, results[page_num])
+                    add_page_result(doc["page_results"], doc["writer"], page_num, results[page_num])
+                done_pages += len(page_nums)
+                logger.info(f"  - {len(doc['page_results'])}/{doc['page_count']} page(s) de {file_path.name} terminée(s) ({done_pages}/{total_pages})")
+
+                if len(doc["page_results"]) + len(doc["failed_pages"]) < doc["page_count"]:
+                    continue
+                documents.pop(file_path)
+                if doc["failed_pages"]:
+                    doc["writer"].abort()
+                    pages_list = ", ".join(str(num + 1) for num in sorted(doc["failed_pages"]))
+                    logger.error(f"Document incomplet, non assemblé : {file_path.name} (page(s) en échec : {pages_list}). "
+                                 f"Il sera repris au prochain passage.")
+                    if failures is not None:
+                        failures[file_path.name] = f"page(s) {pages_list} : {doc['errors'][0]}"
+                else:
+                    # Dès qu'un document est complet, on l'assemble dans l'ordre des pages
+                    logger.info(f"--- Assemblage du document : {file_path.name} ---")
+                    profiles.append(finalize_document(
+                        file_path, doc["page_results"], doc["writer"], manifest, doc["checkpoint"], doc["content_hash"],
+                        config_hash, doc["started"],
+                    ))
+    except BrokenProcessPool as e:
+        # Un worker a été tué (manque de mémoire...) : les tâches restantes sont perdues
+        logger.error(f"Pool de workers interrompu : {e}")
+        interrupted = f"pool de workers interrompu : {e}"
+    finally:
+        # Documents jamais assemblés : leurs sorties temporaires sont supprimées, les pages
+        # terminées restent dans leur point de reprise
+        for file_path, doc in documents.items():
+            doc["writer"].abort()
+            logger.error(f"Document incomplet, non assemblé : {file_path.name}. Il sera repris au prochain passage.")
+            if failures is not None:
+                failures[file_path.name] = interrupted
+        manifest.save()
+    return profiles
@@ -1,49 +1,100 @@
 # kai_kite/formatting/json_builder.py
-import json
 import uuid
+from collections import Counter
 from datetime import datetime
 
-def build_final_json(source_file: str, extracted_elements: list):
+from ..utils.cache import document_key
+
+# Espace de noms des UUID (v5) de kai_kite : un même document donne toujours les mêmes IDs
+KAI_KITE_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "kai_kite")
+
+
+class ChunkBuilder:
     """
-    Assemble les éléments extraits dans le format JSON final, en ajoutant
-    des identifiants uniques et stables pour chaque chunk et chaque section.
+    Construit les chunks d'un document au fil de ses pages.
+
+    Le titre et l'ID de la section courante passent d'une page à la suivante :
+    les pages doivent donc être fournies dans l'ordre.
+
+    Les IDs sont des UUID v5 dérivés de l'empreinte du contenu et du nom du
+    document, de la page, des coordonnées, du type et du contenu de l'élément : retraiter un
+    document inchangé redonne les mêmes IDs. Deux éléments identiques au même
+    endroit sont départagés par leur rang. L'ID d'une section est dérivé de celui
+    de son chunk titre.
     """
-    
-    current_title = ""
-    current_section_id = None
-    chunks = []
-
-    # Trier les éléments par leur position (haut en bas) pour un ordre logique
-    extracted_elements.sort(key=lambda x: (x.get('page', 0), x['coordinates'][1]))
-
-    for element in extracted_elements:
-        element_type = element['element_type']
-        
-        # Mettre à jour le titre et l'ID de la section courante
-        if element_type in ["Title", "Section-header"]:
-            current_title = element['content']
-            current_section_id = str(uuid.uuid4()) # Nouvel ID pour chaque nouvelle section
-
-        # Créer le chunk pour le JSON
-        chunk = {
-            "content": element['content'],
-            "meta": {
-                "chunk_id": str(uuid.uuid4()),
-                "section_id": current_section_id,
-                "doc_id": source_file,
-                "page": element.get('page'),
-                "element_type": element_type,
-                "parent_title": current_title if current_title != element['content'] else "",
-                "coordinates": element['coordinates']
+
+    def __init__(self, source_file: str, doc_hash: str = None):
+        self.source_file = source_file
+        # Même graine que la clé du manifeste : deux copies d'un même fichier sous des noms
+        # différents ne partagent aucun ID. Sans empreinte, le nom seul sert de graine.
+        seed = document_key(doc_hash, source_file) if doc_hash else source_file
+        self.namespace = uuid.uuid5(KAI_KITE_NAMESPACE, seed)
+        self.current_title = ""
+        self.current_section_id = None
+        self._seen_keys = Counter()
+
+    def _chunk_id(self, element: dict) -> str:
+        """ID stable d'un élément ; un compteur distingue les éléments de même clé."""
+        coordinates = ",".join(f"{c:.1f}" for c in element['coordinates'])
+        key = f"{element.get('page')}|{coordinates}|{element['element_type']}|{element['content']}"
+        self._seen_keys[key] += 1
+        if self._seen_keys[key] > 1:
+            key = f"{key}|{self._seen_keys[key]}"
+        return str(uuid.uuid5(self.namespace, key))
+
+    def add_elements(self, elements: list) -> list:
+        """Transforme les éléments d'une ou plusieurs pages (dans l'ordre) en chunks."""
+        chunks = []
+
+        # Trier les éléments par leur position (haut en bas) pour un ordre logique
+        for element in sorted(elements, key=lambda x: (x.get('page', 0), x['coordinates'][1])):
+            element_type = element['element_type']
+            chunk_id = self._chunk_id(element)
+
+            # Mettre à jour le titre et l'ID de la section courante
+            if element_type in ["Title", "Section-header"]:
+                self.current_title = element['content']
+                # Nouvel ID pour chaque nouvelle section, dérivé de son chunk titre
+                self.current_section_id = str(uuid.uuid5(self.namespace, f"section|{chunk_id}"))
+
+            # Créer le chunk pour le JSON
+            chunk = {
+                "content": element['content'],
+                "meta": {
+                    "chunk_id": chunk_id,
+                    "section_id": self.current_section_id,
+                    "doc_id": self.source_file,
+                    "page": element.get('page'),
+                    "element_type": element_type,
+                    "parent_title": self.current_title if self.current_title != element['content'] else "",
+                    "coordinates": element['coordinates']
+                }
             }
-        }
-        chunks.append(chunk)
+            if element.get('table') is not None:
+                # Représentation structurée optionnelle d'un tableau (grille de cellules)
+                chunk["meta"]["table"] = element['table']
+            chunks.append(chunk)
+
+        return chunks
 
+
+def build_final_json(source_file: str, extracted_elements: list, doc_hash: str = None, pages: list = None,
+                     date: str = None):
+    """
+    Assemble les éléments extraits dans le format JSON final, en ajoutant
+    des identifiants uniques et stables pour chaque chunk et chaque section
+    (voir `ChunkBuilder`). `pages` contient les métadonnées de chaque page
+    (source du texte, tri), y compris celles des pages sans contenu ; `date`
+    est la date du document (YYYY-MM-DD).
+    """
     final_structure = {
         "source_file": source_file,
+        "doc_hash": doc_hash,
+        "date": date,
         "processing_date": datetime.utcnow().isoformat() + "Z",
-        "chunks": chunks
+        "chunks": ChunkBuilder(source_file, doc_hash).add_elements(extracted_elements)
     }
-    
-    return final_structure
+    if pages:
+        final_structure["pages"] = pages
 
+    return final_structure
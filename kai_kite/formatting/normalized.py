@@ -0,0 +1,87 @@
+# kai_kite/formatting/normalized.py
+"""
+Format "normalisé" parent/enfant lu par l'indexeur de kaitiaki (*.normalized.jsonl).
+
+Chaque section (les chunks qui partagent un `section_id`) donne un chunk
+"parent", qui agrège le texte de la section pour le LLM, suivi de ses chunks
+"enfants", un par élément, utilisés pour la recherche.
+"""
+import re
+from datetime import datetime
+from pathlib import Path
+
+
+def guess_date_from_filename(name: str) -> str:
+    """
+    Extrait une date (YYYY-MM-DD) du nom de fichier.
+    """
+    m = re.search(r"(20\d{2}[-_]?\d{2}[-_]?\d{2})", name)
+    if not m:
+        return None
+    s = m.group(1).replace("_", "-")
+    if len(s) == 8:  # Supporte le format YYYYMMDD
+        s = f"{s[:4]}-{s[4:6]}-{s[6:]}"
+    return s
+
+
+def document_date(name: str, path: Path = None) -> str:
+    """
+    Date d'un document (YYYY-MM-DD) : celle de son nom, sinon la date de
+    modification de `path`. Contrairement à la date du jour, elle ne change pas
+    d'un traitement à l'autre (elle entre dans l'empreinte des documents indexés).
+    """
+    date = guess_date_from_filename(name)
+    if date is None and path is not None:
+        date = datetime.fromtimestamp(Path(path).stat().st_mtime).date().isoformat()
+    return date
+
+
+def section_to_normalized_chunks(section_id: str, child_chunks: list, doc_id: str, date: str) -> list:
+    """
+    Transforme les chunks kai_kite d'une section en un chunk parent suivi de ses enfants.
+
+    Args:
+        section_id: L'ID de la section, qui devient l'ID du chunk parent.
+        child_chunks: Les chunks kai_kite de la section ({"content", "meta"}).
+        doc_id: Le nom du document source.
+        date: La date du document (YYYY-MM-DD).
+    """
+    if not child_chunks:
+        return []
+
+    # Assurer un ordre logique en triant les enfants par page et position verticale.
+    child_chunks = sorted(child_chunks, key=lambda c: (c['meta']['page'], c['meta']['coordinates'][1]))
+
+    # --- Chunk "parent" pour le contexte ---
+    # Le parent agrège le contenu de tous ses enfants.
+    parent_content = "\n\n".join([c['content'] for c in child_chunks])
+    first_child_meta = child_chunks[0]['meta']
+    normalized = [{
+        "chunk_id": section_id,  # L'ID de la section devient l'ID du chunk parent.
+        "parent_id": None,       # Les parents n'ont pas de parent.
+        "chunk_type": "parent",
+        "doc_id": doc_id,
+        "date": date,
+        "page": first_child_meta.get("page", 0),
+        "text": parent_content,   # Contenu complet pour le LLM.
+        "element_type": "Section",
+        "parent_title": first_child_meta.get("parent_title", ""),
+    }]
+
+    # --- Chunks "enfants" pour la recherche ---
+    # Chaque enfant est un élément atomique lié à son parent.
+    for child in child_chunks:
+        meta = child.get("meta", {})
+        normalized.append({
+            "chunk_id": meta.get("chunk_id", ""),
+            "parent_id": section_id, # Lien sémantique vers le parent.
+            "chunk_type": "child",
+            "doc_id": doc_id,
+            "date": date,
+            "page": meta.get("page", 0),
+            "text": child.get("content", ""), # Contenu précis pour la recherche.
+            "element_type": meta.get("element_type", "Text"),
+            "parent_title": meta.get("parent_title", ""),
+            "coordinates": meta.get("coordinates", [])
+        })
+    return normalized
@@ -0,0 +1,219 @@
+# kai_kite/formatting/writers.py
+import json
+import os
+from pathlib import Path
+
+from .json_builder import ChunkBuilder, build_final_json
+from .normalized import section_to_normalized_chunks
+from ..utils.cache import atomic_tmp_path
+from ..utils.profiling import StageTimer, add_time
+
+OUTPUT_FORMATS = ["json", "jsonl", "normalized"]
+
+
+class DocumentWriter:
+    """
+    Écrit la sortie d'un document à partir de ses pages, reçues dans n'importe
+    quel ordre : les pages en avance sont gardées jusqu'à ce que celles qui les
+    précèdent arrivent, puis transmises dans l'ordre (les sections continuent
+    d'une page à l'autre).
+
+    Le fichier est écrit sous un nom temporaire puis renommé à la fermeture :
+    un arrêt brutal ne laisse jamais de sortie partielle.
+
+    Les métadonnées des pages (source du texte, tri des pages blanches ou peu
+    denses) sont jointes à la sortie : clé "pages" du JSON, ou fichier
+    <document>.pages.json à côté des formats JSONL, comme la date du document.
+
+    `profile` cumule les mesures des étapes "json_build" et "write".
+    """
+
+    suffix = ".json"
+
+    def __init__(self, output_dir: Path, source_file: str, doc_hash: str = None, date: str = None):
+        self.source_file = source_file
+        self.doc_hash = doc_hash
+        self.date = date
+        self.path = output_dir / f"{Path(source_file).stem}{self.suffix}"
+        self.tmp_path = atomic_tmp_path(self.path)
+        self.profile = {}
+        self.chunk_count = 0
+        self.page_info = {}
+        self._pending = {}
+        self._next_page = 0
+
+    def add_page(self, page_num: int, elements: list, page_info: dict = None):
+        """Reçoit les éléments d'une page (index à partir de 0) et ses métadonnées."""
+        if page_info:
+            self.page_info[page_num] = page_info
+        self._pending[page_num] = elements
+        while self._next_page in self._pending:
+            self._write_page(self._pending.pop(self._next_page))
+            self._next_page += 1
+
+    def close(self):
+        """
+        Termine la sortie et la met en place.
+
+        Returns:
+            Le chemin du fichier écrit, ou None si aucun chunk n'a été produit.
+        """
+        # Pages manquantes (erreurs) : transmettre celles qui restent, dans l'ordre
+        for page_num in sorted(self._pending):
+            self._write_page(self._pending.pop(page_num))
+        self._finish()
+        if not self.chunk_count:
+            self.abort()
+            return None
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def pages_metadata(self) -> list:
+        """Métadonnées des pages, dans l'ordre, avec leur numéro à partir de 1."""
+        return [{"page": page_num + 1, **self.page_info[page_num]} for page_num in sorted(self.page_info)]
+
+    def abort(self):
+        """Abandonne la sortie en cours (fichier temporaire supprimé)."""
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+
+    def _write_page(self, elements: list):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+
+class JsonDocumentWriter(DocumentWriter):
+    """Format historique : un seul JSON indenté par document, écrit à la fermeture."""
+
+    def __init__(self, output_dir: Path, source_file: str, doc_hash: str = None, date: str = None):
+        super().__init__(output_dir, source_file, doc_hash, date)
+        self._elements = []
+
+    def _write_page(self, elements: list):
+        self._elements.extend(elements)
+
+    def _finish(self):
+        if not self._elements:
+            return
+        timer = StageTimer()
+        final_json_data = build_final_json(self.source_file, self._elements, self.doc_hash, self.pages_metadata(), self.date)
+        self.chunk_count = len(final_json_data["chunks"])
+        add_time(self.profile, "json_build", timer.elapsed(self.chunk_count))
+
+        timer = StageTimer()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(final_json_data, f, ensure_ascii=False, indent=2)
+        add_time(self.profile, "write", timer.elapsed(1))
+
+
+class JsonlDocumentWriter(DocumentWriter):
+    """Un chunk compact par ligne ({"content", "meta"}), ajouté page après page."""
+
+    suffix = ".jsonl"
+
+    def __init__(self, output_dir: Path, source_file: str, doc_hash: str = None, date: str = None):
+        super().__init__(output_dir, source_file, doc_hash, date)
+        self._builder = ChunkBuilder(source_file, doc_hash)
+        self._file = None
+
+    def _write_page(self, elements: list):
+        timer = StageTimer()
+        chunks = self._builder.add_elements(elements)
+        add_time(self.profile, "json_build", timer.elapsed(len(chunks)))
+        self._write_records(chunks)
+
+    def _write_records(self, records: list):
+        if not records:
+            return
+        timer = StageTimer()
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.tmp_path, "w", encoding="utf-8")
+        self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self.chunk_count += len(records)
+        add_time(self.profile, "write", timer.elapsed(len(records)))
+
+    def _finish(self):
+        self._close_file()
+
+    def close(self):
+        path = super().close()
+        if path is not None and (self.page_info or self.date):
+            # Métadonnées du document et des pages à côté du flux (l'adaptateur n'y lit que la date)
+            pages_path = self.path.with_name(f"{Path(self.source_file).stem}.pages.json")
+            tmp_path = atomic_tmp_path(pages_path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"source_file": self.source_file, "date": self.date, "pages": self.pages_metadata()}, f,
+                          ensure_ascii=False)
+            os.replace(tmp_path, pages_path)
+        return path
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def abort(self):
+        self._close_file()
+        super().abort()
+
+
+class NormalizedDocumentWriter(JsonlDocumentWriter):
+    """
+    Chunks parent/enfant (*.normalized.jsonl) directement lisibles par l'indexeur
+    de kaitiaki, sans passer par `adapt_from_kaitike`. Une section est écrite dès
+    que la suivante commence ; les éléments précédant le premier titre (sans
+    section) sont ignorés, comme dans l'adaptateur.
+    """
+
+    suffix = ".normalized.jsonl"
+
+    def __init__(self, output_dir: Path, source_file: str, doc_hash: str = None, date: str = None):
+        super().__init__(output_dir, source_file, doc_hash, date)
+        self._section_id = None
+        self._section_chunks = []
+
+    def _write_page(self, elements: list):
+        timer = StageTimer()
+        chunks = self._builder.add_elements(elements)
+        completed = []
+        for chunk in chunks:
+            section_id = chunk["meta"]["section_id"]
+            if not section_id:
+                continue
+            if section_id != self._section_id:
+                completed.extend(self._flush_section())
+                self._section_id = section_id
+            self._section_chunks.append(chunk)
+        add_time(self.profile, "json_build", timer.elapsed(len(chunks)))
+        self._write_records(completed)
+
+    def _flush_section(self) -> list:
+        records = section_to_normalized_chunks(self._section_id, self._section_chunks, self.source_file, self.date)
+        self._section_chunks = []
+        return records
+
+    def _finish(self):
+        self._write_records(self._flush_section())
+        super()._finish()
+
+
+def open_document_writer(output_dir: Path, source_file: str, output_format: str = "json",
+                         doc_hash: str = None, date: str = None) -> DocumentWriter:
+    """
+    Crée l'écrivain de sortie d'un document pour le format choisi (section
+    `output` de config.yaml). `doc_hash`, l'empreinte du contenu du document,
+    sert de graine aux IDs des chunks ; `date` (voir `document_date`) est
+    enregistrée dans la sortie.
+    """
+    writers = {
+        "json": JsonDocumentWriter,
+        "jsonl": JsonlDocumentWriter,
+        "normalized": NormalizedDocumentWriter,
+    }
+    if output_format not in writers:
+        raise ValueError(f"Format de sortie inconnu : {output_format} (attendu : {', '.join(OUTPUT_FORMATS)})")
+    return writers[output_format](output_dir, source_file, doc_hash, date)
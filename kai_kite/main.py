@@ -1,8 +1,13 @@
 # kai_kite/main.py
 from pathlib import Path
 import argparse
-from kai_kite.core.pipeline import process_document
+import time
+from kai_kite.core.pipeline import process_document, MANIFEST_PATH, RUN_PROFILE_PATH
+from kai_kite.utils.cache import ProcessingManifest
+from kai_kite.core.worker_pool import process_documents_parallel
+from kai_kite.core.batch import parse_shard, run_batch
 from kai_kite.utils.logging import logger
+from kai_kite.utils.profiling import build_run_summary, write_profile
 import yaml
 
 def main():
@@ -17,7 +22,40 @@ def main():
         type=str,
         help="Chemin vers le fichier ou le dossier à traiter."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Nombre de processus workers (traitement parallèle page par page). Par défaut : 1."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Retraiter tous les documents, même ceux qui n'ont pas changé depuis le dernier passage."
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="i/N",
+        help="Passage réparti : ne traiter que la part i (de 1 à N) des documents."
+    )
+    parser.add_argument(
+        "--claim",
+        action="store_true",
+        help="Passage réparti : réserver les documents un par un dans le dossier de sortie partagé "
+             "(les documents d'un nœud arrêté sont repris après expiration de sa réservation)."
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        default=None,
+        help="Identifiant du passage réparti, commun à tous les nœuds "
+             "(par défaut, dérivé des documents et de la configuration)."
+    )
     args = parser.parse_args()
+    if args.shard and args.claim:
+        parser.error("--shard et --claim sont exclusifs.")
 
     input_path = Path(args.input_path)
 
@@ -40,14 +78,45 @@ def main():
         logger.error(f"Le chemin '{input_path}' n'est ni un fichier ni un dossier valide.")
         return
 
-    # Traiter chaque fichier
-    for file_path in files_to_process:
-        # try:
-        logger.info(f"--- Début du traitement pour le fichier : {file_path.name} ---")
-        process_document(file_path)
-        logger.info(f"--- Fin du traitement pour le fichier : {file_path.name} ---")
-        # except Exception as e:
-        #     logger.error(f"Une erreur est survenue lors du traitement de {file_path.name}: {e}")
+    if args.shard or args.claim:
+        # Plusieurs nœuds sur les mêmes dossiers : le rapport du passage est fusionné
+        run_batch(files_to_process, args.workers, force=args.force, shard=args.shard, claim=args.claim,
+                  run_id=args.run_id)
+        return
+
+    started = time.perf_counter()
+    if args.workers > 1:
+        profiles = process_documents_parallel(files_to_process, args.workers, force=args.force)
+    else:
+        # Un seul manifeste pour tout le lot : les documents inchangés sont sautés
+        manifest = ProcessingManifest(MANIFEST_PATH)
+        profiles = []
+
+        # Traiter chaque fichier
+        for file_path in files_to_process:
+            # try:
+            logger.info(f"--- Début du traitement pour le fichier : {file_path.name} ---")
+            profile = process_document(file_path, manifest=manifest, force=args.force)
+            if profile is not None:
+                profiles.append(profile)
+            logger.info(f"--- Fin du traitement pour le fichier : {file_path.name} ---")
+            # except Exception as e:
+            #     logger.error(f"Une erreur est survenue lors du traitement de {file_path.name}: {e}")
+        manifest.save()
+
+    write_run_profile(profiles, time.perf_counter() - started)
+
+
+def write_run_profile(profiles: list, wall_s: float):
+    """Écrit la synthèse du profilage du passage et journalise la part de chaque étape."""
+    if not profiles:
+        return
+    summary = build_run_summary(profiles, wall_s)
+    write_profile(RUN_PROFILE_PATH, summary)
+    shares = ", ".join(f"{stage} {total['share']:.0%}" for stage, total in summary["stages"].items())
+    logger.info(f"Profil du passage : {summary['pages']} page(s) en {summary['wall_s']:.1f} s "
+                f"({summary['pages_per_s']} page/s) ; {shares}")
+    logger.info(f"Rapport de profilage : {RUN_PROFILE_PATH}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
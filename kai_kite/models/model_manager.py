@@ -2,17 +2,41 @@
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="torch.nn.modules.module")
 
+import torch
 from ultralytics import YOLO
-from transformers import TableTransformerForObjectDetection, AutoImageProcessor
+from transformers import TableTransformerForObjectDetection, AutoImageProcessor, AutoConfig
 from ..utils.config import get_config
 from ..utils.logging import logger # <-- Importer le logger
+from .onnx_backend import BACKENDS, OnnxTableTransformer, onnx_model_paths
+
+def get_backend(config: dict) -> str:
+    """Backend d'inférence choisi dans config.yaml : "torch", "onnx" ou "onnx-int8"."""
+    backend = config['models'].get('backend', 'torch')
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend d'inférence inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+    return backend
+
+def _onnx_model_path(config: dict, backend: str, name: str):
+    """Chemin d'un modèle converti ; il doit avoir été produit par la commande d'export."""
+    path = onnx_model_paths(config)[backend][name]
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Modèle {backend} introuvable : {path}. Lancez d'abord : python -m kai_kite.models.onnx_backend"
+        )
+    return path
 
 def get_layout_model():
     # ... (code existant)
     config = get_config()
-    model_path = config['models']['layout_detector']['repo_id']
-    logger.info(f"Chargement du modèle : {model_path}...")
-    model = YOLO(model_path)
+    backend = get_backend(config)
+    if backend == "torch":
+        model_path = config['models']['layout_detector']['repo_id']
+        logger.info(f"Chargement du modèle : {model_path}...")
+        model = YOLO(model_path)
+    else:
+        model_path = _onnx_model_path(config, backend, "layout")
+        logger.info(f"Chargement du modèle ({backend}) : {model_path}...")
+        model = YOLO(str(model_path), task="detect")
     logger.info("Modèle chargé avec succès.")
     return model
 
@@ -21,13 +45,28 @@ def get_table_models():
     config = get_config()
     structure_repo_id = config['models']['table_transformer']['structure_repo_id']
     
-    logger.info(f"Chargement du modèle de structure de tableau : {structure_repo_id}...")
+    num_threads = config['processing'].get('torch_num_threads', 0)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+        logger.info(f"Inférence torch limitée à {num_threads} thread(s).")
+
+    backend = get_backend(config)
+    logger.info(f"Chargement du modèle de structure de tableau ({backend}) : {structure_repo_id}...")
     
     image_processor = AutoImageProcessor.from_pretrained(structure_repo_id)
-    model = TableTransformerForObjectDetection.from_pretrained(
-        structure_repo_id,
-        ignore_mismatched_sizes=True
-    )
+    if backend == "torch":
+        model = TableTransformerForObjectDetection.from_pretrained(
+            structure_repo_id,
+            ignore_mismatched_sizes=True
+        )
+        model.eval()
+    else:
+        # Même interface que le modèle torch : model(**inputs) -> logits, pred_boxes
+        model = OnnxTableTransformer(
+            _onnx_model_path(config, backend, "table"),
+            AutoConfig.from_pretrained(structure_repo_id),
+            num_threads=num_threads,
+        )
     
     logger.info("Modèles de tableau chargés avec succès.")
     return image_processor, model
\ No newline at end of file
@@ -0,0 +1,293 @@
+# kai_kite/models/onnx_backend.py
+"""
+Backend ONNX Runtime (float32 ou int8) pour les modèles de vision de kai_kite.
+
+Export et quantification, à lancer une seule fois (les modèles convertis sont
+mis en cache dans `models.onnx_cache_dir`) :
+
+    python -m kai_kite.models.onnx_backend
+    python -m kai_kite.models.onnx_backend --check chemin/vers/un/document.pdf
+"""
+import warnings
+warnings.filterwarnings("ignore", category=UserWarning, module="torch.nn.modules.module")
+
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from ..utils.config import get_config
+from ..utils.logging import logger
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+def onnx_model_paths(config: dict) -> dict:
+    """
+    Chemins des modèles convertis dans le cache, par backend.
+
+    Returns:
+        {"onnx": {"layout": Path, "table": Path}, "onnx-int8": {...}}
+    """
+    models = config['models']
+    cache_dir = Path(models.get('onnx_cache_dir', "kai_kite/models/weights/onnx"))
+    layout_stem = Path(models['layout_detector']['repo_id']).stem
+    table_stem = models['table_transformer']['structure_repo_id'].replace("/", "--")
+    return {
+        "onnx": {
+            "layout": cache_dir / f"{layout_stem}.onnx",
+            "table": cache_dir / f"{table_stem}.onnx",
+        },
+        "onnx-int8": {
+            # Poids uint8 pour le modèle de mise en page (voir `export_models`)
+            "layout": cache_dir / f"{layout_stem}.uint8.onnx",
+            "table": cache_dir / f"{table_stem}.int8.onnx",
+        },
+    }
+
+
+class OnnxTableTransformer:
+    """
+    Remplaçant ONNX Runtime de `TableTransformerForObjectDetection`.
+
+    Il s'appelle comme le modèle torch (`model(**inputs)`) et renvoie des sorties
+    avec `logits` et `pred_boxes` en tenseurs torch : le post-traitement du
+    processeur d'image et le reste du pipeline fonctionnent sans changement.
+    """
+
+    def __init__(self, onnx_path: Path, model_config, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.config = model_config
+
+    def __call__(self, pixel_values, pixel_mask=None, **kwargs):
+        feeds = {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)}
+        if "pixel_mask" in self.input_names:
+            if pixel_mask is None:
+                pixel_mask = torch.ones(pixel_values.shape[0], *pixel_values.shape[2:], dtype=torch.int64)
+            feeds["pixel_mask"] = pixel_mask.cpu().numpy().astype(np.int64)
+        logits, pred_boxes = self.session.run(["logits", "pred_boxes"], feeds)
+        return SimpleNamespace(logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes))
+
+    def eval(self):
+        return self
+
+
+class _TableTransformerExportWrapper(torch.nn.Module):
+    """Expose les seules sorties utiles (logits, pred_boxes) sous forme de tuple pour l'export ONNX."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values, pixel_mask):
+        outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+        return outputs.logits, outputs.pred_boxes
+
+
+def export_models(force: bool = False) -> dict:
+    """
+    Exporte le modèle de mise en page (YOLO) et le Table Transformer en ONNX,
+    puis produit leur version quantifiée int8 (quantification dynamique des poids).
+    Les fichiers déjà présents dans le cache ne sont pas régénérés, sauf `force`.
+
+    Returns:
+        Les chemins des modèles convertis (voir `onnx_model_paths`).
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import TableTransformerForObjectDetection
+    from ultralytics import YOLO
+
+    config = get_config()
+    paths = onnx_model_paths(config)
+    fp32, int8 = paths["onnx"], paths["onnx-int8"]
+    fp32["layout"].parent.mkdir(parents=True, exist_ok=True)
+
+    # --- Modèle de mise en page ---
+    if force or not fp32["layout"].exists():
+        weights = config['models']['layout_detector']['repo_id']
+        logger.info(f"Export ONNX du modèle de mise en page : {weights}...")
+        exported = YOLO(weights).export(format="onnx", dynamic=True)
+        Path(exported).replace(fp32["layout"])
+        logger.info(f"Modèle exporté : {fp32['layout']}")
+
+    # --- Table Transformer ---
+    if force or not fp32["table"].exists():
+        structure_repo_id = config['models']['table_transformer']['structure_repo_id']
+        logger.info(f"Export ONNX du modèle de structure de tableau : {structure_repo_id}...")
+        model = TableTransformerForObjectDetection.from_pretrained(structure_repo_id, ignore_mismatched_sizes=True)
+        model.eval()
+        pixel_values = torch.randn(1, 3, 800, 800)
+        pixel_mask = torch.ones(1, 800, 800, dtype=torch.int64)
+        torch.onnx.export(
+            _TableTransformerExportWrapper(model),
+            (pixel_values, pixel_mask),
+            str(fp32["table"]),
+            input_names=["pixel_values", "pixel_mask"],
+            output_names=["logits", "pred_boxes"],
+            dynamic_axes={
+                "pixel_values": {0: "batch", 2: "height", 3: "width"},
+                "pixel_mask": {0: "batch", 1: "height", 2: "width"},
+                "logits": {0: "batch"},
+                "pred_boxes": {0: "batch"},
+            },
+            opset_version=17,
+        )
+        logger.info(f"Modèle exporté : {fp32['table']}")
+
+    # --- Quantification int8 ---
+    # Les convolutions de YOLO deviennent des ConvInteger, que le fournisseur CPU
+    # d'ONNX Runtime n'exécute qu'avec des poids uint8 ; le Table Transformer
+    # (MatMul) garde des poids int8 signés.
+    weight_types = {"layout": QuantType.QUInt8, "table": QuantType.QInt8}
+    for name in ["layout", "table"]:
+        if force or not int8[name].exists():
+            logger.info(f"Quantification int8 : {fp32[name].name}...")
+            quantize_dynamic(str(fp32[name]), str(int8[name]), weight_type=weight_types[name])
+            logger.info(f"Modèle quantifié : {int8[name]}")
+
+    return paths
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Matrice des IoU entre deux ensembles de boîtes [x1, y1, x2, y2]."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def check_parity(sample_path: Path, backend: str, min_iou: float = 0.9, box_tolerance: float = 0.02,
+                 conf_threshold: float = 0.5) -> bool:
+    """
+    Compare les boîtes du backend ONNX à celles du backend torch sur la première
+    page d'un document :
+    - mise en page : chaque boîte torch doit avoir une boîte ONNX de même classe
+      avec un IoU d'au moins `min_iou` ;
+    - tableaux : les boîtes normalisées du Table Transformer ne doivent pas
+      s'écarter de plus de `box_tolerance`.
+
+    Returns:
+        True si les deux comparaisons passent.
+    """
+    from ultralytics import YOLO
+    from ..core.preprocessor import PageSource
+
+    config = get_config()
+    with PageSource(sample_path, dpi=config['processing']['image_dpi']) as pages:
+        page_image = pages.render(0)
+
+    layout_path = onnx_model_paths(config)[backend]["layout"]
+    reference = YOLO(config['models']['layout_detector']['repo_id'])
+    candidate = YOLO(str(layout_path), task="detect")
+
+    def boxes_of(model):
+        boxes = model(page_image, verbose=False)[0].boxes
+        keep = boxes.conf.cpu().numpy() >= conf_threshold
+        return boxes.xyxy.cpu().numpy()[keep], boxes.cls.cpu().numpy()[keep]
+
+    ref_xyxy, ref_cls = boxes_of(reference)
+    try:
+        # Session CPU explicite, comme en production sans GPU : un opérateur sans noyau échoue ici
+        _run_layout_session(layout_path)
+        cand_xyxy, cand_cls = boxes_of(candidate)
+    except Exception as e:
+        logger.error(f"Modèle de mise en page {backend} inutilisable ({layout_path.name}) : {e}")
+        return False
+    if not len(ref_xyxy):
+        logger.warning("Aucune boîte détectée par le backend torch : comparaison impossible.")
+        return len(cand_xyxy) == 0
+
+    if len(cand_xyxy):
+        iou = _box_iou(ref_xyxy, cand_xyxy)
+        # Une boîte n'est retrouvée que par une boîte de même classe
+        iou[ref_cls[:, None] != cand_cls[None, :]] = 0
+        best = iou.max(axis=1)
+    else:
+        best = np.zeros(len(ref_xyxy))
+
+    matched = int((best >= min_iou).sum())
+    logger.info(
+        f"Parité mise en page {backend} / torch : {matched}/{len(ref_xyxy)} boîte(s) retrouvée(s) "
+        f"(IoU min. {best.min():.3f}, seuil {min_iou}) ; {len(cand_xyxy)} boîte(s) côté {backend}."
+    )
+    return matched == len(ref_xyxy) and _check_table_parity(page_image, backend, box_tolerance)
+
+
+def _run_layout_session(onnx_path: Path, image_size: int = 640):
+    """Charge le modèle de mise en page dans ONNX Runtime (CPU) et l'exécute sur une image vide."""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+    image = session.get_inputs()[0]
+    session.run(None, {image.name: np.zeros((1, 3, image_size, image_size), dtype=np.float32)})
+
+
+def _check_table_parity(page_image, backend: str, box_tolerance: float) -> bool:
+    """
+    Compare les boîtes brutes (`pred_boxes`, normalisées entre 0 et 1) du Table
+    Transformer ONNX à celles du modèle torch, sur la même entrée.
+    """
+    from transformers import AutoConfig, AutoImageProcessor, TableTransformerForObjectDetection
+
+    config = get_config()
+    structure_repo_id = config['models']['table_transformer']['structure_repo_id']
+    image_processor = AutoImageProcessor.from_pretrained(structure_repo_id)
+    reference = TableTransformerForObjectDetection.from_pretrained(structure_repo_id, ignore_mismatched_sizes=True)
+    reference.eval()
+    candidate = OnnxTableTransformer(onnx_model_paths(config)[backend]["table"], AutoConfig.from_pretrained(structure_repo_id))
+
+    inputs = image_processor(images=[page_image], return_tensors="pt")
+    with torch.inference_mode():
+        expected = reference(**inputs).pred_boxes.numpy()
+    actual = candidate(**inputs).pred_boxes.numpy()
+
+    max_diff = float(np.abs(expected - actual).max())
+    logger.info(f"Parité tableaux {backend} / torch : écart max. des boîtes {max_diff:.4f} (tolérance {box_tolerance}).")
+    return max_diff <= box_tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kai-kite : export ONNX / int8 des modèles de vision.")
+    parser.add_argument("--force", action="store_true", help="Régénérer les modèles déjà présents dans le cache.")
+    parser.add_argument(
+        "--check",
+        type=str,
+        default=None,
+        help="Document (PDF ou image) sur lequel comparer les boîtes des backends ONNX à celles de torch."
+    )
+    parser.add_argument("--min-iou", type=float, default=0.9, help="IoU minimal pour considérer une boîte retrouvée.")
+    parser.add_argument(
+        "--box-tolerance",
+        type=float,
+        default=0.02,
+        help="Écart maximal toléré sur les boîtes normalisées du Table Transformer."
+    )
+    args = parser.parse_args()
+
+    export_models(force=args.force)
+
+    if args.check:
+        results = {
+            backend: check_parity(Path(args.check), backend, args.min_iou, args.box_tolerance)
+            for backend in ["onnx", "onnx-int8"]
+        }
+        for backend, ok in results.items():
+            logger.info(f"Parité {backend} : {'OK' if ok else 'ÉCHEC'}")
+        if not all(results.values()):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
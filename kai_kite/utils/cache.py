@@ -0,0 +1,227 @@
+# kai_kite/utils/cache.py
+import atexit
+import hashlib
+import json
+import os
+import socket
+from datetime import datetime
+from pathlib import Path
+
+from .claims import FileLock, node_name
+from .logging import logger
+
+
+def file_sha256(file_path: Path, chunk_size: int = 1 << 20) -> str:
+    """Calcule l'empreinte SHA-256 du contenu d'un fichier, par blocs."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_fingerprint(config: dict) -> str:
+    """
+    Empreinte des paramètres qui influencent le résultat d'un document :
+    sections `models`, `processing` et `output` de config.yaml, plus la taille et
+    la date des poids locaux (un fichier .pt remplacé invalide donc le cache).
+    """
+    fingerprint = {
+        "models": config.get("models", {}),
+        "processing": config.get("processing", {}),
+        "output": config.get("output", {}),
+    }
+
+    weights = Path(config.get("models", {}).get("layout_detector", {}).get("repo_id", ""))
+    if weights.is_file():
+        stat = weights.stat()
+        fingerprint["layout_weights"] = [stat.st_size, stat.st_mtime_ns]
+
+    payload = json.dumps(fingerprint, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def atomic_tmp_path(path: Path) -> Path:
+    """
+    Nom temporaire d'une écriture atomique (écriture puis `os.replace`), propre à la
+    machine et au processus : plusieurs nœuds peuvent écrire dans le même dossier partagé.
+    """
+    return path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+
+
+def atomic_write_json(path: Path, data, indent: int = 2):
+    """Écrit un JSON via un fichier temporaire puis un renommage atomique (`indent=None` : JSON compact)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = atomic_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":"))
+    os.replace(tmp_path, path)
+
+
+def document_key(content_hash: str, source_name: str) -> str:
+    """Clé d'un document du manifeste : son contenu et son nom (deux copies d'un même fichier ont chacune leur sortie)."""
+    return f"{content_hash}/{source_name}"
+
+
+class ProcessingManifest:
+    """
+    Manifeste persistant des documents déjà traités.
+
+    Les documents sont indexés par l'empreinte de leur contenu et leur nom
+    (`document_key`). Un index secondaire (chemin -> taille, date de modification,
+    empreinte) évite de relire un fichier inchangé : vérifier qu'un document est à
+    jour se fait alors en O(1), sans hachage.
+
+    Chaque document terminé est ajouté, en une ligne, au journal du processus
+    (`<manifeste>.d/<nœud>.jsonl`) : un enregistrement coûte O(1), quelle que soit
+    la taille du manifeste, et résiste à un arrêt brutal. `save` reporte le journal
+    dans le manifeste (JSON compact), une fois en fin de passage (et à la sortie du
+    processus). Plusieurs processus, ou nœuds partageant le dossier de sortie,
+    peuvent tenir le même manifeste : chacun a son journal et ne réécrit le
+    manifeste que sous un verrou. À la lecture, le manifeste et tous les journaux
+    sont fusionnés.
+    """
+
+    def __init__(self, manifest_path: Path):
+        self.path = manifest_path
+        self.journal_dir = manifest_path.with_name(f"{manifest_path.name}.d")
+        self.journal_path = self.journal_dir / f"{node_name()}.jsonl"
+        self.documents, self.files = self._load()
+        self._changed_documents = set()
+        self._changed_files = set()
+        self._journaled_files = set()
+        atexit.register(self.save)
+
+    def _load(self):
+        documents, files = {}, {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                documents, files = data.get("documents", {}), data.get("files", {})
+            except json.JSONDecodeError:
+                logger.warning(f"Manifeste illisible, il sera reconstruit : {self.path}")
+
+        for journal in sorted(self.journal_dir.glob("*.jsonl")) if self.journal_dir.is_dir() else []:
+            try:
+                lines = journal.read_text(encoding="utf-8").splitlines()
+            except FileNotFoundError:
+                continue  # reporté dans le manifeste entre-temps par son processus
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal : on l'ignore
+                    continue
+                documents.update(record.get("documents", {}))
+                files.update(record.get("files", {}))
+
+        # Anciens manifestes : documents indexés par la seule empreinte du contenu
+        for key in [key for key in documents if "/" not in key]:
+            entry = documents.pop(key)
+            documents[document_key(key, entry.get("source_file", ""))] = entry
+        return documents, files
+
+    def content_hash(self, file_path: Path) -> str:
+        """Empreinte du contenu d'un fichier, recalculée seulement si sa taille ou sa date a changé."""
+        stat = file_path.stat()
+        key = str(file_path.resolve())
+        known = self.files.get(key)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+
+        sha256 = file_sha256(file_path)
+        self.files[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        self._changed_files.add(key)
+        return sha256
+
+    def is_up_to_date(self, content_hash: str, config_hash: str, file_path: Path) -> bool:
+        """Vrai si ce document a déjà été traité avec la même configuration et que sa sortie existe."""
+        entry = self.documents.get(document_key(content_hash, file_path.name))
+        if not entry or entry.get("config_hash") != config_hash:
+            return False
+        output = entry.get("output")
+        return output is None or Path(output).exists()
+
+    def record(self, content_hash: str, config_hash: str, file_path: Path, output_path: Path = None, page_count: int = 0):
+        """Enregistre un document traité, dans le journal du processus."""
+        key = document_key(content_hash, file_path.name)
+        self.documents[key] = {
+            "source_file": file_path.name,
+            "content_hash": content_hash,
+            "config_hash": config_hash,
+            "output": str(output_path) if output_path else None,
+            "pages": page_count,
+            "processed_at": datetime.utcnow().isoformat() + "Z",
+        }
+        self._changed_documents.add(key)
+
+        new_files = self._changed_files - self._journaled_files
+        record = {"documents": {key: self.documents[key]}, "files": {k: self.files[k] for k in new_files}}
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+        self._journaled_files |= new_files
+
+    def save(self):
+        """
+        Relit le manifeste et les journaux sous verrou, y reporte les entrées
+        modifiées par ce processus, réécrit le manifeste puis supprime le journal de
+        ce processus : les entrées écrites entre-temps par d'autres processus sont
+        conservées (et reprises ici).
+        """
+        if not self._changed_documents and not self._changed_files:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.path.with_name(f"{self.path.name}.lock")):
+            documents, files = self._load()
+            documents.update({key: self.documents[key] for key in self._changed_documents})
+            files.update({key: self.files[key] for key in self._changed_files})
+            atomic_write_json(self.path, {"documents": documents, "files": files}, indent=None)
+            if self.journal_path.exists():
+                self.journal_path.unlink()
+        self.documents, self.files = documents, files
+        self._changed_documents.clear()
+        self._changed_files.clear()
+        self._journaled_files.clear()
+
+
+class PageCheckpoint:
+    """
+    Points de reprise page par page d'un document, au format JSONL (une page par ligne).
+    Après un arrêt brutal, le traitement reprend après la dernière page terminée.
+    Comme dans le manifeste, un document est identifié par son contenu et son nom :
+    deux copies d'un même fichier ont chacune leur point de reprise.
+    """
+
+    def __init__(self, checkpoint_dir: Path, content_hash: str, config_hash: str, source_name: str):
+        # Le nom entre dans le fichier sous forme d'empreinte (caractères quelconques, longueur bornée)
+        key = hashlib.sha256(document_key(content_hash, source_name).encode("utf-8")).hexdigest()
+        self.path = checkpoint_dir / f"{key}-{config_hash[:16]}.pages.jsonl"
+
+    def load(self) -> dict:
+        """Relit les pages déjà terminées : {index de page: résultat de la page}."""
+        results = {}
+        if not self.path.exists():
+            return results
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal : on l'ignore
+                    continue
+                results[record["page_num"]] = record["result"]
+        return results
+
+    def append(self, page_num: int, result: dict):
+        """Ajoute une page terminée au point de reprise."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"page_num": page_num, "result": result}, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def clear(self):
+        """Supprime le point de reprise une fois le document terminé."""
+        if self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,229 @@
+# kai_kite/utils/claims.py
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .logging import logger
+
+
+def node_name() -> str:
+    """Identifiant du processus courant parmi les nœuds d'un passage : machine et PID."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    """
+    Jeton exclusif matérialisé par un fichier sur un volume partagé (NFS compris).
+
+    La création exclusive (O_CREAT | O_EXCL) est atomique : un seul processus
+    obtient le jeton. Le détenteur le renouvelle en touchant le fichier ; un jeton
+    dont le fichier n'a pas été touché depuis `lease_s` secondes est considéré
+    comme abandonné (nœud arrêté) et peut être repris.
+
+    La date de modification est celle du serveur de fichiers : `lease_s` doit
+    rester grand devant l'écart des horloges entre les machines.
+    """
+
+    def __init__(self, path: Path, lease_s: float, owner: str = None):
+        self.path = path
+        self.lease_s = lease_s
+        self.owner = owner or node_name()
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    def acquire(self) -> bool:
+        """Tente d'obtenir le jeton, sans attendre. Reprend un jeton expiré."""
+        if self._create():
+            return True
+        if self._break_expired():
+            return self._create()
+        return False
+
+    def renew(self):
+        """Repousse l'expiration du jeton détenu."""
+        if self.held:
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                logger.warning(f"Jeton perdu (repris par un autre nœud ?) : {self.path.name}")
+                self.held = False
+
+    def release(self):
+        """Rend le jeton, s'il est toujours le nôtre."""
+        if not self.held:
+            return
+        self.held = False
+        holder = self.holder()
+        if holder is not None and holder.get("token") != self.token:
+            return
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def holder(self):
+        """Contenu du jeton actuel ({"owner", "token", "acquired_at"}), ou None."""
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _create(self) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"owner": self.owner, "token": self.token, "acquired_at": time.time()}, f)
+        self.held = True
+        return True
+
+    def _break_expired(self) -> bool:
+        """
+        Écarte un jeton expiré. Le renommage est atomique : si plusieurs nœuds
+        essaient en même temps, un seul y parvient.
+        """
+        stale_path = self.path.with_name(f"{self.path.name}.{self.token}.stale")
+        try:
+            before = os.stat(self.path)
+            if time.time() - before.st_mtime <= self.lease_s:
+                return False
+            os.rename(self.path, stale_path)
+        except FileNotFoundError:
+            return False
+
+        # Entre la lecture de la date et le renommage, un autre nœud a pu reprendre le
+        # jeton expiré et en créer un neuf : dans ce cas, on remet son jeton en place.
+        after = os.stat(stale_path)
+        if (after.st_ino, after.st_mtime_ns) != (before.st_ino, before.st_mtime_ns):
+            try:
+                os.link(stale_path, self.path)
+            except FileExistsError:
+                pass
+            stale_path.unlink()
+            return False
+
+        stale_path.unlink()
+        logger.warning(f"Jeton expiré repris : {self.path.name}")
+        return True
+
+
+class FileLock:
+    """
+    Verrou bloquant entre nœuds pour une courte section critique (par exemple la
+    mise à jour du manifeste partagé), fondé sur un `Lease`.
+    """
+
+    def __init__(self, path: Path, lease_s: float = 60.0, poll_s: float = 0.05):
+        self._lease = Lease(path, lease_s)
+        self.poll_s = poll_s
+
+    def __enter__(self):
+        while not self._lease.acquire():
+            time.sleep(self.poll_s)
+        return self
+
+    def __exit__(self, *exc):
+        self._lease.release()
+
+
+def claim_key(name: str) -> str:
+    """Nom de fichier sûr et stable pour un document, quel que soit son nom."""
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:24]
+
+
+class WorkClaims:
+    """
+    Répartition dynamique des documents d'un passage entre plusieurs nœuds qui
+    partagent `claims_dir`.
+
+    Chaque nœud réserve un document (`claim`) avant de le traiter : un jeton
+    `<clé>.claim` par document en cours, renouvelé par un thread de fond tant que
+    le nœud travaille. Un document terminé reçoit un marqueur `<clé>.done`, que
+    les autres nœuds sautent. Si un nœud s'arrête, ses jetons expirent au bout de
+    `lease_s` secondes et ses documents sont repris par les autres (depuis leur
+    point de reprise page par page).
+    """
+
+    def __init__(self, claims_dir: Path, lease_s: float = 600.0):
+        self.dir = claims_dir
+        self.lease_s = lease_s
+        self.owner = node_name()
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _paths(self, name: str):
+        key = claim_key(name)
+        return self.dir / f"{key}.claim", self.dir / f"{key}.done"
+
+    def is_done(self, name: str) -> bool:
+        return self._paths(name)[1].exists()
+
+    def done_status(self, name: str):
+        """Contenu du marqueur de fin d'un document ({"status", "node", ...}), ou None."""
+        try:
+            return json.loads(self._paths(name)[1].read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def claim(self, name: str) -> bool:
+        """Réserve un document non terminé. Faux s'il est terminé ou réservé par un nœud actif."""
+        claim_path, done_path = self._paths(name)
+        if done_path.exists():
+            return False
+        lease = Lease(claim_path, self.lease_s, self.owner)
+        if not lease.acquire():
+            return False
+        if done_path.exists():
+            # Terminé entre-temps par le nœud qui détenait le jeton
+            lease.release()
+            return False
+        with self._lock:
+            self._leases[name] = lease
+        return True
+
+    def complete(self, name: str, status: str = "done", **details):
+        """Marque un document comme terminé (`status` : "done", "skipped" ou "failed") et rend son jeton."""
+        done_path = self._paths(name)[1]
+        record = {"name": name, "status": status, "node": self.owner, "finished_at": time.time(), **details}
+        tmp_path = done_path.with_name(f".{done_path.name}.{self.owner}.tmp")
+        tmp_path.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, done_path)
+        with self._lock:
+            lease = self._leases.pop(name, None)
+        if lease is not None:
+            lease.release()
+
+    def release_all(self):
+        """Rend les jetons encore détenus (documents non terminés), pour qu'ils soient repris sans attendre."""
+        with self._lock:
+            leases, self._leases = list(self._leases.values()), {}
+        for lease in leases:
+            lease.release()
+
+    def start_heartbeat(self):
+        """Renouvelle les jetons détenus toutes les `lease_s / 3` secondes, dans un thread de fond."""
+        def beat():
+            while not self._stop.wait(self.lease_s / 3):
+                with self._lock:
+                    leases = list(self._leases.values())
+                for lease in leases:
+                    lease.renew()
+
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=beat, name="claims-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def stop_heartbeat(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
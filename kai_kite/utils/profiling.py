@@ -0,0 +1,189 @@
+# kai_kite/utils/profiling.py
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure de la mémoire résidente maximale
+    resource = None
+
+from .cache import atomic_tmp_path
+
+# Ordre des étapes dans les rapports
+STAGES = ["render", "triage", "layout", "ocr", "tables", "json_build", "write"]
+
+
+def peak_rss_mb():
+    """
+    Mémoire résidente maximale du processus courant depuis son démarrage (Mo), ou
+    None si indisponible. Ne fait que croître : elle ne dit pas quelle page l'a atteinte.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def current_rss_mb():
+    """Mémoire résidente actuelle du processus courant (Mo, lue dans /proc), ou None hors Linux."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20), 1)
+
+
+class StageTimer:
+    """
+    Chronomètre d'une étape : temps écoulé et temps CPU du thread courant
+    (les étapes du pipeline tournent chacune dans leurs propres threads).
+    """
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+
+    def elapsed(self, count: int = 0) -> dict:
+        return {
+            "wall_s": time.perf_counter() - self.wall,
+            "cpu_s": time.thread_time() - self.cpu,
+            "count": count,
+        }
+
+
+@contextmanager
+def stage_timer(profile: dict, stage: str):
+    """
+    Mesure un bloc et range la mesure dans `profile[stage]`. Le dictionnaire
+    produit peut recevoir le nombre d'éléments traités ("count").
+    """
+    timer = StageTimer()
+    record = {"count": 0}
+    try:
+        yield record
+    finally:
+        record.update(timer.elapsed(record["count"]))
+        profile[stage] = record
+
+
+def add_time(profile: dict, stage: str, record: dict):
+    """Cumule une mesure dans `profile[stage]` (étape mesurée en plusieurs fois)."""
+    total = profile.setdefault(stage, {"wall_s": 0.0, "cpu_s": 0.0, "count": 0})
+    for key in total:
+        total[key] += record[key]
+
+
+def iter_timed(iterable):
+    """Produit des tuples (élément, mesure du temps passé à le produire)."""
+    iterator = iter(iterable)
+    while True:
+        timer = StageTimer()
+        try:
+            value = next(iterator)
+        except StopIteration:
+            return
+        yield value, timer.elapsed(1)
+
+
+def split_record(record: dict, parts: int) -> dict:
+    """Part d'une mesure faite sur un lot, attribuée à chacun de ses `parts` éléments."""
+    return {"wall_s": record["wall_s"] / parts, "cpu_s": record["cpu_s"] / parts, "count": record["count"]}
+
+
+def _summarize(records: list) -> dict:
+    """Totaux et moyennes d'une étape sur plusieurs pages."""
+    wall = sum(r["wall_s"] for r in records)
+    return {
+        "calls": len(records),
+        "wall_s": round(wall, 4),
+        "cpu_s": round(sum(r["cpu_s"] for r in records), 4),
+        "count": sum(r.get("count", 0) for r in records),
+        "mean_wall_s": round(wall / len(records), 4) if records else 0.0,
+    }
+
+
+def build_document_profile(source_file: str, page_results: dict, document_stages: dict, wall_s: float) -> dict:
+    """
+    Assemble le rapport de profilage d'un document à partir des mesures de ses
+    pages (`result["profile"]`) et de celles faites sur le document entier
+    (assemblage et écriture du JSON).
+    """
+    pages = {}
+    by_stage = {stage: [] for stage in STAGES}
+    page_rss = []
+    for page_num in sorted(page_results):
+        profile = page_results[page_num].get("profile")
+        if not profile:
+            continue
+        pages[str(page_num + 1)] = profile
+        for stage, record in profile.items():
+            if stage in by_stage:
+                by_stage[stage].append(record)
+        if profile.get("rss_mb") is not None:
+            page_rss.append(profile["rss_mb"])
+
+    for stage, record in document_stages.items():
+        by_stage.setdefault(stage, []).append(record)
+
+    stages = {stage: _summarize(records) for stage, records in by_stage.items() if records}
+    return {
+        "source_file": source_file,
+        "page_count": len(page_results),
+        "wall_s": round(wall_s, 4),
+        # Mémoire résidente la plus haute mesurée à la fin d'une page (voir pages.*.rss_mb)
+        "max_page_rss_mb": max(page_rss) if page_rss else None,
+        # Pic de mémoire du processus qui assemble le document, depuis son démarrage
+        # (les pages traitées par des workers n'y figurent pas)
+        "process_peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+        "pages": pages,
+    }
+
+
+def build_run_summary(document_profiles: list, wall_s: float) -> dict:
+    """
+    Agrège les rapports de plusieurs documents : totaux par étape et part de
+    chaque étape dans le temps cumulé. `wall_s` est la durée réelle du passage
+    (les documents peuvent avoir été traités en parallèle).
+    """
+    totals = {}
+    for profile in document_profiles:
+        for stage, summary in profile["stages"].items():
+            total = totals.setdefault(stage, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "count": 0})
+            for key in total:
+                total[key] += summary[key]
+
+    stage_wall = sum(total["wall_s"] for total in totals.values()) or 1.0
+    for total in totals.values():
+        total["wall_s"] = round(total["wall_s"], 4)
+        total["cpu_s"] = round(total["cpu_s"], 4)
+        total["share"] = round(total["wall_s"] / stage_wall, 4)
+
+    page_rss = [p["max_page_rss_mb"] for p in document_profiles if p.get("max_page_rss_mb") is not None]
+    peaks = [p["process_peak_rss_mb"] for p in document_profiles if p.get("process_peak_rss_mb") is not None]
+    pages = sum(p["page_count"] for p in document_profiles)
+    order = {stage: index for index, stage in enumerate(STAGES)}
+    return {
+        "documents": len(document_profiles),
+        "pages": pages,
+        "wall_s": round(wall_s, 4),
+        "pages_per_s": round(pages / wall_s, 3) if wall_s else 0.0,
+        "max_page_rss_mb": max(page_rss) if page_rss else None,
+        "process_peak_rss_mb": max(peaks) if peaks else None,
+        "stages": {stage: totals[stage] for stage in sorted(totals, key=lambda s: order.get(s, len(STAGES)))},
+        "by_document": {p["source_file"]: {"pages": p["page_count"], "wall_s": p["wall_s"]} for p in document_profiles},
+    }
+
+
+def write_profile(path, profile: dict):
+    """Écrit un rapport de profilage au format JSON (fichier temporaire puis renommage)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = atomic_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -5,11 +5,11 @@ from fastapi import FastAPI, Request, Form
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
-import pickle
-import json
 from threading import Lock
 
 # Imports pour le chargement des modèles
+from kaitiaki.rag.analyzer import ANALYZER
+from kaitiaki.rag.bm25 import convert_pickle, open_index
 from kaitiaki.rag.search_engine import hybrid_search
 from kaitiaki.rag.llm_client import generate_answer
 from kaitiaki.rag.schemas import Answer, Query, Latency, Citation
@@ -44,23 +44,37 @@ async def lifespan(app: FastAPI):
     MODELS["store"] = store
     MODELS["retriever"] = QdrantEmbeddingRetriever(document_store=store)
     
+    load_bm25_index()
+
+    logger.info("Tous les modèles et index ont été chargés.")
+    yield
+    MODELS.clear()
+
+def load_bm25_index():
+    """
+    Ouvre (ou rouvre, après une ingestion) l'index BM25 local, projeté en mémoire :
+    l'ouverture est immédiate et les pages sont partagées entre les processus.
+    """
+    index_path = Path(CFG["paths"]["bm25_index"])
     try:
-        with open(CFG["paths"]["bm25_index"], "rb") as f:
-            bm25_data = pickle.load(f)
-        meta = json.loads(Path(CFG["paths"]["bm25_meta"]).read_text(encoding="utf-8"))
+        legacy_path = CFG["paths"].get("bm25_pickle")
+        if not index_path.exists() and legacy_path and Path(legacy_path).exists():
+            # Index construit par une version précédente (pickle) : converti une fois pour toutes
+            logger.info(f"Conversion de l'index BM25 {legacy_path} au format binaire...")
+            convert_pickle(legacy_path, CFG["paths"]["bm25_meta"], index_path)
+        # Les requêtes sont analysées comme les textes indexés : l'index doit venir du même analyseur
+        bm25, chunk_ids = open_index(index_path, analyzer=ANALYZER)
         MODELS["bm25_index"] = {
-            "bm25": bm25_data["bm25"],
-            "tokenized": bm25_data["tokenized"],
-            "meta": meta
+            "bm25": bm25,
+            "chunk_ids": chunk_ids
         }
-        logger.info("Index BM25 chargé avec succès.")
+        logger.info(f"Index BM25 chargé avec succès ({bm25.corpus_size} chunks).")
     except FileNotFoundError:
         logger.warning("Fichiers d'index BM25 non trouvés. La recherche lexicale sera désactivée. Lancez une ingestion.")
         MODELS["bm25_index"] = None
-
-    logger.info("Tous les modèles et index ont été chargés.")
-    yield
-    MODELS.clear()
+    except ValueError as e:
+        logger.error(f"Index BM25 illisible ou obsolète ({e}). La recherche lexicale sera désactivée. Relancez l'indexation.")
+        MODELS["bm25_index"] = None
 
 app = FastAPI(
     title="Kaitiaki API",
@@ -86,9 +100,11 @@ async def ingest_documents():
     try:
         logger.info("Début de l'ingestion via API (adapt_from_kaitike -> indexer)...")
         adapt_from_kaitike.main()
+        # Indexation incrémentale : la collection Qdrant reste interrogeable pendant la mise à jour
         indexer.main()
-        logger.info("Ingestion terminée avec succès. Veuillez redémarrer le serveur pour charger le nouvel index BM25.")
-        return {"status": "ok", "message": "Les documents ont été ingérés. Un redémarrage du serveur est requis pour activer les changements."}
+        load_bm25_index()
+        logger.info("Ingestion terminée avec succès.")
+        return {"status": "ok", "message": "Les documents ont été ingérés."}
     except Exception as e:
         logger.error(f"Erreur durant l'ingestion via API : {e}", exc_info=True)
         return {"status": "error", "message": str(e)}
@@ -1,49 +1,62 @@
 # kaitiaki/ingest/adapt_from_kaikite.py
 from pathlib import Path
 import json
-import re
-from datetime import datetime
 from kaitiaki.utils.logging import logger
 from kaitiaki.utils.settings import CFG
+from kai_kite.formatting.normalized import document_date, section_to_normalized_chunks
 from collections import defaultdict
 
 PROC_DIR = Path(CFG["paths"]["data_processed"])
 
-def guess_date_from_filename(name: str) -> str:
+def load_kai_kite_output(f: Path):
     """
-    Extrait une date (YYYY-MM-DD) du nom de fichier.
+    Lit une sortie de kai_kite : JSON indenté (<document>.json) ou un chunk par
+    ligne (<document>.jsonl).
+
+    Returns:
+        Un tuple (doc_id, liste des chunks, date du document). La date est celle
+        enregistrée par kai_kite (clé "date" du JSON ou du fichier <document>.pages.json) ;
+        les sorties plus anciennes n'en ont pas (None).
     """
-    m = re.search(r"(20\d{2}[-_]?\d{2}[-_]?\d{2})", name)
-    if not m:
-        return None
-    s = m.group(1).replace("_", "-")
-    if len(s) == 8:  # Supporte le format YYYYMMDD
-        s = f"{s[:4]}-{s[4:6]}-{s[6:]}"
-    return s
+    if f.suffix == ".jsonl":
+        chunks = []
+        with f.open("r", encoding="utf-8") as in_file:
+            for line in in_file:
+                if line.strip():
+                    chunks.append(json.loads(line))
+        doc_id = chunks[0]["meta"].get("doc_id", f.name) if chunks else f.name
+        pages_path = f.with_name(f"{f.stem}.pages.json")
+        date = json.loads(pages_path.read_text(encoding="utf-8")).get("date") if pages_path.exists() else None
+        return doc_id, chunks, date
+
+    data = json.loads(f.read_text(encoding="utf-8"))
+    return data.get("source_file", f.name), data.get("chunks", []), data.get("date")
 
 def main():
     """
     Transforme les sorties JSON de kai_kite en chunks sémantiques "parent/enfant"
     et les sauvegarde au format JSONL, prêts pour l'indexeur.
+
+    Inutile si kai_kite produit déjà ce format (`output.format: "normalized"`).
     """
     # On cible les fichiers JSON bruts de kai-kite, en ignorant les formats déjà traités.
     kai_kite_outputs = [
-        f for f in PROC_DIR.glob("*.json")
-        if not f.name.endswith(('.pages.json', '.normalized.json', '.normalized.jsonl'))
+        f for pattern in ("*.json", "*.jsonl") for f in PROC_DIR.glob(pattern)
+        if not f.name.endswith(('.pages.json', '.normalized.json', '.normalized.jsonl', '.profile.json'))
     ]
     
     if not kai_kite_outputs:
-        logger.warning("Aucun fichier de sortie de kai_kite (*.json) trouvé dans data/processed/. Le script n'a rien à faire.")
+        logger.warning("Aucun fichier de sortie de kai_kite (*.json, *.jsonl) trouvé dans data/processed/. Le script n'a rien à faire.")
         return
 
     logger.info(f"Adaptation de {len(kai_kite_outputs)} document(s) avec la logique sémantique parent/enfant...")
 
     for f in kai_kite_outputs:
         try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            kai_kite_chunks = data.get("chunks", [])
-            doc_id = data.get("source_file", f.name)
-            date = guess_date_from_filename(doc_id) or datetime.today().date().isoformat()
+            doc_id, kai_kite_chunks, date = load_kai_kite_output(f)
+            # Date calculée par kai_kite, comme pour output.format "normalized" ; pour une sortie
+            # plus ancienne, même règle avec la date du fichier kai_kite
+            date = date or document_date(doc_id, f)
 
             # --- Étape 1 : Grouper les chunks atomiques par section sémantique ---
             sections = defaultdict(list)
@@ -52,48 +65,10 @@ def main():
                 if section_id:
                     sections[section_id].append(chunk)
 
+            # --- Étape 2 : Un chunk "parent" par section, suivi de ses "enfants" ---
             final_chunks_to_write = []
             for section_id, child_chunks in sections.items():
-                if not child_chunks:
-                    continue
-
-                # Assurer un ordre logique en triant les enfants par page et position verticale.
-                child_chunks.sort(key=lambda c: (c['meta']['page'], c['meta']['coordinates'][1]))
-
-                # --- Étape 2 : Créer le chunk "parent" pour le contexte ---
-                # Le parent agrège le contenu de tous ses enfants.
-                parent_content = "\n\n".join([c['content'] for c in child_chunks])
-                first_child_meta = child_chunks[0]['meta']
-                parent_chunk = {
-                    "chunk_id": section_id,  # L'ID de la section devient l'ID du chunk parent.
-                    "parent_id": None,       # Les parents n'ont pas de parent.
-                    "chunk_type": "parent",
-                    "doc_id": doc_id,
-                    "date": date,
-                    "page": first_child_meta.get("page", 0),
-                    "text": parent_content,   # Contenu complet pour le LLM.
-                    "element_type": "Section",
-                    "parent_title": first_child_meta.get("parent_title", ""),
-                }
-                final_chunks_to_write.append(parent_chunk)
-
-                # --- Étape 3 : Créer les chunks "enfants" pour la recherche ---
-                # Chaque enfant est un élément atomique lié à son parent.
-                for child in child_chunks:
-                    meta = child.get("meta", {})
-                    child_chunk = {
-                        "chunk_id": meta.get("chunk_id", ""),
-                        "parent_id": section_id, # Lien sémantique vers le parent.
-                        "chunk_type": "child",
-                        "doc_id": doc_id,
-                        "date": date,
-                        "page": meta.get("page", 0),
-                        "text": child.get("content", ""), # Contenu précis pour la recherche.
-                        "element_type": meta.get("element_type", "Text"),
-                        "parent_title": meta.get("parent_title", ""),
-                        "coordinates": meta.get("coordinates", [])
-                    }
-                    final_chunks_to_write.append(child_chunk)
+                final_chunks_to_write.extend(section_to_normalized_chunks(section_id, child_chunks, doc_id, date))
 
             if final_chunks_to_write:
                 # Sauvegarde au format .jsonl pour une ingestion scalable.
@@ -112,4 +87,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
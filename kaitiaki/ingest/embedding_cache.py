@@ -0,0 +1,155 @@
+# kaitiaki/ingest/embedding_cache.py
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from kaitiaki.utils.logging import logger
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache disque des embeddings, dans une base SQLite : un vecteur float32 par
+    (modèle, normalisation, empreinte SHA-256 du texte). Un texte déjà encodé par
+    le même modèle n'est plus recalculé, d'une indexation à l'autre.
+
+    La taille du cache est bornée (`max_mb`) : au-delà, les vecteurs utilisés le
+    moins récemment sont supprimés (`evict`).
+    """
+
+    # Nombre maximal de paramètres d'une requête SQLite (anciennes versions : 999)
+    _BATCH = 500
+
+    def __init__(self, path: Path, model_name: str, normalize: bool = True, max_mb: float = 2048):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.normalize = int(normalize)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                normalize INTEGER NOT NULL,
+                text_sha256 TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, normalize, text_sha256)
+            ) WITHOUT ROWID
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+
+    def get_many(self, keys: list) -> dict:
+        """Vecteurs en cache pour ces empreintes : {empreinte: vecteur}. Marque les vecteurs trouvés comme utilisés."""
+        found = {}
+        for start in range(0, len(keys), self._BATCH):
+            batch = keys[start:start + self._BATCH]
+            rows = self._db.execute(
+                f"SELECT text_sha256, vector FROM embeddings WHERE model = ? AND normalize = ? "
+                f"AND text_sha256 IN ({','.join('?' * len(batch))})",
+                [self.model_name, self.normalize, *batch],
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND normalize = ? AND text_sha256 = ?",
+                [(now, self.model_name, self.normalize, key) for key in found],
+            )
+            self._db.commit()
+        return found
+
+    def put_many(self, keys: list, vectors: np.ndarray):
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, normalize, text_sha256, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(self.model_name, self.normalize, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+             for key, vector in zip(keys, vectors)],
+        )
+        self._db.commit()
+
+    def encode(self, embedder, texts: list, batch_size: int = 64) -> np.ndarray:
+        """
+        Embeddings de `texts`, dans l'ordre : seuls les textes absents du cache
+        sont encodés par `embedder` (un SentenceTransformer), puis mis en cache.
+        """
+        keys = [text_sha256(text) for text in texts]
+        cached = self.get_many(list(set(keys)))
+
+        # Les textes identiques d'un même lot ne sont encodés qu'une fois
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        misses = sum(1 for key in keys if key not in cached)
+        self.hits += len(keys) - misses
+        self.misses += misses
+
+        if missing:
+            vectors = embedder.encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                normalize_embeddings=bool(self.normalize),
+                show_progress_bar=False
+            )
+            vectors = np.asarray(vectors, dtype=np.float32)
+            self.put_many(list(missing), vectors)
+            cached.update(zip(missing, vectors))
+
+        return np.stack([cached[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def size_bytes(self) -> int:
+        (size,) = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return size
+
+    def evict(self) -> int:
+        """
+        Ramène le cache sous `max_mb` en supprimant les vecteurs utilisés le moins
+        récemment (jusqu'à 90 % de la limite, pour ne pas évincer à chaque passage).
+
+        Returns:
+            Le nombre de vecteurs supprimés.
+        """
+        size = self.size_bytes()
+        if size <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT model, normalize, text_sha256, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        ).fetchall()
+        victims = []
+        for model, normalize, key, length in rows:
+            if size <= target:
+                break
+            victims.append((model, normalize, key))
+            size -= length
+        self._db.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND normalize = ? AND text_sha256 = ?", victims
+        )
+        self._db.commit()
+        logger.info(f"Cache d'embeddings : {len(victims)} vecteur(s) évincé(s) (limite {self.max_bytes / 2**20:.0f} Mo).")
+        return len(victims)
+
+    def log_stats(self):
+        logger.info(f"Cache d'embeddings : {self.hits} trouvé(s), {self.misses} encodé(s) "
+                    f"(taux de succès {self.hit_rate:.1%}), {self.size_bytes() / 2**20:.1f} Mo sur disque.")
+
+    def close(self):
+        self._db.close()
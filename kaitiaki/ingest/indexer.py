@@ -1,141 +1,536 @@
 # kaitiaki/ingest/indexer.py
 from pathlib import Path
+import argparse
+import hashlib
 import json
-import pickle
-from collections import defaultdict
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 import yaml
-from rank_bm25 import BM25Okapi
 from sentence_transformers import SentenceTransformer
 
 from haystack import Document
-from qdrant_client import QdrantClient
+from haystack.document_stores.types import DuplicatePolicy
+from qdrant_client import QdrantClient, models
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
+from haystack_integrations.document_stores.qdrant.converters import convert_id
+from kaitiaki.ingest.embedding_cache import EmbeddingCache
+from kaitiaki.rag.analyzer import ANALYZER, Vocabulary, analyze
+from kaitiaki.rag.bm25 import SparseBM25, open_index, write_index
 from kaitiaki.utils.settings import CFG
 from kaitiaki.utils.logging import logger
 
 PROC = Path(CFG["paths"]["data_processed"])
+# Empreinte des documents déjà indexés (dans un sous-dossier : l'adaptateur lit les *.json de PROC)
+INDEX_STATE_PATH = Path(CFG["paths"].get("index_state", PROC / ".kaitiaki" / "index_state.json"))
 
-def yield_chunks():
+# Taille maximale d'un objet JSON réparti sur plusieurs lignes (au-delà, le fichier est jugé corrompu)
+MAX_RECORD_CHARS = 16 * 1024 * 1024
+
+
+def _iter_json_records(in_file, name: str):
+    """
+    Lit les objets JSON d'un fichier, ligne par ligne (un objet par ligne, cas
+    normal du JSONL). Une ligne qui n'est pas un objet complet est le début d'un
+    objet sur plusieurs lignes (fichier indenté) : les lignes suivantes lui sont
+    ajoutées jusqu'à ce que le décodeur incrémental le termine. La lecture est
+    linéaire en la taille du fichier.
+
+    Returns:
+        (valeur de retour du générateur) False si une partie du fichier n'a pas pu être décodée.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    for line_number, line in enumerate(in_file, 1):
+        if not buffer:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            try:
+                yield json.loads(stripped)
+                continue
+            except json.JSONDecodeError:
+                pass
+
+        buffer += line
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos == len(buffer):
+                break
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Objet incomplet : attendre les lignes suivantes
+                break
+            yield obj
+        buffer = buffer[pos:]
+        if len(buffer) > MAX_RECORD_CHARS:
+            logger.error(f"Erreur de décodage JSON dans {name} vers la ligne {line_number}. Arrêt de la lecture pour ce fichier.")
+            return False
+
+    if buffer.strip():
+        logger.error(f"Objet JSON incomplet à la fin de {name}. Il est ignoré.")
+        return False
+    return True
+
+
+def yield_chunks(failed: list = None):
     """
-    Lit les fichiers .jsonl de manière robuste, en gérant les objets JSON
-    qui s'étendent sur plusieurs lignes (ex: fichiers indentés).
+    Lit les chunks des fichiers *.normalized.jsonl au fil de l'eau, sans charger
+    un fichier entier en mémoire. Les objets JSON qui s'étendent sur plusieurs
+    lignes (fichiers indentés) sont aussi acceptés.
+
+    Args:
+        failed: Liste à laquelle sont ajoutés les noms des fichiers illisibles
+            ou lus en partie seulement.
     """
     for f in sorted(PROC.glob("*.normalized.jsonl")):
         logger.info(f"Lecture du fichier de chunks : {f.name}")
         try:
             with f.open("r", encoding="utf-8") as in_file:
-                content = in_file.read()
-                decoder = json.JSONDecoder()
-                pos = 0
-                
-                while pos < len(content):
-                    while pos < len(content) and content[pos].isspace():
-                        pos += 1
-                    if pos == len(content):
-                        break
-
-                    try:
-                        obj, end_pos = decoder.raw_decode(content[pos:])
-                        yield obj
-                        pos += end_pos
-                    except json.JSONDecodeError:
-                        logger.error(f"Erreur de décodage JSON dans {f.name} à la position {pos}. Arrêt de la lecture pour ce fichier.")
-                        break
+                complete = yield from _iter_json_records(in_file, f.name)
         except Exception as e:
             logger.error(f"Impossible de lire ou traiter le fichier {f.name}: {e}")
+            complete = False
+        if not complete and failed is not None:
+            failed.append(f.name)
 
 
 def build_bm25_index(chunks):
     """
     Construit l'index BM25 en utilisant UNIQUEMENT les chunks "enfants"
     pour une recherche par mots-clés plus précise.
+
+    Returns:
+        (index `SparseBM25`, chunk_id des chunks dans l'ordre de l'index), ou (None, None).
+    """
+    # Le chunk_id de chaque document de l'index, pour un mapping parfait
+    chunk_ids = []
+    vocabulary = Vocabulary()
+
+    def child_term_ids():
+        # Les chunks sont lus au fil de l'eau : seuls les termes des enfants en cours sont en mémoire,
+        # sous forme d'identifiants entiers (même analyseur que les requêtes)
+        for c in chunks:
+            if c.get("chunk_type") == "child":
+                chunk_ids.append(c.get("chunk_id"))
+                yield vocabulary.ids(analyze(c["text"]))
+
+    bm25 = SparseBM25.from_term_ids(child_term_ids(), vocabulary.terms, analyzer=ANALYZER)
+    logger.info(f"Construction de l'index BM25 sur {len(chunk_ids)} chunks enfants.")
+
+    if not chunk_ids:
+        return None, None
+    return bm25, chunk_ids
+
+
+# Champs des chunks pris en compte dans l'empreinte d'un document : son contenu, pas
+# les métadonnées qui peuvent varier d'une adaptation à l'autre (date par défaut...)
+HASHED_FIELDS = ("chunk_id", "text", "parent_id", "parent_title", "page", "element_type", "chunk_type")
+
+
+def document_hash(chunks: list) -> str:
+    """Empreinte du contenu d'un document : les champs `HASHED_FIELDS` de ses chunks normalisés, dans l'ordre."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        content = {field: chunk.get(field) for field in HASHED_FIELDS}
+        digest.update(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def iter_documents(chunks):
+    """
+    Regroupe les chunks lus au fil de l'eau par document : (doc_id, chunks) pour
+    chaque suite de chunks du même `doc_id` (un fichier normalisé par document).
+    Seul le document courant est gardé en mémoire.
+    """
+    seen = set()
+    doc_id, current = None, []
+    for chunk in chunks:
+        chunk_doc_id = chunk.get("doc_id", "")
+        if chunk_doc_id != doc_id:
+            if current:
+                yield doc_id, current
+            doc_id, current = chunk_doc_id, []
+            if chunk_doc_id in seen:
+                logger.warning(f"Chunks du document {chunk_doc_id} trouvés dans plusieurs fichiers : seuls les premiers sont indexés.")
+                current = None
+            seen.add(chunk_doc_id)
+        if current is not None:
+            current.append(chunk)
+    if current:
+        yield doc_id, current
+
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    """Écrit via un fichier temporaire puis un renommage : le serveur ne lit jamais un fichier à moitié écrit."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def load_index_state() -> dict:
+    """
+    État de l'index Qdrant : modèle d'embedding et empreinte de chaque document indexé.
+    Vide s'il n'existe pas encore (première indexation incrémentale).
+    """
+    if not INDEX_STATE_PATH.exists():
+        return {"collection": None, "embedding_model": None, "documents": {}}
+    return json.loads(INDEX_STATE_PATH.read_text(encoding="utf-8"))
+
+
+def save_index_state(state: dict):
+    _atomic_write_bytes(INDEX_STATE_PATH, json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def to_documents(chunks: list) -> list:
+    """
+    Chunks normalisés -> Documents Haystack. L'ID du document est celui du chunk
+    (déterministe) : réindexer un chunk inchangé écrase le même point Qdrant.
+    """
+    # On passe l'objet chunk entier dans les métadonnées
+    # pour préserver toute l'information sémantique.
+    return [Document(id=ch.get("chunk_id") or "", content=ch["text"], meta=ch) for ch in chunks]
+
+
+def open_embedding_cache(model_name: str):
+    """Cache disque des embeddings (section `ingest.embedding_cache`), ou None s'il est désactivé."""
+    options = CFG.get("ingest", {}).get("embedding_cache", {})
+    if not options.get("enabled", False):
+        return None
+    return EmbeddingCache(
+        options.get("path", PROC / ".kaitiaki" / "embeddings.sqlite"),
+        model_name,
+        normalize=True,
+        max_mb=options.get("max_mb", 2048),
+    )
+
+
+class MultiProcessEncoder:
+    """
+    Encodeur réparti sur un pool de processus CPU (pool multi-processus de
+    SentenceTransformer), avec la même méthode `encode` que le modèle : il
+    s'utilise à sa place, avec ou sans cache d'embeddings. Les petits lots
+    (par exemple les seuls textes absents du cache) restent encodés dans le
+    processus courant, où le pool coûterait plus qu'il ne rapporte.
+    """
+
+    def __init__(self, embedder, workers: int, min_texts: int = 256):
+        self.embedder = embedder
+        self.min_texts = min_texts
+        self.pool = embedder.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def encode(self, texts: list, batch_size: int = 64, normalize_embeddings: bool = True, show_progress_bar: bool = False):
+        if len(texts) < self.min_texts:
+            return self.embedder.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings,
+                                        show_progress_bar=show_progress_bar)
+        return self.embedder.encode_multi_process(texts, self.pool, batch_size=batch_size,
+                                                  normalize_embeddings=normalize_embeddings)
+
+    def close(self):
+        self.embedder.stop_multi_process_pool(self.pool)
+
+
+def embed_documents(embedder, docs: list, cache: EmbeddingCache = None):
+    """Calcule les embeddings des documents ; avec un cache, seuls les textes inconnus sont encodés."""
+    texts = [d.content for d in docs]
+    batch_size = CFG.get("ingest", {}).get("batch_size", 64)
+    if cache is not None:
+        embeddings = cache.encode(embedder, texts, batch_size=batch_size)
+    else:
+        embeddings = embedder.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+    for doc, emb in zip(docs, embeddings):
+        doc.embedding = emb.tolist()
+
+
+def _doc_id_filter(doc_id: str):
+    return models.FieldCondition(key="meta.doc_id", match=models.MatchValue(value=doc_id))
+
+
+class BatchIndexer:
+    """
+    Encode et écrit les chunks dans Qdrant par lots de taille fixe, quel que soit
+    leur découpage en documents.
+
+    L'encodage (dans ce thread, éventuellement réparti sur un pool de processus)
+    et l'écriture des lots (par `upload_workers` threads, en requêtes parallèles)
+    se recouvrent : pendant que les lots encodés partent vers Qdrant, le suivant
+    est encodé. Au plus `max_pending_uploads` lots attendent leur écriture, ce
+    qui borne la mémoire (plus les identifiants des points des documents en cours).
+
+    Quand tous les chunks d'un document sont écrits, ses anciens points qui n'en
+    font plus partie sont supprimés, puis `on_document_done(doc_id, chunks)` est
+    appelé. Les anciens points restent interrogeables jusqu'à leur remplacement :
+    la collection sert les requêtes pendant toute la mise à jour.
     """
-    def tok(s): return [t for t in s.lower().split() if len(t) > 2]
-    
-    # Filtrer pour ne garder que les enfants
-    child_chunks = [c for c in chunks if c.get("chunk_type") == "child"]
-    logger.info(f"Construction de l'index BM25 sur {len(child_chunks)} chunks enfants.")
 
-    if not child_chunks:
-        return None, None, None
+    def __init__(self, embedder, store, client, collection_name: str, cache: EmbeddingCache = None,
+                 batch_size: int = 512, on_document_done=None, upload_workers: int = 1, max_pending_uploads: int = 4):
+        self.embedder = embedder
+        self.store = store
+        self.client = client
+        self.collection_name = collection_name
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.on_document_done = on_document_done
+        self.max_pending_uploads = max(1, max_pending_uploads)
+        self.indexed = 0
+        self.started = time.perf_counter()
+        self._pending = []
+        self._open = {}
+        self._uploads = deque()
+        # Le store crée son client (et la collection, avec recreate_index) au premier appel :
+        # ce premier appel est fait ici, avant que les threads d'écriture ne se le disputent
+        store.count_documents()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, upload_workers), thread_name_prefix="qdrant-upload")
+
+    def add_document(self, doc_id: str, chunks: list):
+        docs = to_documents(chunks)
+        self._open[doc_id] = {"point_ids": [], "remaining": len(docs)}
+        for doc in docs:
+            self._pending.append((doc_id, doc))
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+        if not docs:
+            self._finish_document(doc_id)
+
+    def flush(self):
+        """Encode le lot en cours et le confie aux threads d'écriture (en attendant si la file est pleine)."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        docs = [doc for _, doc in batch]
+        embed_documents(self.embedder, docs, self.cache)
+        future = self._executor.submit(self.store.write_documents, docs, policy=DuplicatePolicy.OVERWRITE)
+        self._uploads.append((future, batch))
+        while len(self._uploads) > self.max_pending_uploads:
+            self._complete_upload()
+
+    def close(self):
+        """Écrit le dernier lot et attend la fin de toutes les écritures."""
+        self.flush()
+        while self._uploads:
+            self._complete_upload()
+
+    def shutdown(self):
+        """Arrête les threads d'écriture (après `close`, ou après une erreur)."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _complete_upload(self):
+        """Attend l'écriture du plus ancien lot, puis termine les documents dont tous les chunks sont écrits."""
+        future, batch = self._uploads.popleft()
+        future.result()
+        finished = []
+        for doc_id, doc in batch:
+            entry = self._open[doc_id]
+            entry["point_ids"].append(convert_id(doc.id))
+            entry["remaining"] -= 1
+            if not entry["remaining"]:
+                finished.append(doc_id)
+        self.indexed += len(batch)
+
+        elapsed = time.perf_counter() - self.started
+        logger.info(f"  {self.indexed} chunk(s) encodé(s) et écrit(s) ({self.indexed / elapsed:.1f} chunks/s)")
+        for doc_id in finished:
+            self._finish_document(doc_id)
+
+    def _finish_document(self, doc_id: str):
+        point_ids = self._open.pop(doc_id)["point_ids"]
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(
+                must=[_doc_id_filter(doc_id)],
+                must_not=[models.HasIdCondition(has_id=point_ids)],
+            )),
+        )
+        if self.on_document_done is not None:
+            self.on_document_done(doc_id, len(point_ids))
+
+
+def delete_other_documents(client, collection_name: str, doc_ids: list):
+    """Supprime les points des documents qui ne sont plus dans data/processed."""
+    client.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(filter=models.Filter(
+            must_not=[models.FieldCondition(key="meta.doc_id", match=models.MatchAny(any=doc_ids))],
+        )),
+    )
+
+
+def write_bm25_index(chunks):
+    """BM25 local (fichier binaire projeté en mémoire par le serveur) sur les chunks enfants uniquement."""
+    bm25, chunk_ids = build_bm25_index(chunks)
+    if not bm25:
+        logger.warning("Aucun chunk enfant trouvé, l'index BM25 n'a pas été créé.")
+        return
+    write_index(Path(CFG["paths"]["bm25_index"]), bm25, chunk_ids)
+    logger.info(f"Index BM25 local créé avec succès ({len(bm25.vocabulary)} termes).")
+
 
-    texts = [c["text"] for c in child_chunks]
-    tokenized = [tok(t) for t in texts]
-    bm25 = BM25Okapi(tokenized)
-    
-    # La méta de BM25 doit contenir le chunk_id pour un mapping parfait
-    meta = [
-        {"chunk_id": c.get("chunk_id")} for c in child_chunks
-    ]
-    return bm25, tokenized, meta
+def bm25_index_is_current() -> bool:
+    """Vrai si l'index BM25 existe, au format actuel et construit avec l'analyseur actuel."""
+    try:
+        open_index(Path(CFG["paths"]["bm25_index"]), analyzer=ANALYZER)
+    except FileNotFoundError:
+        return False
+    except ValueError as e:
+        logger.info(f"Index BM25 à reconstruire : {e}")
+        return False
+    return True
 
 
+def _collection_dim(client, collection_name: str):
+    """Dimension des vecteurs de la collection, ou None si elle n'existe pas."""
+    if not client.collection_exists(collection_name):
+        return None
+    vectors = client.get_collection(collection_name).config.params.vectors
+    return getattr(vectors, "size", None)
+
+
+def main(full: bool = False):
+    """
+    Indexe les chunks normalisés dans Qdrant et reconstruit l'index BM25.
 
-def main():
+    Par défaut, l'indexation est incrémentale : seuls les documents nouveaux ou
+    modifiés (d'après l'empreinte de leurs chunks, gardée dans l'état de l'index)
+    sont encodés et écrits, et les points des documents disparus sont supprimés.
+    La collection n'est jamais recréée et reste interrogeable.
 
-    embedder = SentenceTransformer(CFG["embedding"]["model"])
+    Args:
+        full: Recréer la collection et tout réindexer (à faire après un
+            changement de modèle d'embedding).
+    """
+    model_name = CFG["embedding"]["model"]
+    collection_name = CFG["qdrant"]["index"]
+    embedder = SentenceTransformer(model_name)
     embedding_dim = embedder.get_sentence_embedding_dimension()
 
+    state = load_index_state()
+    client = QdrantClient(host=CFG["qdrant"]["host"], port=CFG["qdrant"]["port"])
+    if not full:
+        existing_dim = _collection_dim(client, collection_name)
+        if state["embedding_model"] not in (None, model_name) or existing_dim not in (None, embedding_dim):
+            logger.error(
+                f"L'index {collection_name} a été construit avec un autre modèle d'embedding "
+                f"({state['embedding_model']}, dimension {existing_dim}) : relancez avec --full."
+            )
+            return
+        if state["collection"] != collection_name:
+            state["documents"] = {}
+
     store = QdrantDocumentStore(
         host=CFG["qdrant"]["host"],
         port=CFG["qdrant"]["port"],
-        index=CFG["qdrant"]["index"],
+        index=collection_name,
         embedding_dim=embedding_dim,
-        recreate_index=True,
+        recreate_index=full,
     )
+    if full:
+        state["documents"] = {}
+        logger.info(f"Index Qdrant recréé : {collection_name}")
 
-    client = QdrantClient(host=CFG["qdrant"]["host"], port=CFG["qdrant"]["port"])
-    collection_name = CFG["qdrant"]["index"]
-    client.recreate_collection(
-        collection_name=collection_name,
-        vectors_config={"size": embedding_dim, "distance": "Cosine"}
+    state.update({"collection": collection_name, "embedding_model": model_name})
+    known = state["documents"]
+    hashes = {}
+    counts = {"chunks": 0, "documents": 0, "changed": 0}
+
+    def document_done(doc_id: str, chunk_count: int):
+        known[doc_id] = {"content_hash": hashes.pop(doc_id), "chunks": chunk_count,
+                         "indexed_at": datetime.utcnow().isoformat() + "Z"}
+        # L'état est enregistré après chaque document : une indexation interrompue reprend là
+        save_index_state(state)
+        logger.info(f"  - {doc_id} : {chunk_count} chunk(s) indexé(s)")
+
+    # Les documents sont lus un par un ; seuls les nouveaux ou modifiés passent par l'encodeur,
+    # par lots de taille fixe.
+    logger.info(f"Calcul des embeddings avec le modèle : {model_name}")
+    seen = []
+    failed = []
+    ingest = CFG.get("ingest", {})
+    cache = open_embedding_cache(model_name)
+    encode_workers = ingest.get("encode_workers", 0)
+    encoder = MultiProcessEncoder(embedder, encode_workers) if encode_workers > 1 else embedder
+    indexer = BatchIndexer(
+        encoder, store, client, collection_name, cache,
+        batch_size=ingest.get("write_batch_size", 512),
+        on_document_done=document_done,
+        upload_workers=ingest.get("upload_workers", 1),
+        max_pending_uploads=ingest.get("upload_queue_size", 4),
     )
-    logger.info(f"Index Qdrant recréé : {collection_name}")
-    
-    all_chunks = list(yield_chunks())
+    started = time.perf_counter()
+    try:
+        for doc_id, chunks in iter_documents(yield_chunks(failed)):
+            seen.append(doc_id)
+            counts["documents"] += 1
+            counts["chunks"] += len(chunks)
+            content_hash = document_hash(chunks)
+            if known.get(doc_id, {}).get("content_hash") == content_hash:
+                continue
+            counts["changed"] += 1
+            hashes[doc_id] = content_hash
+            indexer.add_document(doc_id, chunks)
+        indexer.close()
+    finally:
+        indexer.shutdown()
+        if encoder is not embedder:
+            encoder.close()
+        if cache is not None:
+            cache.log_stats()
+            cache.evict()
+            cache.close()
 
-    if not all_chunks:
+    if not seen:
         logger.warning("Aucun chunk à indexer.")
         return
-    
-    logger.info(f"{len(all_chunks)} chunks (parents et enfants) trouvés pour l'indexation.")
-
-    docs = []
-    for ch in all_chunks:
-        # On passe l'objet chunk entier dans les métadonnées
-        # pour préserver toute l'information sémantique.
-        d = Document(
-            content=ch["text"],
-            meta=ch
-        )
-        docs.append(d)
-
-    logger.info(f'Calcul des embeddings pour {len(docs)} documents avec le modèle : {CFG["embedding"]["model"]}')
-    embeddings = embedder.encode(
-        [d.content for d in docs],
-        batch_size=CFG.get("ingest", {}).get("batch_size", 64),
-        normalize_embeddings=True,
-        show_progress_bar=True
-    )
-    
-    for doc, emb in zip(docs, embeddings):
-        doc.embedding = emb.tolist()
 
-    store.write_documents(docs)
+    elapsed = time.perf_counter() - started
+    present = set(seen)
+    # Les documents d'un fichier illisible ne sont pas vus : ils ne doivent pas être supprimés
+    removed = [] if failed else [doc_id for doc_id in known if doc_id not in present]
+    logger.info(f"{counts['chunks']} chunks (parents et enfants) lus dans {counts['documents']} document(s) : "
+                f"{counts['changed']} nouveau(x) ou modifié(s), {counts['documents'] - counts['changed']} inchangé(s), "
+                f"{len(removed)} supprimé(s) ; {indexer.indexed} chunk(s) encodé(s) et écrit(s) en {elapsed:.1f} s "
+                f"({counts['chunks'] / elapsed if elapsed else 0:.0f} chunks lus/s).")
+
+    if failed:
+        logger.error(f"{len(failed)} fichier(s) illisible(s) ou incomplet(s) ({', '.join(failed)}) : "
+                     f"aucun document n'est supprimé de l'index.")
+    else:
+        # Sans état préalable, la collection peut aussi contenir des documents qu'on ne connaît pas
+        delete_other_documents(client, collection_name, seen)
+    for doc_id in removed:
+        known.pop(doc_id)
+        logger.info(f"  - {doc_id} : points supprimés")
+    save_index_state(state)
     logger.info("Documents et embeddings écrits dans Qdrant.")
 
-    # 4) BM25 local (pickle) sur les chunks enfants uniquement
-    bm25, tokenized, meta = build_bm25_index(all_chunks)
-    if bm25:
-        with open(CFG["paths"]["bm25_index"], "wb") as w:
-            pickle.dump({"bm25": bm25, "tokenized": tokenized}, w)
-        Path(CFG["paths"]["bm25_meta"]).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
-        logger.info("Index BM25 local créé avec succès.")
+    if failed and bm25_index_is_current():
+        # Reconstruit sans les fichiers illisibles, l'index BM25 perdrait leurs chunks
+        logger.warning("Fichier(s) illisible(s) : l'index BM25 est conservé.")
+    elif counts["changed"] or removed or not bm25_index_is_current():
+        # Deuxième lecture des fichiers : seuls les termes des chunks enfants sont gardés
+        write_bm25_index(yield_chunks())
     else:
-        logger.warning("Aucun chunk enfant trouvé, l'index BM25 n'a pas été créé.")
+        logger.info("Aucun changement : l'index BM25 est conservé.")
 
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Kaitiaki : indexation des chunks dans Qdrant et BM25.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Recréer la collection et tout réindexer (changement de modèle d'embedding)."
+    )
+    main(full=parser.parse_args().full)
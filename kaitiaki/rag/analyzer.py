@@ -0,0 +1,98 @@
+# kaitiaki/rag/analyzer.py
+"""
+Analyseur de texte français, commun à l'indexation BM25 et aux requêtes :
+minuscules, suppression des accents, découpage sur la ponctuation, mots vides
+et racinisation légère. Un texte et une requête qui contiennent le même mot
+produisent le même terme ("Article," et "articles" -> "articl").
+"""
+import re
+import unicodedata
+from typing import List
+
+import numpy as np
+
+# Identifiant enregistré dans l'index BM25 : changer l'analyse impose de réindexer
+ANALYZER = "french-v2"
+
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae"})
+# Suites de lettres ou de chiffres : apostrophes, tirets et ponctuation séparent les mots
+_WORDS = re.compile(r"[^\W_]+")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents ni ligatures ("Œuvre Éditée" -> "oeuvre editee")."""
+    text = unicodedata.normalize("NFKD", text.casefold().translate(_LIGATURES))
+    return _COMBINING_MARKS.sub("", text)
+
+
+# Mots vides du français (liste Snowball), sans accents comme les termes analysés
+STOPWORDS = frozenset(fold(word) for word in """
+    au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me même mes moi mon
+    ne nos notre nous on ou où par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos
+    votre vous c d j l à m n s t y été étée étées étés étant étante étants étantes suis es est sommes êtes
+    sont serai seras sera serons serez seront serais serait serions seriez seraient étais était étions
+    étiez étaient fus fut fûmes fûtes furent sois soit soyons soyez soient fusse fusses fût fussions
+    fussiez fussent ayant ayante ayantes ayants eu eue eues eus ai as avons avez ont aurai auras aura
+    aurons aurez auront aurais aurait aurions auriez auraient avais avait avions aviez avaient eut eûmes
+    eûtes eurent aie aies ait ayons ayez aient eusse eusses eût eussions eussiez eussent
+""".split())
+
+
+def stem(word: str) -> str:
+    """
+    Racinisation légère (stemmer « minimal » de J. Savoy) : pluriels et
+    féminins, sans toucher aux mots courts ("contrats" -> "contrat",
+    "salarie", "salariees" -> "salari", "generaux" -> "general").
+    """
+    if len(word) < 6 or not word.isalpha():
+        return word
+    if word.endswith("x"):
+        return word[:-2] + "l" if word.endswith("aux") else word[:-1]
+    for suffix in "sre":
+        if word.endswith(suffix):
+            word = word[:-1]
+    # "é" puis "e" chez Savoy : les deux sont des "e" une fois les accents supprimés
+    if word.endswith("e"):
+        word = word[:-1]
+    if word[-1] == word[-2]:
+        word = word[:-1]
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    """Termes d'un texte ou d'une requête, dans l'ordre (les termes répétés sont conservés)."""
+    terms = []
+    for word in _WORDS.findall(fold(text)):
+        if word in STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(stem(word))
+    return terms
+
+
+class Vocabulary:
+    """
+    Identifiants entiers des termes, attribués dans l'ordre d'apparition pendant
+    l'indexation. Les documents sont indexés sous forme de tableaux d'identifiants
+    plutôt que de listes de chaînes ; le vocabulaire est enregistré dans l'index
+    BM25 (`kaitiaki.rag.bm25.write_index`).
+    """
+
+    def __init__(self):
+        self.ids_by_term = {}
+        self.terms = []
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def ids(self, terms: List[str]) -> np.ndarray:
+        """Identifiants des termes, en ajoutant les termes encore inconnus."""
+        ids_by_term = self.ids_by_term
+        result = np.empty(len(terms), dtype=np.int32)
+        for position, term in enumerate(terms):
+            term_id = ids_by_term.get(term)
+            if term_id is None:
+                term_id = ids_by_term[term] = len(self.terms)
+                self.terms.append(term)
+            result[position] = term_id
+        return result
@@ -0,0 +1,391 @@
+# kaitiaki/rag/bm25.py
+import json
+import os
+import pickle
+import struct
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from kaitiaki.rag.analyzer import ANALYZER, Vocabulary, analyze
+
+# Format binaire de l'index (voir `write_index`)
+MAGIC = b"KTKBM25\0"
+FORMAT_VERSION = 2
+_PREAMBLE = struct.Struct("<8sII")  # magic, version, taille de l'en-tête JSON
+_ALIGN = 64
+
+
+class SparseBM25:
+    """
+    Index BM25 creux : listes de postings au format CSR (pour chaque terme, les
+    documents qui le contiennent, triés), avec le poids BM25 de chaque posting
+    précalculé (IDF et normalisation par la longueur du document compris).
+
+    Le score d'une requête ne touche que les documents qui contiennent l'un de
+    ses termes, au lieu de parcourir tout le corpus pour chaque terme comme
+    `rank_bm25.BM25Okapi.get_scores`. Les scores sont ceux de BM25Okapi (mêmes
+    k1, b, epsilon et plancher `epsilon * idf moyen` des IDF négatifs), à la
+    précision float32 près.
+
+    `vocabulary` associe chaque terme à son identifiant (`get`) et se parcourt
+    dans l'ordre des identifiants : un dictionnaire pour un index construit en
+    mémoire, une table de hachage projetée en mémoire pour un index ouvert par
+    `open_index`.
+    """
+
+    def __init__(self, vocabulary, indptr: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 analyzer: str = None):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.doc_len = doc_len
+        self.corpus_size = len(doc_len)
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        # Analyseur qui a produit les termes (voir kaitiaki.rag.analyzer), enregistré dans l'index
+        self.analyzer = analyzer
+
+    @classmethod
+    def from_term_ids(cls, corpus, terms: list, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                      analyzer: str = None) -> "SparseBM25":
+        """
+        Construit l'index à partir des documents sous forme de tableaux d'identifiants
+        de termes (`kaitiaki.rag.analyzer.Vocabulary.ids`). `terms` (le terme de chaque
+        identifiant) n'est lu qu'après le parcours de `corpus` : il peut être complété
+        au fil de l'eau.
+        """
+        term_ids, doc_ids, term_freqs, doc_len = [], [], [], []
+        block, block_start = [], 0
+
+        def flush():
+            # Fréquences des termes d'un bloc de documents, en une seule passe numpy
+            lengths = np.fromiter((len(ids) for ids in block), dtype=np.int64, count=len(block))
+            if lengths.sum():
+                keys = (np.repeat(np.arange(block_start, block_start + len(block), dtype=np.int64), lengths)
+                        << 32) | np.concatenate(block).astype(np.int64)
+                keys, counts = np.unique(keys, return_counts=True)
+                doc_ids.append((keys >> 32).astype(np.int32))
+                term_ids.append(keys & 0xFFFFFFFF)
+                term_freqs.append(counts)
+            doc_len.append(lengths)
+
+        for ids in corpus:
+            block.append(ids)
+            if len(block) == 10_000:
+                flush()
+                block_start += len(block)
+                block = []
+        flush()
+
+        return cls._from_postings(
+            {term: term_id for term_id, term in enumerate(terms)},
+            np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64),
+            np.concatenate(doc_ids) if doc_ids else np.empty(0, dtype=np.int32),
+            np.concatenate(term_freqs).astype(np.float64) if term_freqs else np.empty(0),
+            np.concatenate(doc_len).astype(np.float64),
+            k1, b, epsilon, analyzer,
+        )
+
+    @classmethod
+    def from_tokenized(cls, corpus, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                       analyzer: str = None) -> "SparseBM25":
+        """Construit l'index à partir des documents découpés en termes (une liste de chaînes par document)."""
+        vocabulary = Vocabulary()
+        return cls.from_term_ids((vocabulary.ids(tokens) for tokens in corpus), vocabulary.terms,
+                                 k1, b, epsilon, analyzer)
+
+    @classmethod
+    def from_okapi(cls, okapi) -> "SparseBM25":
+        """Convertit un index `rank_bm25.BM25Okapi` sans recalculer ses jetons (comparaison des scores)."""
+        vocabulary = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        for doc_id, frequencies in enumerate(okapi.doc_freqs):
+            for term, freq in frequencies.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        return cls._from_postings(
+            vocabulary,
+            np.asarray(term_ids, dtype=np.int64),
+            np.asarray(doc_ids, dtype=np.int32),
+            np.asarray(term_freqs, dtype=np.float64),
+            np.asarray(okapi.doc_len, dtype=np.float64),
+            okapi.k1, okapi.b, okapi.epsilon,
+        )
+
+    @classmethod
+    def _from_postings(cls, vocabulary: dict, term_ids: np.ndarray, doc_ids: np.ndarray, term_freqs: np.ndarray,
+                       doc_len: np.ndarray, k1: float, b: float, epsilon: float,
+                       analyzer: str = None) -> "SparseBM25":
+        corpus_size = len(doc_len)
+        # Tri stable par terme : dans chaque liste, les documents restent dans l'ordre croissant
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, term_freqs = term_ids[order], doc_ids[order], term_freqs[order]
+
+        postings_per_term = np.bincount(term_ids, minlength=len(vocabulary))
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(postings_per_term, out=indptr[1:])
+        doc_freq = postings_per_term.astype(np.float64)
+
+        # IDF de BM25Okapi : les IDF négatifs (termes présents dans plus de la moitié
+        # des documents) sont remplacés par epsilon fois l'IDF moyen
+        idf = np.log(corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        average_idf = idf.mean() if len(idf) else 0.0
+        idf[idf < 0] = epsilon * average_idf
+
+        avgdl = doc_len.sum() / corpus_size if corpus_size else 0.0
+        length_norm = k1 * (1 - b + b * doc_len / avgdl) if avgdl else np.full(corpus_size, k1 * (1 - b))
+        weights = idf[term_ids] * term_freqs * (k1 + 1) / (term_freqs + length_norm[doc_ids])
+
+        return cls(vocabulary, indptr, doc_ids, weights.astype(np.float32), doc_len.astype(np.int32),
+                   k1, b, epsilon, analyzer)
+
+    def _postings(self, query: List[str]):
+        """Documents et poids des postings des termes connus de la requête (un terme répété compte plusieurs fois)."""
+        doc_ids, weights = [], []
+        for term, count in Counter(query).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            doc_ids.append(self.doc_ids[start:end])
+            weights.append(self.weights[start:end] * count if count > 1 else self.weights[start:end])
+        return doc_ids, weights
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """Scores de tous les documents (comme `BM25Okapi.get_scores`), pour la comparaison."""
+        scores = np.zeros(self.corpus_size, dtype=np.float64)
+        for doc_ids, weights in zip(*self._postings(query)):
+            scores[doc_ids] += weights
+        return scores
+
+    def top_k(self, query: List[str], k: int) -> List[Tuple[int, float]]:
+        """
+        Les `k` documents de meilleur score parmi ceux qui contiennent au moins un
+        terme de la requête : [(index du document, score)], par score décroissant
+        (à score égal, par index croissant).
+        """
+        doc_ids, weights = self._postings(query)
+        if not doc_ids or k <= 0:
+            return []
+        if len(doc_ids) == 1:
+            candidates, scores = doc_ids[0], weights[0].astype(np.float64)
+        else:
+            candidates, inverse = np.unique(np.concatenate(doc_ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(weights), minlength=len(candidates))
+
+        if len(candidates) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+
+class MappedVocabulary:
+    """
+    Vocabulaire d'un index projeté en mémoire : les termes encodés en UTF-8 bout à
+    bout dans `blob`, leurs bornes dans `offsets`, et une table de hachage
+    (adressage ouvert, sondage linéaire sur l'empreinte CRC-32 du terme) qui donne
+    l'identifiant d'un terme en temps constant. Seules les pages lues sont
+    chargées par le système.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, slots: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+        self.slots = slots
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _term(self, term_id: int) -> bytes:
+        return self.blob[self.offsets[term_id]:self.offsets[term_id + 1]].tobytes()
+
+    def get(self, term: str, default=None):
+        key = term.encode("utf-8")
+        mask = len(self.slots) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            term_id = int(self.slots[slot])
+            if term_id < 0:
+                return default
+            if self._term(term_id) == key:
+                return term_id
+            slot = (slot + 1) & mask
+
+    def __iter__(self):
+        for term_id in range(len(self)):
+            yield self._term(term_id).decode("utf-8")
+
+
+def _hash_slots(encoded_terms: list) -> np.ndarray:
+    """Table de hachage des termes (voir `MappedVocabulary`) : au moins deux cases par terme, -1 si vide."""
+    size = 1 << max(1, (2 * len(encoded_terms) - 1).bit_length())
+    mask = size - 1
+    slots = [-1] * size
+    for term_id, key in enumerate(encoded_terms):
+        slot = zlib.crc32(key) & mask
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = term_id
+    return np.asarray(slots, dtype="<i4")
+
+
+class ChunkIdTable:
+    """chunk_id de chaque document de l'index (chaîne vide si le chunk n'en avait pas), lus à la demande."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+
+def _aligned(size: int) -> int:
+    return -(-size // _ALIGN) * _ALIGN
+
+
+def _string_table(encoded: list) -> tuple:
+    """Chaînes encodées -> (bornes uint64, octets bout à bout)."""
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def write_index(path: Path, bm25: SparseBM25, chunk_ids: list):
+    """
+    Écrit l'index dans un fichier binaire plat, projetable en mémoire par `open_index` :
+
+        magic (8 octets) | version (uint32) | taille de l'en-tête (uint32) | en-tête JSON
+        | sections alignées sur 64 octets (décalages comptés depuis la fin de l'en-tête,
+          elle-même alignée), en petit-boutiste :
+          indptr (int64), doc_ids (int32), weights (float32), doc_len (int32),
+          term_offsets (uint64) + terms (UTF-8) + term_slots (int32, table de hachage),
+          chunk_offsets (uint64) + chunk_ids (UTF-8)
+
+    L'en-tête donne les paramètres BM25, l'analyseur des termes et, pour chaque
+    section, son décalage, son type et sa longueur. Le fichier est écrit à côté puis renommé : un serveur qui
+    a projeté l'ancien fichier continue de le lire sans erreur.
+    """
+    if len(chunk_ids) != bm25.corpus_size:
+        raise ValueError(f"{len(chunk_ids)} chunk_id pour {bm25.corpus_size} documents indexés")
+
+    encoded_terms = [term.encode("utf-8") for term in bm25.vocabulary]
+    term_offsets, terms = _string_table(encoded_terms)
+    chunk_offsets, chunk_blob = _string_table([(chunk_id or "").encode("utf-8") for chunk_id in chunk_ids])
+    arrays = {
+        "indptr": np.asarray(bm25.indptr, dtype="<i8"),
+        "doc_ids": np.asarray(bm25.doc_ids, dtype="<i4"),
+        "weights": np.asarray(bm25.weights, dtype="<f4"),
+        "doc_len": np.asarray(bm25.doc_len, dtype="<i4"),
+        "term_offsets": term_offsets,
+        "terms": terms,
+        "term_slots": _hash_slots(encoded_terms),
+        "chunk_offsets": chunk_offsets,
+        "chunk_ids": chunk_blob,
+    }
+
+    # Décalages comptés depuis le début des données : la fin de l'en-tête, alignée
+    sections, position = {}, 0
+    for name, array in arrays.items():
+        sections[name] = {"offset": position, "dtype": array.dtype.str, "length": len(array)}
+        position += _aligned(array.nbytes)
+    header = json.dumps({
+        "k1": bm25.k1, "b": bm25.b, "epsilon": bm25.epsilon,
+        "analyzer": bm25.analyzer,
+        "corpus_size": bm25.corpus_size, "vocabulary_size": len(bm25.vocabulary),
+        "sections": sections,
+    }).encode("utf-8")
+    data_start = _aligned(_PREAMBLE.size + len(header))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + position)
+    os.replace(tmp_path, path)
+
+
+def open_index(path: Path, analyzer: str = None) -> Tuple[SparseBM25, ChunkIdTable]:
+    """
+    Ouvre un index écrit par `write_index`, projeté en mémoire (np.memmap) : rien
+    n'est lu ni copié à l'ouverture, les pages sont chargées à la demande et
+    partagées par le cache du système entre les processus qui ouvrent le fichier.
+
+    Raises:
+        FileNotFoundError: si le fichier n'existe pas.
+        ValueError: si ce n'est pas un index BM25 de Kaitiaki, s'il est d'une autre
+            version, ou si ses termes ne viennent pas de l'analyseur `analyzer` (s'il est donné).
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"Index BM25 tronqué : {path}")
+        magic, version, header_size = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"{path} n'est pas un index BM25 Kaitiaki.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Version d'index BM25 non prise en charge : {version} (attendue : {FORMAT_VERSION}).")
+        header = json.loads(f.read(header_size))
+    if analyzer is not None and header["analyzer"] != analyzer:
+        raise ValueError(f"Index BM25 construit avec l'analyseur {header['analyzer']} (attendu : {analyzer}).")
+    data_start = _aligned(_PREAMBLE.size + header_size)
+
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, section in header["sections"].items():
+        dtype = np.dtype(section["dtype"])
+        start = data_start + section["offset"]
+        end = start + section["length"] * dtype.itemsize
+        if end > len(raw):
+            raise ValueError(f"Index BM25 tronqué : section '{name}' incomplète dans {path}")
+        arrays[name] = raw[start:end].view(dtype)
+
+    bm25 = SparseBM25(
+        MappedVocabulary(arrays["term_offsets"], arrays["terms"], arrays["term_slots"]),
+        arrays["indptr"], arrays["doc_ids"], arrays["weights"], arrays["doc_len"],
+        header["k1"], header["b"], header["epsilon"], header["analyzer"],
+    )
+    return bm25, ChunkIdTable(arrays["chunk_offsets"], arrays["chunk_ids"])
+
+
+def convert_pickle(pickle_path: Path, meta_path: Path, index_path: Path) -> int:
+    """
+    Convertit un ancien index (pickle d'un `rank_bm25.BM25Okapi` et méta JSON des
+    chunks) au format binaire. Les anciens jetons (mots en minuscules) sont repassés
+    dans l'analyseur, comme le seraient les textes à l'indexation.
+
+    Returns:
+        Le nombre de chunks indexés.
+    """
+    with open(pickle_path, "rb") as f:
+        okapi = pickle.load(f)["bm25"]
+    if isinstance(okapi, SparseBM25):
+        raise ValueError(f"{pickle_path} : index d'une version intermédiaire, relancez l'indexation.")
+    meta = json.loads(Path(meta_path).read_text(encoding="utf-8"))
+
+    vocabulary = Vocabulary()
+    documents = (
+        vocabulary.ids([term for word, freq in frequencies.items() for term in analyze(word) * freq])
+        for frequencies in okapi.doc_freqs
+    )
+    bm25 = SparseBM25.from_term_ids(documents, vocabulary.terms, okapi.k1, okapi.b, okapi.epsilon, ANALYZER)
+    write_index(index_path, bm25, [m.get("chunk_id") for m in meta])
+    return len(meta)
@@ -3,11 +3,11 @@ import time
 import json
 from typing import List, Tuple, Dict
 
-import numpy as np
 from sentence_transformers import SentenceTransformer
 from haystack import Document
 from haystack_integrations.document_stores.qdrant import QdrantDocumentStore
 from haystack_integrations.components.retrievers.qdrant import QdrantEmbeddingRetriever
+from .analyzer import analyze
 from .fusion import rrf_merge
 from kaitiaki.utils.settings import CFG
 from kaitiaki.utils.logging import logger
@@ -18,11 +18,10 @@ def _bm25_search(query: str, top_k: int, bm25_index: Dict) -> List[Tuple[str, fl
     Retourne une liste de (chunk_id, score).
     """
     bm25 = bm25_index["bm25"]
-    meta = bm25_index["meta"]
-    toks = [t for t in query.lower().split() if len(t) > 2]
-    scores = bm25.get_scores(toks)
-    idx = np.argsort(scores)[::-1][:top_k]
-    return [(meta[i]["chunk_id"], float(scores[i])) for i in idx if "chunk_id" in meta[i]]
+    chunk_ids = bm25_index["chunk_ids"]
+    toks = analyze(query)
+    # Seuls les chunks qui contiennent un terme de la requête sont notés (index creux, voir SparseBM25)
+    return [(chunk_ids[i], score) for i, score in bm25.top_k(toks, top_k) if chunk_ids[i]]
 
 def _dense_search(query: str, top_k: int, retriever: QdrantEmbeddingRetriever, embedder: SentenceTransformer) -> List[Document]:
     """
@@ -0,0 +1,156 @@
+# kaitiaki/scripts/bm25_benchmark.py
+"""
+Parité et performance de l'index BM25 creux (`kaitiaki.rag.bm25.SparseBM25`)
+face à `rank_bm25.BM25Okapi`, sur un corpus synthétique (vocabulaire de Zipf,
+longueurs de chunks réalistes).
+
+    python -m kaitiaki.scripts.bm25_benchmark                  # parité sur 20 000 chunks, mesure sur 1 M
+    python -m kaitiaki.scripts.bm25_benchmark --docs 200000 --queries 500
+
+Le script échoue (code de sortie 1) si les scores s'écartent de ceux de rank_bm25.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from kaitiaki.rag.bm25 import SparseBM25, open_index, write_index
+
+
+def synthetic_corpus(docs: int, vocabulary: int, mean_length: int, seed: int):
+    """Chunks découpés en jetons, générés au fil de l'eau (les jetons suivent une loi de Zipf)."""
+    rng = np.random.default_rng(seed)
+    words = [f"mot{i}" for i in range(vocabulary)]
+    block = 10_000
+    for start in range(0, docs, block):
+        count = min(block, docs - start)
+        lengths = rng.poisson(mean_length, count)
+        ids = (rng.zipf(1.2, lengths.sum()) - 1) % vocabulary
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        for n in range(count):
+            yield [words[i] for i in ids[offsets[n]:offsets[n + 1]]]
+
+
+def synthetic_queries(queries: int, vocabulary: int, seed: int) -> list:
+    """Requêtes de 1 à 6 termes, plus ou moins fréquents, avec parfois un terme inconnu ou répété."""
+    rng = np.random.default_rng(seed + 1)
+    result = []
+    for _ in range(queries):
+        terms = [f"mot{i}" for i in (rng.zipf(1.1, rng.integers(1, 7)) - 1) % vocabulary]
+        if rng.random() < 0.2:
+            terms.append("inconnu")
+        if rng.random() < 0.2:
+            terms.append(terms[0])
+        result.append(terms)
+    return result
+
+
+def _percentiles_ms(durations: list) -> str:
+    p50, p95, p99 = np.percentile(np.asarray(durations) * 1000, [50, 95, 99])
+    return f"p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms"
+
+
+def check_parity(corpus: list, queries: list, top_k: int, rtol: float) -> bool:
+    """Compare les scores complets et les top-k des implémentations (en mémoire, converti, projeté)."""
+    okapi = BM25Okapi(corpus)
+    sparse = SparseBM25.from_tokenized(corpus)
+    converted = SparseBM25.from_okapi(okapi)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_index(Path(tmp) / "bm25_index.bin", converted, [str(n) for n in range(len(corpus))])
+        mapped, _ = open_index(Path(tmp) / "bm25_index.bin")
+        return _compare(okapi, sparse, [sparse, converted, mapped], queries, top_k, rtol, len(corpus))
+
+
+def _compare(okapi, sparse, indexes: list, queries: list, top_k: int, rtol: float, docs: int) -> bool:
+    worst, topk_errors = 0.0, 0
+    okapi_times, sparse_times = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        expected = okapi.get_scores(query)
+        reference = np.argsort(expected)[::-1][:top_k]
+        okapi_times.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        found = sparse.top_k(query, top_k)
+        sparse_times.append(time.perf_counter() - t0)
+
+        scale = max(np.abs(expected).max(), 1e-12)
+        for index in indexes:
+            worst = max(worst, float(np.abs(index.get_scores(query) - expected).max() / scale))
+
+        # Les documents sans aucun terme de la requête (score 0) ne sont plus renvoyés
+        expected_top = [score for score in expected[reference] if score != 0][:len(found)]
+        if not np.allclose([score for _, score in found], expected_top, rtol=rtol, atol=rtol * scale):
+            topk_errors += 1
+        elif any(abs(expected[doc] - score) > rtol * scale for doc, score in found):
+            topk_errors += 1
+
+    ok = worst <= rtol and not topk_errors
+    print(f"{'✅' if ok else '❌'} Parité sur {docs} chunks et {len(queries)} requêtes : "
+          f"écart relatif max {worst:.2e}, top-{top_k} divergents : {topk_errors}")
+    print(f"   rank_bm25 (get_scores + argsort) : {_percentiles_ms(okapi_times)}")
+    print(f"   SparseBM25 (top_k)               : {_percentiles_ms(sparse_times)}")
+    return ok
+
+
+def benchmark(docs: int, vocabulary: int, mean_length: int, queries: list, top_k: int, seed: int):
+    """Construction et latence de SparseBM25 sur `docs` chunks."""
+    t0 = time.perf_counter()
+    index = SparseBM25.from_tokenized(synthetic_corpus(docs, vocabulary, mean_length, seed))
+    build_s = time.perf_counter() - t0
+    size_mb = (index.indptr.nbytes + index.doc_ids.nbytes + index.weights.nbytes) / 2**20
+    print(f"📦 SparseBM25 sur {docs} chunks : construit en {build_s:.1f} s, {len(index.vocabulary)} termes, "
+          f"{len(index.doc_ids)} postings ({size_mb:.0f} Mo de tableaux)")
+
+    print(f"⏱️  top-{top_k} en mémoire : {_latencies(index, queries, top_k)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bm25_index.bin"
+        t0 = time.perf_counter()
+        write_index(path, index, [f"chunk-{n}" for n in range(docs)])
+        write_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        mapped, _ = open_index(path)
+        open_ms = (time.perf_counter() - t0) * 1000
+        print(f"💾 Index binaire : écrit en {write_s:.1f} s ({path.stat().st_size / 2**20:.0f} Mo), "
+              f"ouvert en {open_ms:.1f} ms")
+        print(f"⏱️  top-{top_k} projeté en mémoire : {_latencies(mapped, queries, top_k)}")
+
+
+def _latencies(index, queries: list, top_k: int) -> str:
+    durations = []
+    for query in queries:
+        t0 = time.perf_counter()
+        index.top_k(query, top_k)
+        durations.append(time.perf_counter() - t0)
+    return _percentiles_ms(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parité et performance de l'index BM25 creux.")
+    parser.add_argument("--docs", type=int, default=1_000_000, help="Chunks du corpus de mesure.")
+    parser.add_argument("--parity-docs", type=int, default=20_000, help="Chunks du corpus de parité (rank_bm25 est lent).")
+    parser.add_argument("--vocabulary", type=int, default=200_000, help="Taille du vocabulaire.")
+    parser.add_argument("--mean-length", type=int, default=40, help="Nombre moyen de jetons par chunk.")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes.")
+    parser.add_argument("--top-k", type=int, default=40, help="Résultats par requête (retrieval.top_k_bm25).")
+    parser.add_argument("--rtol", type=float, default=1e-5, help="Tolérance relative de la parité (poids en float32).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries, args.vocabulary, args.seed)
+    corpus = list(synthetic_corpus(args.parity_docs, args.vocabulary, args.mean_length, args.seed))
+    ok = check_parity(corpus, queries, args.top_k, args.rtol)
+    del corpus
+
+    if args.docs:
+        benchmark(args.docs, args.vocabulary, args.mean_length, queries, args.top_k, args.seed)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# kaitiaki/scripts/convert_bm25_index.py
+"""
+Convertit l'ancien index BM25 (pickle + méta JSON) au format binaire projeté en
+mémoire, sans relancer l'indexation :
+
+    python -m kaitiaki.scripts.convert_bm25_index
+    python -m kaitiaki.scripts.convert_bm25_index --pickle bm25_index.pkl --meta bm25_meta.json --out bm25_index.bin
+"""
+import argparse
+import time
+
+
+def convert_bm25_index(pickle_path: str = None, meta_path: str = None, out_path: str = None) -> bool:
+    """Convertit l'index ; par défaut, les chemins sont ceux de la configuration (paths.*)."""
+    from kaitiaki.rag.bm25 import convert_pickle, open_index
+    from kaitiaki.utils.settings import CFG
+
+    pickle_path = pickle_path or CFG["paths"]["bm25_pickle"]
+    meta_path = meta_path or CFG["paths"]["bm25_meta"]
+    out_path = out_path or CFG["paths"]["bm25_index"]
+
+    print("=== Conversion de l'index BM25 ===")
+    print(f"Pickle : {pickle_path}")
+    print(f"Méta   : {meta_path}")
+    print(f"Sortie : {out_path}")
+    try:
+        t0 = time.perf_counter()
+        count = convert_pickle(pickle_path, meta_path, out_path)
+        print(f"✅ {count} chunks convertis en {time.perf_counter() - t0:.1f} s")
+
+        t0 = time.perf_counter()
+        bm25, _ = open_index(out_path)
+        print(f"✅ Index ouvert en {(time.perf_counter() - t0) * 1000:.1f} ms "
+              f"({bm25.corpus_size} chunks, {len(bm25.vocabulary)} termes)")
+        return True
+    except Exception as e:
+        print(f"❌ Erreur de conversion : {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion de l'index BM25 pickle au format binaire.")
+    parser.add_argument("--pickle", help="Ancien index (défaut : paths.bm25_pickle).")
+    parser.add_argument("--meta", help="Méta JSON des chunks (défaut : paths.bm25_meta).")
+    parser.add_argument("--out", help="Index binaire (défaut : paths.bm25_index).")
+    args = parser.parse_args()
+    convert_bm25_index(args.pickle, args.meta, args.out)